@@ -6,6 +6,7 @@ Dataset computations
 
 import numpy as np
 from rsatoolbox.util.data_utils import get_unique_inverse
+from rsatoolbox.util.data_utils import compute_dtype
 
 
 def average_dataset(dataset):
@@ -33,8 +34,10 @@ def average_dataset_by(dataset, by):
         numpy.ndarray: average: average activation vector
     """
     unique_values, inverse = get_unique_inverse(dataset.obs_descriptors[by])
-    average = np.nan * np.empty(
-        (len(unique_values), dataset.measurements.shape[1]))
+    # reduced precision data is averaged in at least single precision
+    average = np.full(
+        (len(unique_values), dataset.measurements.shape[1]), np.nan,
+        dtype=compute_dtype(dataset.measurements.dtype))
     n_obs = np.nan * np.empty(len(unique_values))
     for i_v, _ in enumerate(unique_values):
         measurements = dataset.measurements[inverse == i_v, :]
@@ -39,6 +39,9 @@ class DatasetBase:
             are array-like with shape = (n_obs,...))
         channel_descriptors (dict):   channel descriptors (all are
             array-like with shape = (n_channel,...))
+        dtype (numpy.dtype):          dtype to store the measurements in,
+            e.g. numpy.float32 to halve memory use. Defaults to the dtype
+            of measurements
 
     Returns:
         dataset object
@@ -46,10 +49,12 @@ class DatasetBase:
 
     def __init__(self, measurements, descriptors=None,
                  obs_descriptors=None, channel_descriptors=None,
-                 check_dims=True):
+                 check_dims=True, dtype=None):
         if measurements.ndim != 2:
             raise AttributeError(
                 "measurements must be in dimension n_obs x n_channel")
+        if dtype is not None:
+            measurements = measurements.astype(dtype, copy=False)
         self.measurements = measurements
         self.n_obs, self.n_channel = self.measurements.shape
         if check_dims:
@@ -152,7 +157,7 @@ class DatasetBase:
         raise NotImplementedError(
             "subset_channel function not implemented in used Dataset class!")
 
-    def save(self, filename, file_type='hdf5', overwrite=False):
+    def save(self, filename, file_type='hdf5', overwrite=False, dtype=None):
         """ Saves the dataset object to a file
 
         Args:
@@ -162,9 +167,14 @@ class DatasetBase:
                 hdf5: hdf5 file
                 pkl: pickle file
             overwrite(Boolean): overwrites file if it already exists
+            dtype(numpy.dtype): dtype to store the measurements in,
+                defaults to the dtype of the measurements
 
         """
         data_dict = self.to_dict()
+        if dtype is not None:
+            data_dict['measurements'] = \
+                data_dict['measurements'].astype(dtype, copy=False)
         if overwrite:
             remove_file(filename)
         if file_type == 'hdf5':
@@ -497,6 +507,8 @@ class TemporalDataset(Dataset):
             time_descriptors needs to contain one key 'time' that
             specifies the time-coordinate. if None is provided, 'time' is
             set as (0, 1, ..., n_time-1)
+        dtype (numpy.dtype):          dtype to store the measurements in,
+            defaults to the dtype of measurements
 
     Returns:
         dataset object
@@ -504,11 +516,13 @@ class TemporalDataset(Dataset):
 
     def __init__(self, measurements, descriptors=None,
                  obs_descriptors=None, channel_descriptors=None,
-                 time_descriptors=None, check_dims=True):
+                 time_descriptors=None, check_dims=True, dtype=None):
 
         if measurements.ndim != 3:
             raise AttributeError(
                 "measurements must be in dimension n_obs x n_channel x time")
+        if dtype is not None:
+            measurements = measurements.astype(dtype, copy=False)
 
         self.measurements = measurements
         self.n_obs, self.n_channel, self.n_time = self.measurements.shape
@@ -1,6 +1,8 @@
 from .bootstrap import bootstrap_sample
 from .bootstrap import bootstrap_sample_rdm
 from .bootstrap import bootstrap_sample_pattern
+from .bootstrap import bootstrap_sample_idx
+from .bootstrap import bootstrap_counts
 from .evaluate import eval_fixed
 from .evaluate import eval_bootstrap
 from .evaluate import eval_bootstrap_rdm
@@ -12,6 +14,7 @@ from .evaluate import crossval
 from .boot_testset import bootstrap_testset
 from .boot_testset import bootstrap_testset_pattern
 from .boot_testset import bootstrap_testset_rdm
+from .crossvalsets import FoldPlan
 from .crossvalsets import sets_leave_one_out_pattern
 from .crossvalsets import sets_leave_one_out_rdm
 from .crossvalsets import sets_k_fold
@@ -20,6 +23,7 @@ from .crossvalsets import sets_k_fold_rdm
 from .crossvalsets import sets_of_k_pattern
 from .noise_ceiling import cv_noise_ceiling
 from .noise_ceiling import boot_noise_ceiling
+from .executor import merge_checkpoints
 from .result import load_results
 from .result import Result
 from .result import result_from_dict
@@ -39,16 +39,9 @@ def bootstrap_sample(rdms, rdm_descriptor='index', pattern_descriptor='index'):
             sampled pattern descriptor indices
 
     """
-    rdm_select = np.unique(rdms.rdm_descriptors[rdm_descriptor])
-    pattern_descriptor, pattern_select = \
-        add_pattern_index(rdms, pattern_descriptor)
-    rdm_idx = np.random.randint(0, len(rdm_select),
-                                size=len(rdm_select))
-    rdm_idx = rdm_select[rdm_idx]
+    rdm_idx, pattern_idx = bootstrap_sample_idx(
+        rdms, rdm_descriptor, pattern_descriptor)
     rdms = rdms.subsample(rdm_descriptor, rdm_idx)
-    pattern_idx = np.random.randint(0, len(pattern_select),
-                                    size=len(pattern_select))
-    pattern_idx = pattern_select[pattern_idx]
     rdms = rdms.subsample_pattern(pattern_descriptor,
                                   pattern_idx)
     return rdms, rdm_idx, pattern_idx
@@ -80,10 +73,8 @@ def bootstrap_sample_rdm(rdms, rdm_descriptor='index'):
             rdm group descritor values
 
     """
-    rdm_select = np.unique(rdms.rdm_descriptors[rdm_descriptor])
-    rdm_sample = np.random.randint(0, len(rdm_select),
-                                   size=len(rdm_select))
-    rdm_idx = rdm_select[rdm_sample]
+    rdm_idx, _ = bootstrap_sample_idx(rdms, rdm_descriptor,
+                                      boot_pattern=False)
     rdms = rdms.subsample(rdm_descriptor, rdm_idx)
     return rdms, rdm_idx
 
@@ -109,11 +100,109 @@ def bootstrap_sample_pattern(rdms, pattern_descriptor='index'):
         numpy.ndarray: pattern_idx
             sampled pattern descriptor index values for subsampling other rdms
     """
-    pattern_descriptor, pattern_select = \
-        add_pattern_index(rdms, pattern_descriptor)
-    pattern_idx = np.random.randint(0, len(pattern_select),
-                                    size=len(pattern_select))
-    pattern_idx = pattern_select[pattern_idx]
+    _, pattern_idx = bootstrap_sample_idx(
+        rdms, pattern_descriptor=pattern_descriptor, boot_rdm=False)
     rdms = rdms.subsample_pattern(pattern_descriptor,
                                   pattern_idx)
     return rdms, pattern_idx
+
+
+def bootstrap_sample_idx(rdms, rdm_descriptor='index',
+                         pattern_descriptor='index', boot_rdm=True,
+                         boot_pattern=True):
+    """Draws only the indices of a bootstrap sample.
+
+    The random draws are those of bootstrap_sample, bootstrap_sample_rdm
+    and bootstrap_sample_pattern, such that the same seed yields the same
+    sample without creating the subsampled RDMs.
+
+    Args:
+        rdms(rsatoolbox.rdm.rdms.RDMs): Data to be used
+
+        rdm_descriptor(String):
+            descriptor to group the samples by
+
+        pattern_descriptor(string):
+            descriptor to group the patterns by
+
+        boot_rdm(bool): whether to resample the RDMs
+
+        boot_pattern(bool): whether to resample the patterns
+
+    Returns:
+        numpy.ndarray: rdm_idx
+            sampled rdm descriptor values, None if boot_rdm is False
+
+        numpy.ndarray: pattern_idx
+            sampled pattern descriptor values, None if boot_pattern is False
+
+    """
+    rdm_idx = None
+    pattern_idx = None
+    if boot_rdm:
+        rdm_select = np.unique(rdms.rdm_descriptors[rdm_descriptor])
+        rdm_idx = np.random.randint(0, len(rdm_select),
+                                    size=len(rdm_select))
+        rdm_idx = rdm_select[rdm_idx]
+    if boot_pattern:
+        pattern_descriptor, pattern_select = \
+            add_pattern_index(rdms, pattern_descriptor)
+        pattern_idx = np.random.randint(0, len(pattern_select),
+                                        size=len(pattern_select))
+        pattern_idx = pattern_select[pattern_idx]
+    return rdm_idx, pattern_idx
+
+
+def bootstrap_counts(rdms, N, rdm_descriptor='index',
+                     pattern_descriptor='index', boot_rdm=True,
+                     boot_pattern=True):
+    """Draws N bootstrap samples at once as counts of the descriptor values.
+
+    The random draws are those of N consecutive calls to bootstrap_sample,
+    bootstrap_sample_rdm or bootstrap_sample_pattern, made with one call
+    to the random number generator.
+
+    Args:
+        rdms(rsatoolbox.rdm.rdms.RDMs): Data to be used
+
+        N(int): number of samples
+
+        rdm_descriptor(String):
+            descriptor to group the samples by
+
+        pattern_descriptor(string):
+            descriptor to group the patterns by
+
+        boot_rdm(bool): whether to resample the RDMs
+
+        boot_pattern(bool): whether to resample the patterns
+
+    Returns:
+        numpy.ndarray: rdm_counts
+            N x n_values, how often each unique value of the rdm_descriptor
+            was sampled, None if boot_rdm is False
+
+        numpy.ndarray: pattern_counts
+            N x n_values, how often each unique value of the
+            pattern_descriptor was sampled, None if boot_pattern is False
+
+    """
+    n_select = []
+    if boot_rdm:
+        n_select.append(len(np.unique(rdms.rdm_descriptors[rdm_descriptor])))
+    if boot_pattern:
+        _, pattern_select = add_pattern_index(rdms, pattern_descriptor)
+        n_select.append(len(pattern_select))
+    high = np.repeat(n_select, n_select)
+    draws = np.random.randint(0, high, size=(N, len(high)))
+    counts = []
+    start = 0
+    for n in n_select:
+        offsets = np.arange(N).reshape(-1, 1) * n
+        counts.append(np.bincount(
+            (draws[:, start:start + n] + offsets).ravel(),
+            minlength=N * n).reshape(N, n))
+        start += n
+    rdm_counts = counts.pop(0) if boot_rdm else None
+    pattern_counts = counts.pop(0) if boot_pattern else None
+    return rdm_counts, pattern_counts
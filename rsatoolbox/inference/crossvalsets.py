@@ -2,15 +2,169 @@
 # -*- coding: utf-8 -*-
 """
 generation of crossvalidation splits
+
+The sets_* functions return lists of [RDMs, pattern_idx] pairs for the
+training, test and noise ceiling sets of each fold. With as_plan=True they
+return a FoldPlan instead, which stores only the indices of the RDMs and
+patterns of each set. crossval and cv_noise_ceiling take a FoldPlan in
+place of the lists and gather the data of each fold when they need it.
 """
 
-from copy import deepcopy
 import numpy as np
+from rsatoolbox.rdm import RDMs
+from rsatoolbox.util.data_utils import extract_dict
+from rsatoolbox.util.descriptor_utils import num_index
 from rsatoolbox.util.rdm_utils import add_pattern_index
+from rsatoolbox.util.rdm_utils import _selection
+from rsatoolbox.util.rdm_utils import _pair_source
 from rsatoolbox.util.inference_util import default_k_pattern, default_k_rdm
 
 
-def sets_leave_one_out_pattern(rdms, pattern_descriptor):
+class FoldPlan:
+    """ crossvalidation folds stored as indices into one RDMs object
+
+    Each set of a fold is a tuple (rows, patterns, pattern_idx):
+    rows are the indices of its RDMs, patterns the sorted indices of its
+    patterns and pattern_idx the pattern descriptor values passed on to
+    fitting and to subsample the model predictions, as in the lists of
+    [RDMs, pattern_idx] returned by the sets_* functions.
+    rows or patterns None select all RDMs or patterns.
+
+    For RDMs which are a bootstrap sample, pattern_sample translates the
+    pattern_idx of the training and test sets into the patterns of the
+    original data, from which the predictions of the models are subsampled.
+
+    Args:
+        ceil(bool): whether the folds have noise ceiling sets
+        pattern_sample(numpy.ndarray): pattern_idx of the bootstrap sample
+            of patterns the RDMs were drawn with, None for no translation
+
+    Attributes:
+        train(list): training set of each fold
+        test(list): test set of each fold
+        ceil(list): noise ceiling set of each fold or None
+
+    """
+
+    def __init__(self, ceil=True, pattern_sample=None):
+        self.train = []
+        self.test = []
+        self.ceil = [] if ceil else None
+        if pattern_sample is None:
+            self._sampled = None
+        else:
+            self._sampled = np.unique(pattern_sample, return_counts=True)
+
+    def __repr__(self):
+        """
+        defines string which is printed for the object
+        """
+        return (f'rsatoolbox.inference.FoldPlan(\n'
+                f'{len(self)} fold(s)\n'
+                f'noise ceiling sets: {self.ceil is not None}\n'
+                )
+
+    def __len__(self) -> int:
+        """
+        The number of folds.
+        """
+        return len(self.train)
+
+    def add_fold(self, train, test, ceil=None):
+        """ adds a fold
+
+        Args:
+            train(tuple): (rows, patterns, pattern_idx) of the training set
+            test(tuple): (rows, patterns, pattern_idx) of the test set
+            ceil(tuple): (rows, patterns, pattern_idx) of the noise
+                ceiling set, required iff the plan has noise ceiling sets
+
+        """
+        if self._sampled is not None:
+            train = train[:2] + (_repeat_sampled(self._sampled, train[2]),)
+            test = test[:2] + (_repeat_sampled(self._sampled, test[2]),)
+        self.train.append(train)
+        self.test.append(test)
+        if self.ceil is not None:
+            self.ceil.append(ceil)
+
+    def n_rdm(self, rdms, fold_set):
+        """ the number of RDMs of a set of a fold, e.g. plan.test[i]"""
+        rows = fold_set[0]
+        return rdms.n_rdm if rows is None else len(rows)
+
+    def n_cond(self, rdms, fold_set):
+        """ the number of patterns of a set of a fold"""
+        patterns = fold_set[1]
+        return rdms.n_cond if patterns is None else len(patterns)
+
+    def get_vectors(self, rdms, fold_set):
+        """ the vectors of the RDMs of a set of a fold
+
+        Args:
+            rdms(rsatoolbox.rdm.RDMs): the RDMs the plan was made for
+            fold_set(tuple): a set of a fold, e.g. plan.test[i]
+
+        Returns:
+            numpy.ndarray: the vectors of the selected RDMs over the
+                selected patterns
+
+        """
+        rows, patterns, _ = fold_set
+        vectors = rdms.get_vectors()
+        if rows is not None:
+            vectors = vectors[rows]
+        if patterns is not None:
+            vectors = vectors[:, _pair_source(rdms.n_cond, patterns)]
+        return vectors
+
+    def get_rdms(self, rdms, fold_set):
+        """ the RDMs of a set of a fold as a RDMs object, as contained in
+        the lists of the sets_* functions
+
+        Args:
+            rdms(rsatoolbox.rdm.RDMs): the RDMs the plan was made for
+            fold_set(tuple): a set of a fold, e.g. plan.test[i]
+
+        Returns:
+            rsatoolbox.rdm.RDMs: the selected RDMs over the selected
+                patterns
+
+        """
+        rows, patterns, _ = fold_set
+        return RDMs(
+            self.get_vectors(rdms, fold_set),
+            dissimilarity_measure=rdms.dissimilarity_measure,
+            descriptors=rdms.descriptors,
+            rdm_descriptors=(rdms.rdm_descriptors if rows is None else
+                             extract_dict(rdms.rdm_descriptors, rows)),
+            pattern_descriptors=(
+                rdms.pattern_descriptors if patterns is None else
+                extract_dict(rdms.pattern_descriptors, patterns)))
+
+    def to_sets(self, rdms):
+        """ converts the plan into lists of [RDMs, pattern_idx] pairs
+
+        Args:
+            rdms(rsatoolbox.rdm.RDMs): the RDMs the plan was made for
+
+        Returns:
+            train_set(list): list of [rdms, pattern_idx] pairs
+            test_set(list): list of [rdms, pattern_idx] pairs
+            ceil_set(list): list of [rdms, pattern_idx] pairs or None
+
+        """
+        sets = []
+        for fold_sets in (self.train, self.test, self.ceil):
+            if fold_sets is None:
+                sets.append(None)
+            else:
+                sets.append([[self.get_rdms(rdms, fold_set), fold_set[2]]
+                             for fold_set in fold_sets])
+        return tuple(sets)
+
+
+def sets_leave_one_out_pattern(rdms, pattern_descriptor, as_plan=False):
     """ generates training and test set combinations by leaving one level
     of pattern_descriptor out as a test set.
     This is only sensible if pattern_descriptor already defines larger groups!
@@ -21,6 +175,7 @@ def sets_leave_one_out_pattern(rdms, pattern_descriptor):
     Args:
         rdms(rsatoolbox.rdm.RDMs): rdms to use
         pattern_descriptor(String): descriptor to select groups
+        as_plan(bool): whether to return a FoldPlan instead of the lists
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -30,31 +185,27 @@ def sets_leave_one_out_pattern(rdms, pattern_descriptor):
     """
     pattern_descriptor, pattern_select = \
         add_pattern_index(rdms, pattern_descriptor)
-    train_set = []
-    test_set = []
-    ceil_set = []
+    patterns = rdms.pattern_descriptors[pattern_descriptor]
+    plan = FoldPlan()
     for i_pattern in pattern_select:
         pattern_idx_train = np.setdiff1d(pattern_select, i_pattern)
-        rdms_train = rdms.subset_pattern(pattern_descriptor,
-                                         pattern_idx_train)
         pattern_idx_test = [i_pattern]
-        rdms_test = rdms.subset_pattern(pattern_descriptor,
-                                        pattern_idx_test)
-        rdms_ceil = rdms.subset_pattern(pattern_descriptor,
-                                        pattern_idx_test)
-        train_set.append((rdms_train, pattern_idx_train))
-        test_set.append((rdms_test, pattern_idx_test))
-        ceil_set.append((rdms_ceil, pattern_idx_test))
-    return train_set, test_set, ceil_set
+        test = (None, num_index(patterns, pattern_idx_test),
+                pattern_idx_test)
+        plan.add_fold(
+            (None, num_index(patterns, pattern_idx_train), pattern_idx_train),
+            test, test)
+    return _plan_or_sets(plan, rdms, as_plan)
 
 
-def sets_leave_one_out_rdm(rdms, rdm_descriptor='index'):
+def sets_leave_one_out_rdm(rdms, rdm_descriptor='index', as_plan=False):
     """ generates training and test set combinations by leaving one level
     of rdm_descriptor out as a test set.\
 
     Args:
         rdms(rsatoolbox.rdm.RDMs): rdms to use
         rdm_descriptor(String): descriptor to select groups
+        as_plan(bool): whether to return a FoldPlan instead of the lists
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -64,29 +215,28 @@ def sets_leave_one_out_rdm(rdms, rdm_descriptor='index'):
     """
     rdm_select = rdms.rdm_descriptors[rdm_descriptor]
     rdm_select = np.unique(rdm_select)
+    plan = FoldPlan()
     if len(rdm_select) > 1:
-        train_set = []
-        test_set = []
         for i_pattern in rdm_select:
             rdm_idx_train = np.setdiff1d(rdm_select, i_pattern)
-            rdms_train = rdms.subset(rdm_descriptor,
-                                     rdm_idx_train)
             rdm_idx_test = [i_pattern]
-            rdms_test = rdms.subset(rdm_descriptor,
-                                    rdm_idx_test)
-            train_set.append((rdms_train, np.arange(rdms.n_cond)))
-            test_set.append((rdms_test, np.arange(rdms.n_cond)))
-        ceil_set = train_set
+            train = (num_index(rdms.rdm_descriptors[rdm_descriptor],
+                               rdm_idx_train),
+                     None, np.arange(rdms.n_cond))
+            test = (num_index(rdms.rdm_descriptors[rdm_descriptor],
+                              rdm_idx_test),
+                    None, np.arange(rdms.n_cond))
+            plan.add_fold(train, test, train)
     else:
         Warning('leave one out called with only one group')
-        train_set = [(rdms, np.arange(rdms.n_cond))]
-        test_set = [(rdms, np.arange(rdms.n_cond))]
-        ceil_set = [(rdms, np.arange(rdms.n_cond))]
-    return train_set, test_set, ceil_set
+        all_rdms = (None, None, np.arange(rdms.n_cond))
+        plan.add_fold(all_rdms, all_rdms, all_rdms)
+    return _plan_or_sets(plan, rdms, as_plan)
 
 
 def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
-                pattern_descriptor='index', rdm_descriptor='index'):
+                pattern_descriptor='index', rdm_descriptor='index',
+                as_plan=False, pattern_sample=None):
     """ generates training and test set combinations by splitting into k
     similar sized groups. This version splits both over rdms and over patterns
     resulting in k_rdm * k_pattern (training, test) pairs.
@@ -100,6 +250,9 @@ def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
         k_rdm(int): number of rdm groups
         k_pattern(int): number of pattern groups
         random(bool): whether the assignment shall be randomized
+        as_plan(bool): whether to return a FoldPlan instead of the lists
+        pattern_sample(numpy.ndarray): bootstrap sample of patterns rdms
+            were drawn with, see FoldPlan
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -119,42 +272,27 @@ def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
         'Can make at most as many groups as rdms'
     if random:
         np.random.shuffle(rdm_select)
-    group_size_rdm = np.floor(len(rdm_select) / k_rdm)
-    additional_rdms = len(rdm_select) % k_rdm
-    train_set = []
-    test_set = []
-    ceil_set = []
-    for i_group in range(k_rdm):
-        test_idx = np.arange(i_group * group_size_rdm,
-                             (i_group + 1) * group_size_rdm)
-        if i_group < additional_rdms:
-            test_idx = np.concatenate((test_idx, [len(rdm_select)-(i_group+1)]))
-        if k_rdm <= 1:
-            train_idx = test_idx
-        else:
-            train_idx = np.setdiff1d(np.arange(len(rdm_select)),
-                                     test_idx)
-        rdm_idx_test = [rdm_select[int(idx)] for idx in test_idx]
-        rdm_idx_train = [rdm_select[int(idx)] for idx in train_idx]
-        rdms_test = rdms.subsample(rdm_descriptor,
-                                   rdm_idx_test)
-        rdms_train = rdms.subsample(rdm_descriptor,
-                                    rdm_idx_train)
-        train_new, test_new, _ = sets_k_fold_pattern(
-            rdms_train, k=k_pattern,
-            pattern_descriptor=pattern_descriptor, random=random)
-        ceil_new = deepcopy(test_new)
-        for i_pattern in range(k_pattern):
-            test_new[i_pattern][0] = rdms_test.subset_pattern(
-                by=pattern_descriptor,
-                value=test_new[i_pattern][1])
-        train_set += train_new
-        test_set += test_new
-        ceil_set += ceil_new
-    return train_set, test_set, ceil_set
-
-
-def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index'):
+    patterns = rdms.pattern_descriptors[pattern_descriptor]
+    plan = FoldPlan(pattern_sample=pattern_sample)
+    for rdm_idx_test, rdm_idx_train in _k_groups(rdm_select, k_rdm):
+        rows_test = _selection(rdms.rdm_descriptors[rdm_descriptor],
+                               rdm_idx_test)
+        rows_train = _selection(rdms.rdm_descriptors[rdm_descriptor],
+                                rdm_idx_train)
+        pattern_groups = _k_pattern_groups(rdms, pattern_descriptor,
+                                           k_pattern, random)
+        for pattern_idx_test, pattern_idx_train in pattern_groups:
+            test_patterns = num_index(patterns, pattern_idx_test)
+            plan.add_fold(
+                (rows_train, num_index(patterns, pattern_idx_train),
+                 pattern_idx_train),
+                (rows_test, test_patterns, pattern_idx_test),
+                (rows_train, test_patterns, pattern_idx_test))
+    return _plan_or_sets(plan, rdms, as_plan)
+
+
+def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index',
+                    as_plan=False):
     """ generates training and test set combinations by splitting into k
     similar sized groups. This version splits both over rdms and over patterns
     resulting in k_rdm * k_pattern (training, test) pairs.
@@ -164,6 +302,7 @@ def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index'):
         rdm_descriptor(String): descriptor to select rdm groups
         k_rdm(int): number of rdm groups
         random(bool): whether the assignment shall be randomized
+        as_plan(bool): whether to return a FoldPlan instead of the lists
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -178,31 +317,21 @@ def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index'):
         'Can make at most as many groups as rdms'
     if random:
         np.random.shuffle(rdm_select)
-    group_size_rdm = np.floor(len(rdm_select) / k_rdm)
-    additional_rdms = len(rdm_select) % k_rdm
-    train_set = []
-    test_set = []
-    for i_group in range(k_rdm):
-        test_idx = np.arange(i_group * group_size_rdm,
-                             (i_group + 1) * group_size_rdm)
-        if i_group < additional_rdms:
-            test_idx = np.concatenate((test_idx, [len(rdm_select)-(i_group+1)]))
-        train_idx = np.setdiff1d(np.arange(len(rdm_select)),
-                                 test_idx)
-        rdm_idx_test = [rdm_select[int(idx)] for idx in test_idx]
-        rdm_idx_train = [rdm_select[int(idx)] for idx in train_idx]
-        rdms_test = rdms.subsample(rdm_descriptor,
-                                   rdm_idx_test)
-        rdms_train = rdms.subsample(rdm_descriptor,
-                                    rdm_idx_train)
-        train_set.append([rdms_train, np.arange(rdms_train.n_cond)])
-        test_set.append([rdms_test, np.arange(rdms_train.n_cond)])
-    ceil_set = train_set
-    return train_set, test_set, ceil_set
+    plan = FoldPlan()
+    for rdm_idx_test, rdm_idx_train in _k_groups(rdm_select, k_rdm,
+                                                 train_all=False):
+        train = (_selection(rdms.rdm_descriptors[rdm_descriptor],
+                            rdm_idx_train),
+                 None, np.arange(rdms.n_cond))
+        test = (_selection(rdms.rdm_descriptors[rdm_descriptor],
+                           rdm_idx_test),
+                None, np.arange(rdms.n_cond))
+        plan.add_fold(train, test, train)
+    return _plan_or_sets(plan, rdms, as_plan)
 
 
 def sets_k_fold_pattern(rdms, pattern_descriptor='index',
-                        k=None, random=False):
+                        k=None, random=False, as_plan=False):
     """ generates training and test set combinations by splitting into k
     similar sized groups. This version splits in the given order or
     randomizes the order. For k=1 training and test_set are whole dataset,
@@ -219,6 +348,7 @@ def sets_k_fold_pattern(rdms, pattern_descriptor='index',
         pattern_descriptor(String): descriptor to select groups
         k(int): number of groups
         random(bool): whether the assignment shall be randomized
+        as_plan(bool): whether to return a FoldPlan instead of the lists
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -226,41 +356,18 @@ def sets_k_fold_pattern(rdms, pattern_descriptor='index',
         ceil_set = None
 
     """
-    pattern_descriptor, pattern_select = \
-        add_pattern_index(rdms, pattern_descriptor)
-    if k is None:
-        k = default_k_pattern(len(pattern_select))
-    assert k <= len(pattern_select), \
-        'Can make at most as many groups as conditions'
-    if random:
-        np.random.shuffle(pattern_select)
-    group_size = np.floor(len(pattern_select) / k)
-    additional_patterns = len(pattern_select) % k
-    train_set = []
-    test_set = []
-    for i_group in range(k):
-        test_idx = np.arange(i_group * group_size,
-                             (i_group + 1) * group_size)
-        if i_group < additional_patterns:
-            test_idx = np.concatenate((test_idx, [len(pattern_select)-(i_group+1)]))
-        if k <= 1:
-            train_idx = test_idx
-        else:
-            train_idx = np.setdiff1d(np.arange(len(pattern_select)),
-                                     test_idx)
-        pattern_idx_test = [pattern_select[int(idx)] for idx in test_idx]
-        pattern_idx_train = [pattern_select[int(idx)] for idx in train_idx]
-        rdms_test = rdms.subset_pattern(pattern_descriptor,
-                                        pattern_idx_test)
-        rdms_train = rdms.subset_pattern(pattern_descriptor,
-                                         pattern_idx_train)
-        test_set.append([rdms_test, pattern_idx_test])
-        train_set.append([rdms_train, pattern_idx_train])
-    ceil_set = None
-    return train_set, test_set, ceil_set
-
-
-def sets_of_k_rdm(rdms, rdm_descriptor='index', k=5, random=False):
+    patterns = rdms.pattern_descriptors[pattern_descriptor]
+    plan = FoldPlan(ceil=False)
+    for pattern_idx_test, pattern_idx_train in _k_pattern_groups(
+            rdms, pattern_descriptor, k, random):
+        plan.add_fold(
+            (None, num_index(patterns, pattern_idx_train), pattern_idx_train),
+            (None, num_index(patterns, pattern_idx_test), pattern_idx_test))
+    return _plan_or_sets(plan, rdms, as_plan)
+
+
+def sets_of_k_rdm(rdms, rdm_descriptor='index', k=5, random=False,
+                  as_plan=False):
     """ generates training and test set combinations by splitting into
     groups of k. This version splits in the given order or
     randomizes the order. If the number of patterns is not divisible by k
@@ -271,6 +378,7 @@ def sets_of_k_rdm(rdms, rdm_descriptor='index', k=5, random=False):
         pattern_descriptor(String): descriptor to select groups
         k(int): number of groups
         random(bool): whether the assignment shall be randomized
+        as_plan(bool): whether to return a FoldPlan instead of the lists
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -284,10 +392,11 @@ def sets_of_k_rdm(rdms, rdm_descriptor='index', k=5, random=False):
         'to form groups we can use at most half the patterns per group'
     n_groups = int(len(rdm_select) / k)
     return sets_k_fold_rdm(rdms, rdm_descriptor=rdm_descriptor,
-                           k=n_groups, random=random)
+                           k_rdm=n_groups, random=random, as_plan=as_plan)
 
 
-def sets_of_k_pattern(rdms, pattern_descriptor=None, k=5, random=False):
+def sets_of_k_pattern(rdms, pattern_descriptor=None, k=5, random=False,
+                      as_plan=False):
     """ generates training and test set combinations by splitting into
     groups of k. This version splits in the given order or
     randomizes the order. If the number of patterns is not divisible by k
@@ -298,6 +407,7 @@ def sets_of_k_pattern(rdms, pattern_descriptor=None, k=5, random=False):
         pattern_descriptor(String): descriptor to select groups
         k(int): number of groups
         random(bool): whether the assignment shall be randomized
+        as_plan(bool): whether to return a FoldPlan instead of the lists
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -310,11 +420,12 @@ def sets_of_k_pattern(rdms, pattern_descriptor=None, k=5, random=False):
         'to form groups we can use at most half the patterns per group'
     n_groups = int(len(pattern_select) / k)
     return sets_k_fold_pattern(rdms, pattern_descriptor=pattern_descriptor,
-                               k=n_groups, random=random)
+                               k=n_groups, random=random, as_plan=as_plan)
 
 
 def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
-                pattern_descriptor='index', rdm_descriptor='index'):
+                pattern_descriptor='index', rdm_descriptor='index',
+                as_plan=False, pattern_sample=None):
     """ generates training and test set combinations by selecting random
     test sets of n_rdm RDMs and n_pattern patterns and using the rest of
     the data as the training set.
@@ -327,6 +438,9 @@ def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
         rdm_descriptor(String): descriptor to select rdm groups
         n_rdm(int): number of rdms per test set
         n_pattern(int): number of patterns per test set
+        as_plan(bool): whether to return a FoldPlan instead of the lists
+        pattern_sample(numpy.ndarray): bootstrap sample of patterns rdms
+            were drawn with, see FoldPlan
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -344,9 +458,8 @@ def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
     if n_pattern is None:
         k_pattern = default_k_pattern(len(pattern_select))
         n_pattern = int(np.floor(len(pattern_select) / k_pattern))
-    train_set = []
-    test_set = []
-    ceil_set = []
+    patterns = rdms.pattern_descriptors[pattern_descriptor]
+    plan = FoldPlan(pattern_sample=pattern_sample)
     for _i_group in range(n_cv):
         # shuffle
         np.random.shuffle(rdm_select)
@@ -361,10 +474,10 @@ def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
         # take subset of rdms
         rdm_idx_test = [rdm_select[int(idx)] for idx in test_idx]
         rdm_idx_train = [rdm_select[int(idx)] for idx in train_idx]
-        rdms_test = rdms.subsample(rdm_descriptor,
-                                   rdm_idx_test)
-        rdms_train = rdms.subsample(rdm_descriptor,
-                                    rdm_idx_train)
+        rows_test = _selection(rdms.rdm_descriptors[rdm_descriptor],
+                               rdm_idx_test)
+        rows_train = _selection(rdms.rdm_descriptors[rdm_descriptor],
+                                rdm_idx_train)
         # choose indices based on n_pattern
         if n_pattern == 0:
             train_idx = np.arange(len(pattern_select))
@@ -374,13 +487,64 @@ def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
             train_idx = np.arange(n_pattern, len(pattern_select))
         pattern_idx_test = [pattern_select[int(idx)] for idx in test_idx]
         pattern_idx_train = [pattern_select[int(idx)] for idx in train_idx]
-        rdms_test = rdms_test.subset_pattern(pattern_descriptor,
-                                             pattern_idx_test)
-        rdms_ceil = rdms_train.subset_pattern(pattern_descriptor,
-                                              pattern_idx_test)
-        rdms_train = rdms_train.subset_pattern(pattern_descriptor,
-                                               pattern_idx_train)
-        test_set.append([rdms_test, pattern_idx_test])
-        train_set.append([rdms_train, pattern_idx_train])
-        ceil_set.append([rdms_ceil, pattern_idx_test])
-    return train_set, test_set, ceil_set
+        test_patterns = num_index(patterns, pattern_idx_test)
+        plan.add_fold(
+            (rows_train, num_index(patterns, pattern_idx_train),
+             pattern_idx_train),
+            (rows_test, test_patterns, pattern_idx_test),
+            (rows_train, test_patterns, pattern_idx_test))
+    return _plan_or_sets(plan, rdms, as_plan)
+
+
+def _k_groups(select, k, train_all=True):
+    """ splits the values in select into k similar sized test groups and
+    returns (test values, training values) for each group. For k=1 the
+    training values are all values if train_all is set"""
+    group_size = np.floor(len(select) / k)
+    additional = len(select) % k
+    groups = []
+    for i_group in range(k):
+        test_idx = np.arange(i_group * group_size,
+                             (i_group + 1) * group_size)
+        if i_group < additional:
+            test_idx = np.concatenate((test_idx, [len(select)-(i_group+1)]))
+        if k <= 1 and train_all:
+            train_idx = test_idx
+        else:
+            train_idx = np.setdiff1d(np.arange(len(select)),
+                                     test_idx)
+        groups.append(([select[int(idx)] for idx in test_idx],
+                       [select[int(idx)] for idx in train_idx]))
+    return groups
+
+
+def _k_pattern_groups(rdms, pattern_descriptor, k, random):
+    """ the (test values, training values) of k pattern groups"""
+    pattern_descriptor, pattern_select = \
+        add_pattern_index(rdms, pattern_descriptor)
+    if k is None:
+        k = default_k_pattern(len(pattern_select))
+    assert k <= len(pattern_select), \
+        'Can make at most as many groups as conditions'
+    if random:
+        np.random.shuffle(pattern_select)
+    return _k_groups(pattern_select, k)
+
+
+def _repeat_sampled(sampled, value):
+    """ repeats each entry of value as often as it occurs in a sample,
+    given the unique values and counts of the sample. This translates
+    pattern_idx of a sample into the pattern_idx of the sampled data"""
+    values, counts = sampled
+    value = np.asarray(value)
+    if len(values) == 0:
+        return value[:0]
+    pos = np.minimum(np.searchsorted(values, value), len(values) - 1)
+    return np.repeat(value, np.where(values[pos] == value, counts[pos], 0))
+
+
+def _plan_or_sets(plan, rdms, as_plan):
+    """ returns the plan itself or the lists of sets it describes"""
+    if as_plan:
+        return plan
+    return plan.to_sets(rdms)
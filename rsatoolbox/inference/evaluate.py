@@ -4,26 +4,41 @@
 evaluate model performance
 """
 
+from copy import deepcopy
+from functools import partial
 import numpy as np
-import tqdm
 from rsatoolbox.rdm import compare
+from rsatoolbox.rdm import RDMs
+from rsatoolbox.rdm.compare_plan import ComparisonPlan
+from rsatoolbox.rdm.compare_plan import RankCache
+from rsatoolbox.rdm.compare import get_method
 from rsatoolbox.inference import bootstrap_sample
 from rsatoolbox.inference import bootstrap_sample_rdm
 from rsatoolbox.inference import bootstrap_sample_pattern
+from rsatoolbox.inference import bootstrap_sample_idx
+from rsatoolbox.inference import bootstrap_counts
 from rsatoolbox.model import Model
 from rsatoolbox.util.inference_util import input_check_model
 from rsatoolbox.util.inference_util import default_k_pattern, default_k_rdm
+from rsatoolbox.util.inference_util import bootstrap_mc_error
+from rsatoolbox.util.data_utils import extract_dict
+from rsatoolbox.util.rdm_utils import _selection
+from rsatoolbox.util.rdm_utils import _subsample_vectors
 from .result import Result
+from .crossvalsets import FoldPlan
 from .crossvalsets import sets_k_fold, sets_random
 from .noise_ceiling import boot_noise_ceiling
 from .noise_ceiling import cv_noise_ceiling
+from .noise_ceiling import _gram_noise_ceiling
+from .executor import run_samples
 
 
 def eval_dual_bootstrap(
     models, data, method='cosine', fitter=None,
     k_pattern=1, k_rdm=1, N=1000, n_cv=2,
     pattern_descriptor='index', rdm_descriptor='index',
-    use_correction=True):
+    use_correction=True, n_jobs=None, seed=None,
+    checkpoint=None):
     """dual bootstrap evaluation of models
     i.e. models are evaluated in a bootstrap over rdms, one over patterns
     and a bootstrap over both using the same bootstrap samples for each.
@@ -82,6 +97,13 @@ def eval_dual_bootstrap(
             alternatives: 'rdm', 'pattern'
         use_correction(bool): switch for the correction for the
             variance caused by crossvalidation (default: True)
+        n_jobs(int): number of processes to run the samples in. If given,
+            each sample is seeded from seed, such that the results
+            do not depend on n_jobs. None runs serially on numpy's global
+            random state (default)
+        seed(int): seed for the samples if n_jobs is given
+        checkpoint(String): file to save finished samples to regularly and
+            to resume from, see rsatoolbox.inference.executor.
 
     Returns:
         numpy.ndarray: matrix of evaluations (N x k)
@@ -102,42 +124,13 @@ def eval_dual_bootstrap(
         models = [models]
     evaluations = np.zeros((N, len(models), k_pattern * k_rdm, n_cv, 3))
     noise_ceil = np.zeros((2, N, n_cv, 3))
-    for i_sample in tqdm.trange(N):
-        sample, rdm_idx, pattern_idx = bootstrap_sample(
-            data,
-            rdm_descriptor=rdm_descriptor,
-            pattern_descriptor=pattern_descriptor)
-        sample_rdm = data.subsample(rdm_descriptor, rdm_idx)
-        sample_pattern = data.subsample_pattern(
-            pattern_descriptor, pattern_idx)
-        if len(np.unique(rdm_idx)) >= k_rdm \
-           and len(np.unique(pattern_idx)) >= 3 * k_pattern:
-            for i_rep in range(n_cv):
-                evals, cv_nc = _internal_cv(
-                    models, sample,
-                    pattern_descriptor, rdm_descriptor, pattern_idx,
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep, 0] = cv_nc
-                evaluations[i_sample, :, :, i_rep, 0] = evals[0]
-                evals, cv_nc = _internal_cv(
-                    models, sample_rdm,
-                    pattern_descriptor, rdm_descriptor,
-                    np.unique(data.pattern_descriptors[pattern_descriptor]),
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep, 1] = cv_nc
-                evaluations[i_sample, :, :, i_rep, 1] = evals[0]
-                evals, cv_nc = _internal_cv(
-                    models, sample_pattern,
-                    pattern_descriptor, rdm_descriptor, pattern_idx,
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep, 2] = cv_nc
-                evaluations[i_sample, :, :, i_rep, 2] = evals[0]
-        else:  # sample does not allow desired crossvalidation
-            evaluations[i_sample, :, :, :, :] = np.nan
-            noise_ceil[:, i_sample, :, :] = np.nan
+    samples = run_samples(
+        partial(_dual_bootstrap_sample, models, data, method, fitter,
+                k_pattern, k_rdm, n_cv, pattern_descriptor, rdm_descriptor),
+        N, n_jobs=n_jobs, seed=seed, checkpoint=checkpoint)
+    for i_sample, (evals, cv_nc) in enumerate(samples):
+        evaluations[i_sample] = evals
+        noise_ceil[:, i_sample] = cv_nc
     cv_method = 'dual_bootstrap'
     dof = min(data.n_rdm, data.n_cond) - 1
     eval_ok = ~np.isnan(evaluations[:, 0, 0, 0, 0])
@@ -215,7 +208,8 @@ def eval_fixed(models, data, theta=None, method='cosine'):
 
 def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
                    pattern_descriptor='index', rdm_descriptor='index',
-                   boot_noise_ceil=True):
+                   boot_noise_ceil=True, vectorized=False, n_jobs=None,
+                   seed=None, checkpoint=None, tol=None, batch_size=100):
     """evaluates models on data
     performs bootstrapping to get a sampling distribution
 
@@ -227,6 +221,23 @@ def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
         N(int): number of samples
         pattern_descriptor(string): descriptor to group patterns for bootstrap
         rdm_descriptor(string): descriptor to group rdms for bootstrap
+        vectorized(bool): whether to compute all samples at once from
+            resampling counts, only for the 'cosine' and 'corr' methods
+        n_jobs(int): number of processes to run the samples in. If given,
+            each sample is seeded from seed, such that the results
+            do not depend on n_jobs. None runs serially on numpy's global
+            random state (default)
+        seed(int): seed for the samples if n_jobs is given
+        checkpoint(String): file to save finished samples to regularly and
+            to resume from, see rsatoolbox.inference.executor. Not used
+            by the vectorized bootstrap
+        tol(float): tolerance for a sequential bootstrap. If given,
+            samples are drawn in batches until the Monte Carlo error of
+            the variances and of the bootstrap p-values close to 0.05
+            falls below tol, see
+            rsatoolbox.util.inference_util.bootstrap_mc_error.
+            N is then the maximal number of samples
+        batch_size(int): number of samples between checks of tol
 
     Returns:
         numpy.ndarray: vector of evaluations
@@ -234,28 +245,12 @@ def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
     """
     models, evaluations, theta, _ = \
         input_check_model(models, theta, None, N)
-    noise_min = []
-    noise_max = []
-    for i in tqdm.trange(N):
-        sample, rdm_idx, pattern_idx = \
-            bootstrap_sample(data, rdm_descriptor=rdm_descriptor,
-                             pattern_descriptor=pattern_descriptor)
-        if len(np.unique(pattern_idx)) >= 3:
-            for j, mod in enumerate(models):
-                rdm_pred = mod.predict_rdm(theta=theta[j])
-                rdm_pred = rdm_pred.subsample_pattern(pattern_descriptor,
-                                                      pattern_idx)
-                evaluations[i, j] = np.mean(compare(rdm_pred, sample,
-                                                    method))
-            if boot_noise_ceil:
-                noise_min_sample, noise_max_sample = boot_noise_ceiling(
-                    sample, method=method, rdm_descriptor=rdm_descriptor)
-                noise_min.append(noise_min_sample)
-                noise_max.append(noise_max_sample)
-        else:
-            evaluations[i, :] = np.nan
-            noise_min.append(np.nan)
-            noise_max.append(np.nan)
+    n_samples, noise_min, noise_max = _bootstrap_function(vectorized)(
+        models, evaluations, theta, data, method, N,
+        pattern_descriptor, rdm_descriptor, boot_noise_ceil,
+        n_jobs=n_jobs, seed=seed, checkpoint=checkpoint,
+        stop=_bootstrap_stop(tol, boot_noise_ceil), batch_size=batch_size)
+    evaluations = evaluations[:n_samples]
     if boot_noise_ceil:
         eval_ok = np.isfinite(evaluations[:, 0])
         noise_ceil = np.array([noise_min, noise_max])
@@ -269,13 +264,17 @@ def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
     dof = min(data.n_rdm, data.n_cond) - 1
     result = Result(models, evaluations, method=method,
                     cv_method='bootstrap', noise_ceiling=noise_ceil,
-                    variances=variances, dof=dof)
+                    variances=variances, dof=dof,
+                    mc_error=bootstrap_mc_error(
+                        evaluations, noise_ceil if boot_noise_ceil else None))
     return result
 
 
 def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
                            pattern_descriptor='index', rdm_descriptor='index',
-                           boot_noise_ceil=True):
+                           boot_noise_ceil=True, vectorized=False,
+                           n_jobs=None, seed=None, checkpoint=None,
+                           tol=None, batch_size=100):
     """evaluates a models on data
     performs bootstrapping over patterns to get a sampling distribution
 
@@ -288,6 +287,23 @@ def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
         pattern_descriptor(string): descriptor to group patterns for bootstrap
         rdm_descriptor(string): descriptor to group patterns for noise
             ceiling calculation
+        vectorized(bool): whether to compute all samples at once from
+            resampling counts, only for the 'cosine' and 'corr' methods
+        n_jobs(int): number of processes to run the samples in. If given,
+            each sample is seeded from seed, such that the results
+            do not depend on n_jobs. None runs serially on numpy's global
+            random state (default)
+        seed(int): seed for the samples if n_jobs is given
+        checkpoint(String): file to save finished samples to regularly and
+            to resume from, see rsatoolbox.inference.executor. Not used
+            by the vectorized bootstrap
+        tol(float): tolerance for a sequential bootstrap. If given,
+            samples are drawn in batches until the Monte Carlo error of
+            the variances and of the bootstrap p-values close to 0.05
+            falls below tol, see
+            rsatoolbox.util.inference_util.bootstrap_mc_error.
+            N is then the maximal number of samples
+        batch_size(int): number of samples between checks of tol
 
     Returns:
         numpy.ndarray: vector of evaluations
@@ -295,27 +311,12 @@ def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
     """
     models, evaluations, theta, _ = \
         input_check_model(models, theta, None, N)
-    noise_min = []
-    noise_max = []
-    for i in tqdm.trange(N):
-        sample, pattern_idx = \
-            bootstrap_sample_pattern(data, pattern_descriptor)
-        if len(np.unique(pattern_idx)) >= 3:
-            for j, mod in enumerate(models):
-                rdm_pred = mod.predict_rdm(theta=theta[j])
-                rdm_pred = rdm_pred.subsample_pattern(pattern_descriptor,
-                                                      pattern_idx)
-                evaluations[i, j] = np.mean(compare(rdm_pred, sample,
-                                                    method))
-            if boot_noise_ceil:
-                noise_min_sample, noise_max_sample = boot_noise_ceiling(
-                    sample, method=method, rdm_descriptor=rdm_descriptor)
-                noise_min.append(noise_min_sample)
-                noise_max.append(noise_max_sample)
-        else:
-            evaluations[i, :] = np.nan
-            noise_min.append(np.nan)
-            noise_max.append(np.nan)
+    n_samples, noise_min, noise_max = _bootstrap_function(vectorized)(
+        models, evaluations, theta, data, method, N,
+        pattern_descriptor, rdm_descriptor, boot_noise_ceil,
+        boot_rdm=False, n_jobs=n_jobs, seed=seed, checkpoint=checkpoint,
+        stop=_bootstrap_stop(tol, boot_noise_ceil), batch_size=batch_size)
+    evaluations = evaluations[:n_samples]
     if boot_noise_ceil:
         eval_ok = np.isfinite(evaluations[:, 0])
         noise_ceil = np.array([noise_min, noise_max])
@@ -329,12 +330,16 @@ def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
     dof = data.n_cond - 1
     result = Result(models, evaluations, method=method,
                     cv_method='bootstrap_pattern', noise_ceiling=noise_ceil,
-                    variances=variances, dof=dof)
+                    variances=variances, dof=dof,
+                    mc_error=bootstrap_mc_error(
+                        evaluations, noise_ceil if boot_noise_ceil else None))
     return result
 
 
 def eval_bootstrap_rdm(models, data, theta=None, method='cosine', N=1000,
-                       rdm_descriptor='index', boot_noise_ceil=True):
+                       rdm_descriptor='index', boot_noise_ceil=True,
+                       vectorized=False, n_jobs=None, seed=None,
+                       checkpoint=None, tol=None, batch_size=100):
     """evaluates models on data
     performs bootstrapping to get a sampling distribution
 
@@ -345,25 +350,36 @@ def eval_bootstrap_rdm(models, data, theta=None, method='cosine', N=1000,
         method(string): comparison method to use
         N(int): number of samples
         rdm_descriptor(string): rdm_descriptor to group rdms for bootstrap
+        vectorized(bool): whether to compute all samples at once from
+            resampling counts, only for the 'cosine' and 'corr' methods
+        n_jobs(int): number of processes to run the samples in. If given,
+            each sample is seeded from seed, such that the results
+            do not depend on n_jobs. None runs serially on numpy's global
+            random state (default)
+        seed(int): seed for the samples if n_jobs is given
+        checkpoint(String): file to save finished samples to regularly and
+            to resume from, see rsatoolbox.inference.executor. Not used
+            by the vectorized bootstrap
+        tol(float): tolerance for a sequential bootstrap. If given,
+            samples are drawn in batches until the Monte Carlo error of
+            the variances and of the bootstrap p-values close to 0.05
+            falls below tol, see
+            rsatoolbox.util.inference_util.bootstrap_mc_error.
+            N is then the maximal number of samples
+        batch_size(int): number of samples between checks of tol
 
     Returns:
         numpy.ndarray: vector of evaluations
 
     """
     models, evaluations, theta, _ = input_check_model(models, theta, None, N)
-    noise_min = []
-    noise_max = []
-    for i in tqdm.trange(N):
-        sample, rdm_idx = bootstrap_sample_rdm(data, rdm_descriptor)
-        for j, mod in enumerate(models):
-            rdm_pred = mod.predict_rdm(theta=theta[j])
-            evaluations[i, j] = np.mean(compare(rdm_pred, sample,
-                                                method))
-        if boot_noise_ceil:
-            noise_min_sample, noise_max_sample = boot_noise_ceiling(
-                sample, method=method, rdm_descriptor=rdm_descriptor)
-            noise_min.append(noise_min_sample)
-            noise_max.append(noise_max_sample)
+    n_samples, noise_min, noise_max = _bootstrap_function(vectorized)(
+        models, evaluations, theta, data, method, N,
+        rdm_descriptor=rdm_descriptor, boot_noise_ceil=boot_noise_ceil,
+        boot_pattern=False, n_jobs=n_jobs, seed=seed,
+        checkpoint=checkpoint, stop=_bootstrap_stop(tol, boot_noise_ceil),
+        batch_size=batch_size)
+    evaluations = evaluations[:n_samples]
     if boot_noise_ceil:
         eval_ok = np.isfinite(evaluations[:, 0])
         noise_ceil = np.array([noise_min, noise_max])
@@ -378,21 +394,30 @@ def eval_bootstrap_rdm(models, data, theta=None, method='cosine', N=1000,
     variances = np.cov(evaluations.T)
     result = Result(models, evaluations, method=method,
                     cv_method='bootstrap_rdm', noise_ceiling=noise_ceil,
-                    variances=variances, dof=dof)
+                    variances=variances, dof=dof,
+                    mc_error=bootstrap_mc_error(
+                        evaluations, noise_ceil if boot_noise_ceil else None))
     return result
 
 
-def crossval(models, rdms, train_set, test_set, ceil_set=None, method='cosine',
-             fitter=None, pattern_descriptor='index', calc_noise_ceil=True):
+def crossval(models, rdms, train_set, test_set=None, ceil_set=None,
+             method='cosine', fitter=None, pattern_descriptor='index',
+             calc_noise_ceil=True):
     """evaluates models on cross-validation sets
 
+    The sets may be given as a FoldPlan in place of train_set, e.g. from
+    sets_k_fold(..., as_plan=True). The RDMs of each fold are then gathered
+    from rdms only while this fold is evaluated.
+
     Args:
         models(rsatoolbox.model.Model): models to be evaluated
         rdms(rsatoolbox.rdm.RDMs): full dataset
         train_set(list): a list of the training RDMs with 2-tuple entries:
-            (RDMs, pattern_idx)
+            (RDMs, pattern_idx), or a FoldPlan for rdms
         test_set(list): a list of the test RDMs with 2-tuple entries:
-            (RDMs, pattern_idx)
+            (RDMs, pattern_idx), None if train_set is a FoldPlan
+        ceil_set(list): a list of the noise ceiling RDMs with 2-tuple
+            entries: (RDMs, pattern_idx), None if train_set is a FoldPlan
         method(string): comparison method to use
         pattern_descriptor(string): descriptor to group patterns
 
@@ -400,40 +425,43 @@ def crossval(models, rdms, train_set, test_set, ceil_set=None, method='cosine',
         numpy.ndarray: vector of evaluations
 
     """
-    assert len(train_set) == len(test_set), \
-        'train_set and test_set must have the same length'
-    if ceil_set is not None:
-        assert len(ceil_set) == len(test_set), \
-            'ceil_set and test_set must have the same length'
+    if isinstance(train_set, FoldPlan):
+        plan = train_set
+        n_folds = len(plan)
+        if plan.ceil is not None:
+            ceil_set = plan
+    else:
+        plan = None
+        n_folds = len(train_set)
+        assert len(train_set) == len(test_set), \
+            'train_set and test_set must have the same length'
+        if ceil_set is not None:
+            assert len(ceil_set) == len(test_set), \
+                'ceil_set and test_set must have the same length'
     if isinstance(models, Model):
         models = [models]
     evaluations = []
     noise_ceil = []
-    for i in range(len(train_set)):
-        train = train_set[i]
-        test = test_set[i]
-        if (train[0].n_rdm == 0 or test[0].n_rdm == 0 or
-                train[0].n_cond <= 2 or test[0].n_cond <= 2):
-            evals = np.empty(len(models)) * np.nan
+    for i in range(n_folds):
+        if plan is None:
+            train = train_set[i]
+            test = test_set[i]
         else:
-            models, evals, _, fitter = \
-                input_check_model(models, None, fitter)
-            for j, model in enumerate(models):
-                theta = fitter[j](model, train[0], method=method,
-                                  pattern_idx=train[1],
-                                  pattern_descriptor=pattern_descriptor)
-                pred = model.predict_rdm(theta)
-                pred = pred.subsample_pattern(by=pattern_descriptor,
-                                              value=test[1])
-                evals[j] = np.mean(compare(pred, test[0], method))
+            train = [plan.get_rdms(rdms, plan.train[i]), plan.train[i][2]]
+            test = [plan.get_rdms(rdms, plan.test[i]), plan.test[i][2]]
+        if _valid_fold(train, test):
+            evals = _eval_fold(models, fitter, train, test, method,
+                               pattern_descriptor)
             if ceil_set is None and calc_noise_ceil:
                 noise_ceil.append(boot_noise_ceiling(
                     rdms.subsample_pattern(by=pattern_descriptor,
                                            value=test[1]),
                     method=method))
+        else:
+            evals = np.empty(len(models)) * np.nan
         evaluations.append(evals)
     evaluations = np.array(evaluations).T  # .T to switch models/set order
-    evaluations = evaluations.reshape((1, len(models), len(train_set)))
+    evaluations = evaluations.reshape((1, len(models), n_folds))
     if ceil_set is not None and calc_noise_ceil:
         noise_ceil = cv_noise_ceiling(rdms, ceil_set, test_set, method=method,
                                       pattern_descriptor=pattern_descriptor)
@@ -447,10 +475,60 @@ def crossval(models, rdms, train_set, test_set, ceil_set=None, method='cosine',
     return result
 
 
+def _valid_fold(train, test):
+    """ whether a fold has RDMs and enough patterns to evaluate models"""
+    return not (train[0].n_rdm == 0 or test[0].n_rdm == 0 or
+                train[0].n_cond <= 2 or test[0].n_cond <= 2)
+
+
+def _eval_fold(models, fitter, train, test, method, pattern_descriptor,
+               shared=None, train_key=None):
+    """ fits the models to the training set of a fold and evaluates them
+    on its test set
+
+    shared is a dict which caches fits and predictions for reuse in other
+    folds. Fits are reused for folds with the same train_key, which must
+    identify the training RDMs and pattern_idx. Predictions are prepared
+    for comparison once per combination of parameters of all models, e.g.
+    only once for models without fitted parameters.
+
+    Returns:
+        numpy.ndarray: mean similarity of each model to the test RDMs
+
+    """
+    models, evals, _, fitter = input_check_model(models, None, fitter)
+    if shared is None:
+        for j, model in enumerate(models):
+            theta = fitter[j](model, train[0], method=method,
+                              pattern_idx=train[1],
+                              pattern_descriptor=pattern_descriptor)
+            pred = model.predict_rdm(theta)
+            pred = pred.subsample_pattern(by=pattern_descriptor,
+                                          value=test[1])
+            evals[j] = np.mean(compare(pred, test[0], method))
+        return evals
+    theta = []
+    for j, model in enumerate(models):
+        fit_key = (j, train_key)
+        if fit_key not in shared['theta']:
+            shared['theta'][fit_key] = fitter[j](
+                model, train[0], method=method, pattern_idx=train[1],
+                pattern_descriptor=pattern_descriptor)
+        theta.append(shared['theta'][fit_key])
+    pred_key = tuple(np.asarray(theta_model).tobytes()
+                     for theta_model in theta)
+    if pred_key not in shared['pred']:
+        shared['pred'][pred_key] = _comparison_plans(
+            models, theta, method, pattern_descriptor)
+    evals[:] = _eval_plans(shared['pred'][pred_key], test[0], test[1])
+    return evals
+
+
 def bootstrap_crossval(models, data, method='cosine', fitter=None,
                        k_pattern=None, k_rdm=None, N=1000, n_cv=2,
                        pattern_descriptor='index', rdm_descriptor='index',
-                       random=True, boot_type='both', use_correction=True):
+                       random=True, boot_type='both', use_correction=True,
+                       n_jobs=None, seed=None, checkpoint=None):
     """evaluates a set of models by k-fold crossvalidation within a bootstrap
 
     Crossvalidation creates variance in the results for a single bootstrap
@@ -507,6 +585,13 @@ def bootstrap_crossval(models, data, method='cosine', fitter=None,
             alternatives: 'rdm', 'pattern'
         use_correction(bool): switch for the correction for the
             variance caused by crossvalidation (default: True)
+        n_jobs(int): number of processes to run the samples in. If given,
+            each sample is seeded from seed, such that the results
+            do not depend on n_jobs. None runs serially on numpy's global
+            random state (default)
+        seed(int): seed for the samples if n_jobs is given
+        checkpoint(String): file to save finished samples to regularly and
+            to resume from, see rsatoolbox.inference.executor.
 
     Returns:
         numpy.ndarray: matrix of evaluations (N x k)
@@ -522,40 +607,18 @@ def bootstrap_crossval(models, data, method='cosine', fitter=None,
         k_rdm = default_k_rdm((1 - 1 / np.exp(1)) * n_rdm)
     if isinstance(models, Model):
         models = [models]
+    if boot_type not in ('both', 'pattern', 'rdm'):
+        raise ValueError('boot_type not understood')
     evaluations = np.empty((N, len(models), k_pattern * k_rdm, n_cv))
     noise_ceil = np.empty((2, N, n_cv))
-    for i_sample in tqdm.trange(N):
-        if boot_type == 'both':
-            sample, rdm_idx, pattern_idx = bootstrap_sample(
-                data,
-                rdm_descriptor=rdm_descriptor,
-                pattern_descriptor=pattern_descriptor)
-        elif boot_type == 'pattern':
-            sample, pattern_idx = bootstrap_sample_pattern(
-                data,
-                pattern_descriptor=pattern_descriptor)
-            rdm_idx = np.unique(data.rdm_descriptors[rdm_descriptor])
-        elif boot_type == 'rdm':
-            sample, rdm_idx = bootstrap_sample_rdm(
-                data,
-                rdm_descriptor=rdm_descriptor)
-            pattern_idx = np.unique(
-                data.pattern_descriptors[pattern_descriptor])
-        else:
-            raise ValueError('boot_type not understood')
-        if len(np.unique(rdm_idx)) >= k_rdm \
-           and len(np.unique(pattern_idx)) >= 3 * k_pattern:
-            for i_rep in range(n_cv):
-                evals, cv_nc = _internal_cv(
-                    models, sample,
-                    pattern_descriptor, rdm_descriptor, pattern_idx,
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep] = cv_nc
-                evaluations[i_sample, :, :, i_rep] = evals[0]
-        else:  # sample does not allow desired crossvalidation
-            evaluations[i_sample, :, :] = np.nan
-            noise_ceil[:, i_sample] = np.nan
+    samples = run_samples(
+        partial(_bootstrap_crossval_sample, models, data, method, fitter,
+                k_pattern, k_rdm, n_cv, pattern_descriptor, rdm_descriptor,
+                boot_type),
+        N, n_jobs=n_jobs, seed=seed, checkpoint=checkpoint)
+    for i_sample, (evals, cv_nc) in enumerate(samples):
+        evaluations[i_sample] = evals
+        noise_ceil[:, i_sample] = cv_nc
     if boot_type == 'both':
         cv_method = 'bootstrap_crossval'
         dof = min(data.n_rdm, data.n_cond) - 1
@@ -600,7 +663,8 @@ def eval_dual_bootstrap_random(
     models, data, method='cosine', fitter=None,
     n_pattern=None, n_rdm=None, N=1000, n_cv=2,
     pattern_descriptor='index', rdm_descriptor='index',
-    random=True, boot_type='both', use_correction=True):
+    random=True, boot_type='both', use_correction=True, n_jobs=None,
+    seed=None, checkpoint=None):
     """evaluates a set of models by a evaluating a few random crossvalidation
     folds per bootstrap.
 
@@ -632,6 +696,13 @@ def eval_dual_bootstrap_random(
             alternatives: 'rdm', 'pattern'
         use_correction(bool): switch for the correction for the
             variance caused by crossvalidation (default: True)
+        n_jobs(int): number of processes to run the samples in. If given,
+            each sample is seeded from seed, such that the results
+            do not depend on n_jobs. None runs serially on numpy's global
+            random state (default)
+        seed(int): seed for the samples if n_jobs is given
+        checkpoint(String): file to save finished samples to regularly and
+            to resume from, see rsatoolbox.inference.executor.
 
     Returns:
         numpy.ndarray: matrix of evaluations (N x k)
@@ -649,60 +720,18 @@ def eval_dual_bootstrap_random(
         n_rdm = int(np.floor(n_rdm_all / k_rdm))
     if isinstance(models, Model):
         models = [models]
+    if boot_type not in ('both', 'pattern', 'rdm'):
+        raise ValueError('boot_type not understood')
     evaluations = np.zeros((N, len(models), n_cv))
     noise_ceil = np.zeros((2, N, n_cv))
-    for i_sample in tqdm.trange(N):
-        if boot_type == 'both':
-            sample, rdm_idx, pattern_idx = bootstrap_sample(
-                data,
-                rdm_descriptor=rdm_descriptor,
-                pattern_descriptor=pattern_descriptor)
-        elif boot_type == 'pattern':
-            sample, pattern_idx = bootstrap_sample_pattern(
-                data,
-                pattern_descriptor=pattern_descriptor)
-            rdm_idx = np.unique(data.rdm_descriptors[rdm_descriptor])
-        elif boot_type == 'rdm':
-            sample, rdm_idx = bootstrap_sample_rdm(
-                data,
-                rdm_descriptor=rdm_descriptor)
-            pattern_idx = np.unique(
-                data.pattern_descriptors[pattern_descriptor])
-        else:
-            raise ValueError('boot_type not understood')
-        if len(np.unique(rdm_idx)) > n_rdm \
-           and len(np.unique(pattern_idx)) >= 3 + n_pattern:
-            train_set, test_set, ceil_set = sets_random(
-                sample,
-                pattern_descriptor=pattern_descriptor,
-                rdm_descriptor=rdm_descriptor,
-                n_pattern=n_pattern, n_rdm=n_rdm, n_cv=n_cv)
-            if n_rdm > 0 or n_pattern > 0:
-                nc = cv_noise_ceiling(
-                    sample, ceil_set, test_set,
-                    method=method,
-                    pattern_descriptor=pattern_descriptor)
-            else:
-                nc = boot_noise_ceiling(
-                    sample,
-                    method=method,
-                    rdm_descriptor=rdm_descriptor)
-            noise_ceil[:, i_sample] = nc
-            for idx in range(len(test_set)):
-                test_set[idx][1] = _concat_sampling(pattern_idx,
-                                                    test_set[idx][1])
-                train_set[idx][1] = _concat_sampling(pattern_idx,
-                                                     train_set[idx][1])
-            cv_result = crossval(
-                models, sample,
-                train_set, test_set,
-                method=method, fitter=fitter,
-                pattern_descriptor=pattern_descriptor,
-                calc_noise_ceil=False)
-            evaluations[i_sample, :, :] = cv_result.evaluations[0]
-        else:  # sample does not allow desired crossvalidation
-            evaluations[i_sample, :, :] = np.nan
-            noise_ceil[:, i_sample] = np.nan
+    samples = run_samples(
+        partial(_dual_bootstrap_random_sample, models, data, method, fitter,
+                n_pattern, n_rdm, n_cv, pattern_descriptor, rdm_descriptor,
+                boot_type),
+        N, n_jobs=n_jobs, seed=seed, checkpoint=checkpoint)
+    for i_sample, (evals, cv_nc) in enumerate(samples):
+        evaluations[i_sample] = evals
+        noise_ceil[:, i_sample] = cv_nc
     if boot_type == 'both':
         cv_method = 'bootstrap_crossval'
         dof = min(data.n_rdm, data.n_cond) - 1
@@ -743,28 +772,490 @@ def eval_dual_bootstrap_random(
     return result
 
 
-def _concat_sampling(sample1, sample2):
-    """ computes an index vector for the sequential sampling with sample1
-    and sample2
+def _comparison_plans(models, theta, method, pattern_descriptor='index'):
+    """ prepares the predictions of models with fixed parameters for
+    repeated comparisons. Consecutive models with the same patterns share
+    one plan, such that each data sample is prepared once per plan.
+
+    Returns:
+        list: (ComparisonPlan, indices to split its rows into models)
+
     """
-    sample_out = [[i_samp1 for i_samp1 in sample1 if i_samp1 == i_samp2]
-                  for i_samp2 in sample2]
-    return sum(sample_out, [])
+    preds = [mod.predict_rdm(theta=theta[j]) for j, mod in enumerate(models)]
+    groups = []
+    for pred in preds:
+        if groups and np.array_equal(
+                groups[-1][0].pattern_descriptors.get(pattern_descriptor),
+                pred.pattern_descriptors.get(pattern_descriptor)):
+            groups[-1].append(pred)
+        else:
+            groups.append([pred])
+    plans = []
+    for group in groups:
+        stacked = RDMs(
+            np.concatenate([pred.get_vectors() for pred in group]),
+            dissimilarity_measure=group[0].dissimilarity_measure,
+            pattern_descriptors=deepcopy(group[0].pattern_descriptors))
+        splits = np.cumsum([pred.n_rdm for pred in group])[:-1]
+        plans.append((ComparisonPlan(stacked, method=method,
+                                     pattern_descriptor=pattern_descriptor),
+                      splits))
+    return plans
+
+
+def _eval_plans(plans, sample, pattern_idx=None, ranked=False):
+    """ mean similarity of each model's prediction to the sample"""
+    evaluations = []
+    for plan, splits in plans:
+        sim = plan.compare(sample, pattern_idx, ranked=ranked)
+        evaluations += [np.mean(sim_model)
+                        for sim_model in np.split(sim, splits)]
+    return evaluations
+
+
+def _eval_bootstrap_samples(models, evaluations, theta, data, method, N,
+                            pattern_descriptor='index',
+                            rdm_descriptor='index', boot_noise_ceil=True,
+                            boot_rdm=True, boot_pattern=True, n_jobs=None,
+                            seed=None, checkpoint=None, stop=None,
+                            batch_size=100):
+    """ evaluates models on N bootstrap samples of the data, which are
+    drawn as in bootstrap_sample, bootstrap_sample_rdm or
+    bootstrap_sample_pattern. Only the indices of each sample are drawn and
+    the data vectors (or ranks) are gathered directly. RDMs objects are only
+    created for bootstrapping the noise ceiling.
+
+    Fills evaluations in place. Pattern samples with fewer than 3 distinct
+    patterns are nan. If stop is given (see _bootstrap_stop), it is checked
+    after every batch_size samples and may end the bootstrap early.
+
+    Returns:
+        n_samples: number of samples evaluated
+        noise_min, noise_max: lists of noise ceilings per sample,
+            empty if boot_noise_ceil is False
+
+    """
+    plans = _comparison_plans(models, theta, method, pattern_descriptor)
+    ranks = _rank_cache(data, method)
+    samples = run_samples(
+        partial(_eval_bootstrap_sample, plans, ranks, data, method,
+                pattern_descriptor, rdm_descriptor, boot_noise_ceil,
+                boot_rdm, boot_pattern),
+        N, n_jobs=n_jobs, seed=seed, checkpoint=checkpoint,
+        stop=None if stop is None else (
+            lambda samples: stop(*_stack_samples(samples, len(models)))),
+        batch_size=batch_size, fingerprint=(models, theta))
+    sample_evaluations, noise_ceil = _stack_samples(samples, len(models))
+    evaluations[:len(samples)] = sample_evaluations
+    if not boot_noise_ceil:
+        return len(samples), [], []
+    return len(samples), list(noise_ceil[0]), list(noise_ceil[1])
+
+
+def _stack_samples(samples, n_model):
+    """ evaluations and noise ceilings of the results of
+    _eval_bootstrap_sample as arrays, samples x models and 2 x samples"""
+    evaluations = np.array([np.broadcast_to(sample[0], n_model)
+                            for sample in samples]).reshape(-1, n_model)
+    noise_ceil = np.array([sample[1:] for sample in samples]).reshape(-1, 2).T
+    return evaluations, noise_ceil
+
+
+def _bootstrap_stop(tol, boot_noise_ceil):
+    """ stopping rule of a sequential bootstrap, None for tol None.
+
+    The rule is called with the evaluations and noise ceilings of the
+    samples so far and returns True once their Monte Carlo error is below
+    tol. The noise ceilings enter only if they are bootstrapped.
+    """
+    if tol is None:
+        return None
+
+    def stop(evaluations, noise_ceil):
+        return bootstrap_mc_error(
+            evaluations, noise_ceil if boot_noise_ceil else None) <= tol
+    return stop
+
+
+def _eval_bootstrap_sample(plans, ranks, data, method, pattern_descriptor,
+                           rdm_descriptor, boot_noise_ceil, boot_rdm,
+                           boot_pattern):
+    """ draws and evaluates one sample of _eval_bootstrap_samples
+
+    Returns:
+        evaluations, noise_min, noise_max
+
+    """
+    rdm_idx, pattern_idx = bootstrap_sample_idx(
+        data, rdm_descriptor, pattern_descriptor,
+        boot_rdm=boot_rdm, boot_pattern=boot_pattern)
+    if pattern_idx is not None and len(np.unique(pattern_idx)) < 3:
+        return np.nan, np.nan, np.nan
+    rows = None
+    if rdm_idx is not None:
+        rows = _selection(data.rdm_descriptors[rdm_descriptor], rdm_idx)
+    selection = None
+    if pattern_idx is not None:
+        selection = np.sort(_selection(
+            data.pattern_descriptors[pattern_descriptor], pattern_idx))
+    sample = None
+    if ranks is None or boot_noise_ceil:
+        sample = _subsample_vectors(data.get_vectors(), data.n_cond, rows,
+                                    selection)
+    if ranks is None:
+        evaluations = _eval_plans(plans, sample, pattern_idx)
+    else:
+        evaluations = _eval_plans(
+            plans, ranks.get_ranks(rdm_descriptor, rdm_idx,
+                                   pattern_descriptor, pattern_idx),
+            pattern_idx, ranked=True)
+    if not boot_noise_ceil:
+        return evaluations, np.nan, np.nan
+    sample = RDMs(
+        sample,
+        dissimilarity_measure=data.dissimilarity_measure,
+        descriptors=data.descriptors,
+        rdm_descriptors=(data.rdm_descriptors if rows is None else
+                         extract_dict(data.rdm_descriptors, rows)),
+        pattern_descriptors=(
+            data.pattern_descriptors if selection is None else
+            extract_dict(data.pattern_descriptors, selection)))
+    noise_min, noise_max = boot_noise_ceiling(
+        sample, method=method, rdm_descriptor=rdm_descriptor)
+    return evaluations, noise_min, noise_max
+
+
+def _bootstrap_function(vectorized):
+    """ the function computing the bootstrap evaluations"""
+    if vectorized:
+        return _eval_bootstrap_weighted
+    return _eval_bootstrap_samples
+
+
+def _eval_bootstrap_weighted(models, evaluations, theta, data, method, N,
+                             pattern_descriptor='index',
+                             rdm_descriptor='index', boot_noise_ceil=True,
+                             boot_rdm=True, boot_pattern=True, n_jobs=None,
+                             seed=None, checkpoint=None, stop=None,
+                             batch_size=100):
+    """ computes the same bootstrap as _eval_bootstrap_samples for the
+    cosine and corr methods without a loop over samples.
+
+    A sample is described by how often each RDM and each pattern is drawn.
+    Repeating an RDM weights its similarities in the mean, repeating the
+    patterns a and b weights the dissimilarity (a, b) by the product of
+    their counts. All (centered) inner products of the model and data RDMs
+    are thus products with the count matrix, from which the evaluations
+    and the noise ceilings follow in closed form.
+
+    Fills evaluations in place. If n_jobs is given, the counts are drawn
+    per sample with the seeds of run_samples, which yields the samples of
+    _eval_bootstrap_samples. The computation itself is not split.
+    If stop is given, the counts of all N samples are drawn, but stop is
+    checked after every batch_size samples as in _eval_bootstrap_samples
+    and may end the computation early.
+
+    Returns:
+        n_samples: number of samples evaluated
+        noise_min, noise_max: noise ceilings per sample,
+            empty if boot_noise_ceil is False
+
+    """
+    info = get_method(method)
+    if info.pool not in ('cosine', 'corr') or info.whiten:
+        raise ValueError('vectorized bootstrap is only available for the '
+                         '\'cosine\' and \'corr\' methods')
+    draw_counts = partial(
+        bootstrap_counts, data, rdm_descriptor=rdm_descriptor,
+        pattern_descriptor=pattern_descriptor, boot_rdm=boot_rdm,
+        boot_pattern=boot_pattern)
+    if n_jobs is None:
+        rdm_counts, pattern_counts = draw_counts(N)
+    else:
+        samples = run_samples(partial(draw_counts, 1), N, n_jobs=1,
+                              seed=seed, progress=False)
+        rdm_counts, pattern_counts = [
+            np.concatenate(counts) if boot else None
+            for counts, boot in zip(zip(*samples), (boot_rdm, boot_pattern))]
+    preds = [mod.predict_rdm(theta=theta[j]) for j, mod in enumerate(models)]
+    if boot_pattern:
+        for pred in preds:
+            if not np.array_equal(
+                    pred.pattern_descriptors.get(pattern_descriptor),
+                    data.pattern_descriptors.get(pattern_descriptor)):
+                raise ValueError('vectorized pattern bootstrap requires '
+                                 'models with the patterns of the data')
+    data_vectors = data.get_vectors()
+    valid = ~np.isnan(data_vectors[0])
+    vectors = np.concatenate(
+        [pred.get_vectors() for pred in preds] + [data_vectors])
+    vectors = vectors[:, valid].astype(np.float64)
+    if np.any(np.isnan(vectors)):
+        raise ValueError('vectorized bootstrap requires all RDMs to have '
+                         'the same nan positions')
+    n_model_rdm = len(vectors) - data.n_rdm
+    splits = np.cumsum([pred.n_rdm for pred in preds])[:-1]
+    _, rdm_groups = np.unique(data.rdm_descriptors[rdm_descriptor],
+                              return_inverse=True)
+    if boot_rdm:
+        weights = rdm_counts[:, rdm_groups]
+    else:
+        weights = np.ones((1, data.n_rdm))
+    groups = np.eye(rdm_groups.max() + 1)[rdm_groups]
+    if boot_pattern:
+        _, pattern_groups = np.unique(
+            data.pattern_descriptors[pattern_descriptor], return_inverse=True)
+        idx_1, idx_2 = np.triu_indices(data.n_cond, 1)
+        idx_1, idx_2 = idx_1[valid], idx_2[valid]
+        eval_ok = np.count_nonzero(pattern_counts, axis=1) >= 3
+        chunk_size = max(1, 2 ** 20 // vectors.size)
+    else:
+        gram = _weighted_gram(vectors, np.ones((1, vectors.shape[1])),
+                              info.center)
+        eval_ok = np.ones(N, bool)
+        chunk_size = N
+    bounds = set(range(0, N, chunk_size))
+    if stop is not None:
+        bounds |= set(range(0, N, batch_size))
+    bounds = sorted(bounds) + [N]
+    n_samples = N
+    noise_min = np.full(N, np.nan)
+    noise_max = np.full(N, np.nan)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        chunk = slice(start, end)
+        if boot_pattern:
+            counts = pattern_counts[chunk][:, pattern_groups]
+            gram = _weighted_gram(vectors, counts[:, idx_1] * counts[:, idx_2],
+                                  info.center)
+        chunk_weights = weights[chunk] if boot_rdm else weights
+        norms = np.sqrt(np.einsum('bii->bi', gram))
+        sim = gram[:, :n_model_rdm, n_model_rdm:] \
+            / norms[:, :n_model_rdm, None] / norms[:, None, n_model_rdm:]
+        sim = np.einsum('brj,bj->br', np.broadcast_to(
+            sim, (chunk.stop - chunk.start,) + sim.shape[1:]),
+            np.broadcast_to(chunk_weights, (chunk.stop - chunk.start,
+                                            data.n_rdm)))
+        sim = sim / chunk_weights.sum(1, keepdims=True)
+        evaluations[chunk] = np.stack(
+            [np.mean(sim_model, axis=1)
+             for sim_model in np.split(sim, splits, axis=1)], axis=1)
+        if boot_noise_ceil:
+            noise_min[chunk], noise_max[chunk] = _gram_noise_ceiling(
+                gram[:, n_model_rdm:, n_model_rdm:], chunk_weights, groups)
+        evaluations[chunk][~eval_ok[chunk]] = np.nan
+        noise_min[chunk][~eval_ok[chunk]] = np.nan
+        noise_max[chunk][~eval_ok[chunk]] = np.nan
+        if (stop is not None and end % batch_size == 0
+                and stop(evaluations[:end], np.array([noise_min[:end],
+                                                      noise_max[:end]]))):
+            n_samples = end
+            break
+    if not boot_noise_ceil:
+        return n_samples, [], []
+    return n_samples, noise_min[:n_samples], noise_max[:n_samples]
+
+
+def _weighted_gram(vectors, pair_weights, center):
+    """ inner products of the vectors for each row of pair_weights, which
+    weight the entries of the vectors. With center, the vectors are
+    centered by their weighted mean first.
+
+    Returns:
+        numpy.ndarray: n_weights x n_vectors x n_vectors
+
+    """
+    if center:
+        # reduces cancellation, does not change the centered products
+        vectors = vectors - np.mean(vectors, axis=1, keepdims=True)
+    n_vectors = len(vectors)
+    gram = ((pair_weights[:, None, :] * vectors).reshape(-1, vectors.shape[1])
+            @ vectors.T).reshape(-1, n_vectors, n_vectors)
+    if center:
+        sums = pair_weights @ vectors.T
+        gram -= sums[:, :, None] * sums[:, None, :] \
+            / pair_weights.sum(1).reshape(-1, 1, 1)
+    return gram
+
+
+def _rank_cache(data, method):
+    """ ranks the data once for rank based methods, which can use these
+    ranks directly, None otherwise"""
+    info = get_method(method)
+    if info.ranked and info.prepare is not None:
+        return RankCache(data)
+    return None
+
+
+def _draw_sample(data, boot_type, rdm_descriptor, pattern_descriptor):
+    """ draws a bootstrap sample over rdms, patterns or both
+
+    Returns:
+        sample, rdm_idx, pattern_idx
+
+    """
+    if boot_type == 'both':
+        sample, rdm_idx, pattern_idx = bootstrap_sample(
+            data,
+            rdm_descriptor=rdm_descriptor,
+            pattern_descriptor=pattern_descriptor)
+    elif boot_type == 'pattern':
+        sample, pattern_idx = bootstrap_sample_pattern(
+            data,
+            pattern_descriptor=pattern_descriptor)
+        rdm_idx = np.unique(data.rdm_descriptors[rdm_descriptor])
+    elif boot_type == 'rdm':
+        sample, rdm_idx = bootstrap_sample_rdm(
+            data,
+            rdm_descriptor=rdm_descriptor)
+        pattern_idx = np.unique(
+            data.pattern_descriptors[pattern_descriptor])
+    else:
+        raise ValueError('boot_type not understood')
+    return sample, rdm_idx, pattern_idx
+
+
+def _dual_bootstrap_sample(models, data, method, fitter, k_pattern, k_rdm,
+                           n_cv, pattern_descriptor, rdm_descriptor):
+    """ draws and evaluates one sample of eval_dual_bootstrap
+
+    Returns:
+        evaluations (models x folds x n_cv x 3),
+        noise ceilings (2 x n_cv x 3)
+
+    """
+    evaluations = np.full((len(models), k_pattern * k_rdm, n_cv, 3), np.nan)
+    noise_ceil = np.full((2, n_cv, 3), np.nan)
+    rdm_idx, pattern_idx = bootstrap_sample_idx(
+        data, rdm_descriptor, pattern_descriptor)
+    if len(np.unique(rdm_idx)) >= k_rdm \
+       and len(np.unique(pattern_idx)) >= 3 * k_pattern:
+        # the three bootstraps resample rdms and patterns, only rdms and
+        # only patterns, each view indexing data with rows and patterns
+        rows = _selection(data.rdm_descriptors[rdm_descriptor], rdm_idx)
+        patterns = np.sort(_selection(
+            data.pattern_descriptors[pattern_descriptor], pattern_idx))
+        views = [
+            (rows, patterns, pattern_idx),
+            (rows, None,
+             np.unique(data.pattern_descriptors[pattern_descriptor])),
+            (None, patterns, pattern_idx)]
+        samples = [_view_rdms(data, view) for view in views]
+        shared = {'theta': {}, 'pred': {}}
+        for i_rep in range(n_cv):
+            for i_view, (sample, view) in enumerate(zip(samples, views)):
+                evals, cv_nc = _internal_cv(
+                    models, sample,
+                    pattern_descriptor, rdm_descriptor, view[2],
+                    k_pattern, k_rdm,
+                    method, fitter, shared=shared, view=view)
+                noise_ceil[:, i_rep, i_view] = cv_nc
+                evaluations[:, :, i_rep, i_view] = evals[0]
+    return evaluations, noise_ceil
+
+
+def _view_rdms(data, view):
+    """ the RDMs of a view (rows, patterns, pattern_idx) of data, i.e.
+    data.subsample over the rows and data.subsample_pattern over the
+    patterns, None for all"""
+    rows, patterns, _ = view
+    return RDMs(
+        _subsample_vectors(data.get_vectors(), data.n_cond, rows=rows,
+                           selection=patterns),
+        dissimilarity_measure=data.dissimilarity_measure,
+        descriptors=data.descriptors,
+        rdm_descriptors=(data.rdm_descriptors if rows is None else
+                         extract_dict(data.rdm_descriptors, rows)),
+        pattern_descriptors=(
+            data.pattern_descriptors if patterns is None else
+            extract_dict(data.pattern_descriptors, patterns)))
+
+
+def _bootstrap_crossval_sample(models, data, method, fitter, k_pattern,
+                               k_rdm, n_cv, pattern_descriptor,
+                               rdm_descriptor, boot_type):
+    """ draws and evaluates one sample of bootstrap_crossval
+
+    Returns:
+        evaluations (models x folds x n_cv), noise ceilings (2 x n_cv)
+
+    """
+    evaluations = np.full((len(models), k_pattern * k_rdm, n_cv), np.nan)
+    noise_ceil = np.full((2, n_cv), np.nan)
+    sample, rdm_idx, pattern_idx = _draw_sample(
+        data, boot_type, rdm_descriptor, pattern_descriptor)
+    if len(np.unique(rdm_idx)) >= k_rdm \
+       and len(np.unique(pattern_idx)) >= 3 * k_pattern:
+        for i_rep in range(n_cv):
+            evals, cv_nc = _internal_cv(
+                models, sample,
+                pattern_descriptor, rdm_descriptor, pattern_idx,
+                k_pattern, k_rdm,
+                method, fitter)
+            noise_ceil[:, i_rep] = cv_nc
+            evaluations[:, :, i_rep] = evals[0]
+    return evaluations, noise_ceil
+
+
+def _dual_bootstrap_random_sample(models, data, method, fitter, n_pattern,
+                                  n_rdm, n_cv, pattern_descriptor,
+                                  rdm_descriptor, boot_type):
+    """ draws and evaluates one sample of eval_dual_bootstrap_random
+
+    Returns:
+        evaluations (models x n_cv), noise ceilings (2 x n_cv)
+
+    """
+    evaluations = np.full((len(models), n_cv), np.nan)
+    noise_ceil = np.full((2, n_cv), np.nan)
+    sample, rdm_idx, pattern_idx = _draw_sample(
+        data, boot_type, rdm_descriptor, pattern_descriptor)
+    if len(np.unique(rdm_idx)) > n_rdm \
+       and len(np.unique(pattern_idx)) >= 3 + n_pattern:
+        plan = sets_random(
+            sample,
+            pattern_descriptor=pattern_descriptor,
+            rdm_descriptor=rdm_descriptor,
+            n_pattern=n_pattern, n_rdm=n_rdm, n_cv=n_cv, as_plan=True,
+            pattern_sample=pattern_idx)
+        if n_rdm > 0 or n_pattern > 0:
+            nc = cv_noise_ceiling(
+                sample, plan,
+                method=method,
+                pattern_descriptor=pattern_descriptor)
+        else:
+            nc = boot_noise_ceiling(
+                sample,
+                method=method,
+                rdm_descriptor=rdm_descriptor)
+        noise_ceil[:] = nc
+        cv_result = crossval(
+            models, sample, plan,
+            method=method, fitter=fitter,
+            pattern_descriptor=pattern_descriptor,
+            calc_noise_ceil=False)
+        evaluations[:] = cv_result.evaluations[0]
+    return evaluations, noise_ceil
 
 
 def _internal_cv(models, sample,
                  pattern_descriptor, rdm_descriptor, pattern_idx,
                  k_pattern, k_rdm,
-                 method, fitter):
-    """ runs a crossvalidation for use in bootstrap"""
-    train_set, test_set, ceil_set = sets_k_fold(
+                 method, fitter, shared=None, view=None):
+    """ runs a crossvalidation for use in bootstrap
+
+    If sample is a view (rows, patterns, pattern_idx) of the data, the folds
+    share fits and predictions through shared with other views of the same
+    data, see _eval_fold.
+    """
+    plan = sets_k_fold(
         sample,
         pattern_descriptor=pattern_descriptor,
         rdm_descriptor=rdm_descriptor,
-        k_pattern=k_pattern, k_rdm=k_rdm, random=True)
+        k_pattern=k_pattern, k_rdm=k_rdm, random=True, as_plan=True,
+        pattern_sample=pattern_idx)
     if k_rdm > 1 or k_pattern > 1:
         nc = cv_noise_ceiling(
-            sample, ceil_set, test_set,
+            sample, plan,
             method=method,
             pattern_descriptor=pattern_descriptor)
     else:
@@ -772,15 +1263,33 @@ def _internal_cv(models, sample,
             sample,
             method=method,
             rdm_descriptor=rdm_descriptor)
-    for idx in range(len(test_set)):
-        test_set[idx][1] = _concat_sampling(pattern_idx,
-                                            test_set[idx][1])
-        train_set[idx][1] = _concat_sampling(pattern_idx,
-                                             train_set[idx][1])
-    cv_result = crossval(
-        models, sample,
-        train_set, test_set,
-        method=method, fitter=fitter,
-        pattern_descriptor=pattern_descriptor,
-        calc_noise_ceil=False)
-    return cv_result.evaluations, nc
+    if shared is None:
+        cv_result = crossval(
+            models, sample, plan,
+            method=method, fitter=fitter,
+            pattern_descriptor=pattern_descriptor,
+            calc_noise_ceil=False)
+        return cv_result.evaluations, nc
+    evaluations = np.full((1, len(models), len(plan)), np.nan)
+    for i in range(len(plan)):
+        train = [plan.get_rdms(sample, plan.train[i]), plan.train[i][2]]
+        test = [plan.get_rdms(sample, plan.test[i]), plan.test[i][2]]
+        if _valid_fold(train, test):
+            # the training set as indices into the data of all views
+            train_key = tuple(
+                np.asarray(_data_index(view_idx, fold_idx, n)).tobytes()
+                for view_idx, fold_idx, n in [
+                    (view[0], plan.train[i][0], sample.n_rdm),
+                    (view[1], plan.train[i][1], sample.n_cond)]) \
+                + (np.asarray(train[1]).tobytes(),)
+            evaluations[0, :, i] = _eval_fold(
+                models, fitter, train, test, method, pattern_descriptor,
+                shared=shared, train_key=train_key)
+    return evaluations, nc
+
+
+def _data_index(view_idx, fold_idx, n):
+    """ indices into the data of a fold's rows or patterns of a view"""
+    if view_idx is None:
+        return np.arange(n) if fold_idx is None else fold_idx
+    return view_idx if fold_idx is None else view_idx[fold_idx]
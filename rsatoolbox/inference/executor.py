@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Execution of bootstrap samples, serially or in parallel processes
+
+Each sample draws from numpy's global random state, e.g. for resampling,
+for the assignment of crossvalidation folds and for fitting. If n_jobs is
+given, the random state is seeded before every sample with a seed spawned
+for this sample from one numpy.random.SeedSequence. The samples and thus
+the results then do not depend on the number of processes or on the order
+of execution.
+
+Long runs can write the finished samples to a checkpoint file, together
+with the random state or seed needed to continue. Running again with the
+same checkpoint resumes after the last saved sample and yields the same
+results as an uninterrupted run. Each checkpoint holds a fingerprint of
+its run, i.e. N, the name and arguments of the sample function, with models
+by name and data by shape and hash. Resuming a different run raises an
+error. Checkpoints of independent runs, e.g. scheduler jobs with different
+seeds, can be merged into one.
+
+Sequential runs pass a stopping rule, which is checked after every batch of
+samples. The run then ends as soon as enough samples are finished, e.g. once
+the statistics computed from them are precise enough.
+"""
+
+import hashlib
+import os
+import time
+from functools import partial
+import numpy as np
+import tqdm
+from joblib import Parallel, delayed, effective_n_jobs
+from rsatoolbox.util.file_io import write_dict_pkl
+from rsatoolbox.util.file_io import read_dict_pkl
+
+
+def run_samples(function, N, n_jobs=None, seed=None, chunk_size=None,
+                progress=True, checkpoint=None, checkpoint_interval=60,
+                stop=None, batch_size=100, fingerprint=None):
+    """ runs function() once for each of N samples
+
+    Large arrays passed to the processes, e.g. within a partial of
+    function, are memory-mapped and shared read-only.
+
+    If checkpoint is given and the file exists, the samples saved in it are
+    not run again. For this, the checkpoint must come from a run with the
+    same N, function and fingerprint, the same n_jobs mode (None or not)
+    and the same seed. A merged checkpoint is only read, N must not exceed
+    its number of samples.
+
+    Args:
+        function(callable): computes one sample. Must be picklable
+            for n_jobs other than 1, e.g. a functools.partial of a
+            module level function
+        N(int): number of samples
+        n_jobs(int): number of processes, -1 for all processors.
+            None runs the samples serially on numpy's global random
+            state as it is
+        seed(int or numpy.random.SeedSequence): seed for the samples if
+            n_jobs is given, None draws fresh entropy
+        chunk_size(int): number of samples per task,
+            default: 4 tasks per process
+        progress(bool): whether to show a progress bar
+        checkpoint(String): path of a checkpoint file to resume from and
+            to save finished samples to
+        checkpoint_interval(float): minimum time in seconds between
+            writes of the checkpoint. It is always written at the end
+        stop(callable): stopping rule, called with the list of finished
+            results after every batch_size samples. The run ends early
+            if it returns True. None runs all N samples
+        batch_size(int): number of samples between calls of stop
+        fingerprint: further description of the run which a checkpoint
+            must match, e.g. the models of objects prepared from them.
+            Described like the arguments of function
+
+    Returns:
+        list: the results of function for the finished samples, in order.
+        These are N samples unless stop ended the run early
+
+    """
+    if checkpoint is not None:
+        fingerprint = _fingerprint(function, N, fingerprint)
+    saved = _resume(checkpoint, n_jobs, seed, fingerprint)
+    seed = saved['seed']
+    results = saved['results'][:N]
+    last_write = time.time()
+    next_check = (len(results) // batch_size + 1) * batch_size
+
+    def stopped():
+        # checks exactly after each batch, such that the number of samples
+        # does not depend on the chunks run in parallel
+        nonlocal next_check
+        while stop is not None and len(results) >= next_check:
+            if stop(results[:next_check]):
+                del results[next_check:]
+                return True
+            next_check += batch_size
+        return False
+
+    def save(force=False):
+        nonlocal last_write
+        if checkpoint is not None and not saved['merged'] and (
+                force or time.time() - last_write >= checkpoint_interval):
+            saved['results'] = results
+            if n_jobs is None:
+                saved['random_state'] = np.random.get_state()
+            write_checkpoint(checkpoint, saved)
+            last_write = time.time()
+
+    with tqdm.tqdm(total=N, initial=len(results),
+                   disable=not progress) as progress_bar:
+        if n_jobs is None:
+            if saved['random_state'] is not None and len(results) < N:
+                np.random.set_state(saved['random_state'])
+            for _ in range(len(results), N):
+                results.append(function())
+                progress_bar.update(1)
+                save()
+                if stopped():
+                    break
+        else:
+            # the children of seed.spawn(N), independent of earlier spawns
+            seeds = [np.random.SeedSequence(
+                seed.entropy, spawn_key=seed.spawn_key + (i,),
+                pool_size=seed.pool_size) for i in range(len(results), N)]
+            if chunk_size is None:
+                chunk_size = max(1, int(np.ceil(
+                    (len(seeds) if stop is None else batch_size)
+                    / 4 / effective_n_jobs(n_jobs))))
+            chunks = [seeds[start:start + chunk_size]
+                      for start in range(0, len(seeds), chunk_size)]
+            chunk_results = Parallel(n_jobs=n_jobs, return_as='generator')(
+                delayed(_run_chunk)(function, chunk) for chunk in chunks)
+            for chunk_result in chunk_results:
+                results += chunk_result
+                progress_bar.update(len(chunk_result))
+                save()
+                if stopped():
+                    # cancels the chunks which are not finished yet
+                    chunk_results.close()
+                    break
+    save(force=True)
+    return results
+
+
+def read_checkpoint(filename):
+    """ reads a checkpoint file of run_samples
+
+    Args:
+        filename(String): path of the checkpoint
+
+    Returns:
+        dict: with entries 'results' (list of finished samples),
+        'seed' (the SeedSequence or None for runs on the global
+        random state), 'random_state' (global random state after the
+        last finished sample or None), 'merged' and 'fingerprint'
+
+    """
+    with open(filename, 'rb') as file:
+        return read_dict_pkl(file)
+
+
+def write_checkpoint(filename, checkpoint):
+    """ writes a checkpoint file of run_samples. The file is replaced
+    at once, such that an interrupted write leaves the previous checkpoint
+
+    Args:
+        filename(String): path of the checkpoint
+        checkpoint(dict): the checkpoint, see read_checkpoint
+
+    """
+    temp_name = filename + '.tmp'
+    with open(temp_name, 'wb') as file:
+        write_dict_pkl(file, checkpoint)
+    os.replace(temp_name, filename)
+
+
+def merge_checkpoints(filenames, filename):
+    """ merges the checkpoints of independent runs into one checkpoint,
+    which contains the samples of all runs in the given order.
+
+    The runs must use different seeds or random states to yield
+    independent samples and must otherwise be equal apart from N. Running
+    a bootstrap with the merged checkpoint and N up to the total number of
+    samples evaluates these samples without drawing new ones.
+
+    Args:
+        filenames(list): paths of the checkpoints to merge
+        filename(String): path of the merged checkpoint
+
+    Returns:
+        int: the total number of samples
+
+    """
+    results = []
+    fingerprints = []
+    for name in filenames:
+        saved = read_checkpoint(name)
+        fingerprints.append(_any_n(saved.get('fingerprint')))
+        if fingerprints[-1] != fingerprints[0]:
+            raise ValueError('checkpoint ' + str(name) + ' was written '
+                             'for a different run than ' + str(filenames[0]))
+        results += saved['results']
+    fingerprint = fingerprints[0] if fingerprints else None
+    write_checkpoint(filename, {'results': results, 'seed': None,
+                                'random_state': None, 'merged': True,
+                                'fingerprint': fingerprint})
+    return len(results)
+
+
+def _resume(checkpoint, n_jobs, seed, fingerprint):
+    """ loads a checkpoint if it exists and checks that it fits the run,
+    returns an empty checkpoint otherwise. A run without a seed continues
+    with the seed of the checkpoint"""
+    if n_jobs is None:
+        seed_sequence = None
+    elif isinstance(seed, np.random.SeedSequence):
+        seed_sequence = seed
+    else:
+        seed_sequence = np.random.SeedSequence(seed)
+    empty = {'results': [], 'seed': seed_sequence, 'random_state': None,
+             'merged': False, 'fingerprint': fingerprint}
+    if checkpoint is None or not os.path.exists(checkpoint):
+        return empty
+    saved = read_checkpoint(checkpoint)
+    if saved['merged']:
+        if saved.get('fingerprint') != _any_n(fingerprint):
+            raise ValueError('checkpoint ' + str(checkpoint) + ' was '
+                             'written for a different run')
+        # merged samples can only be used, not continued
+        if fingerprint['N'] > len(saved['results']):
+            raise ValueError('merged checkpoint ' + str(checkpoint)
+                             + ' contains only '
+                             + str(len(saved['results'])) + ' samples')
+        empty['results'] = saved['results']
+        empty['merged'] = True
+        return empty
+    if saved.get('fingerprint') != fingerprint:
+        raise ValueError('checkpoint ' + str(checkpoint) + ' was written '
+                         'for a different run')
+    if (n_jobs is None) != (saved['seed'] is None):
+        raise ValueError('checkpoint ' + str(checkpoint) + ' was written '
+                         'with a different n_jobs mode')
+    if seed is not None and n_jobs is not None and (
+            (seed_sequence.entropy, seed_sequence.spawn_key)
+            != (saved['seed'].entropy, saved['seed'].spawn_key)):
+        raise ValueError('checkpoint ' + str(checkpoint)
+                         + ' was written with a different seed')
+    return saved
+
+
+def _fingerprint(function, N, fingerprint=None):
+    """ describes a run of run_samples for the checks of checkpoints"""
+    return {'N': N, 'function': _describe(function),
+            'fingerprint': _describe(fingerprint)}
+
+
+def _any_n(fingerprint):
+    """ a fingerprint with N removed, as used for merged checkpoints"""
+    if fingerprint is None:
+        return None
+    return dict(fingerprint, N=None)
+
+
+def _describe(value):
+    """ a comparable description of an argument of the sample function.
+    Models are described by their name, data and arrays by their shape and
+    a hash, functions by their name and other objects by their type"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return ('array', value.shape, _describe(value.tolist()))
+        value = np.ascontiguousarray(value)
+        return ('array', value.shape, str(value.dtype),
+                hashlib.sha1(value.view(np.uint8)).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return tuple(_describe(val) for val in value)
+    if isinstance(value, dict):
+        return tuple((key, _describe(val)) for key, val in value.items())
+    if isinstance(value, partial):
+        return (_describe(value.func), _describe(value.args),
+                _describe(value.keywords))
+    if hasattr(value, 'predict_rdm'):
+        return ('model', value.name)
+    if hasattr(value, 'get_vectors'):
+        return (type(value).__name__, _describe(value.get_vectors()))
+    if hasattr(value, 'measurements'):
+        return (type(value).__name__, _describe(value.measurements))
+    if callable(value) and hasattr(value, '__qualname__'):
+        return (getattr(value, '__module__', None), value.__qualname__)
+    return type(value).__name__
+
+
+def _run_chunk(function, seeds):
+    """ runs function once per seed, seeding the global random state
+    before each call and restoring it afterwards"""
+    state = np.random.get_state()
+    try:
+        results = []
+        for seed in seeds:
+            np.random.seed(seed.generate_state(4))
+            results.append(function())
+    finally:
+        np.random.set_state(state)
+    return results
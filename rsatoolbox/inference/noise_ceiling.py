@@ -6,11 +6,19 @@ calculation of noise ceilings
 
 import numpy as np
 from rsatoolbox.util.inference_util import pool_rdm
+from rsatoolbox.util.pooling import _pool_rule, _pool_vectors
+from rsatoolbox.util.rdm_utils import _selection
+from rsatoolbox.util.rdm_utils import _subsample_vectors
+from rsatoolbox.rdm import RDMs
 from rsatoolbox.rdm import compare
+from rsatoolbox.rdm.compare import get_method
+from rsatoolbox.rdm.compare import _prepare_vectors
+from rsatoolbox.rdm.sparse import SparseRDMs
+from .crossvalsets import FoldPlan
 from .crossvalsets import sets_leave_one_out_rdm
 
 
-def cv_noise_ceiling(rdms, ceil_set, test_set, method='cosine',
+def cv_noise_ceiling(rdms, ceil_set, test_set=None, method='cosine',
                      pattern_descriptor='index'):
     """ calculates the noise ceiling for crossvalidation.
     The upper bound is calculated by pooling all rdms for the appropriate
@@ -21,9 +29,9 @@ def cv_noise_ceiling(rdms, ceil_set, test_set, method='cosine',
     Args:
         rdms(rsatoolbox.rdm.RDMs): complete data
         ceil_set(list): a list of the training RDMs with 2-tuple entries:
-            (RDMs, pattern_idx)
+            (RDMs, pattern_idx), or a FoldPlan with noise ceiling sets
         test_set(list): a list of the test RDMs with 2-tuple entries:
-            (RDMs, pattern_idx)
+            (RDMs, pattern_idx), None if ceil_set is a FoldPlan
         method(string): comparison method to use
         pattern_descriptor(string): descriptor to group patterns
 
@@ -31,26 +39,78 @@ def cv_noise_ceiling(rdms, ceil_set, test_set, method='cosine',
         list: lower nc-bound, upper nc-bound
 
     """
-    assert len(ceil_set) == len(test_set), \
-        'train_set and test_set must have the same length'
-    noise_min = []
-    noise_max = []
-    for i in range(len(ceil_set)):
-        train = ceil_set[i]
-        test = test_set[i]
-        pred_train = pool_rdm(train[0], method=method)
-        pred_train = pred_train.subsample_pattern(by=pattern_descriptor,
-                                                  value=test[1])
-        pred_test = pool_rdm(rdms, method=method)
-        pred_test = pred_test.subsample_pattern(by=pattern_descriptor,
-                                                value=test[1])
-        noise_min.append(np.mean(compare(pred_train, test[0], method)))
-        noise_max.append(np.mean(compare(pred_test, test[0], method)))
-    noise_min = np.mean(np.array(noise_min))
-    noise_max = np.mean(np.array(noise_max))
+    if isinstance(ceil_set, FoldPlan):
+        plan = ceil_set
+        n_folds = len(plan)
+
+        def get_ceil(i):
+            return plan.get_rdms(rdms, plan.ceil[i])
+
+        def get_test(i):
+            return plan.get_vectors(rdms, plan.test[i])
+
+        def get_selection(i, pred):
+            # positions, as pattern_idx may be translated by pattern_sample
+            selection = _positions(plan.test[i][1], rdms.n_cond)
+            if pred is not None:
+                selection = np.searchsorted(
+                    _positions(plan.ceil[i][1], rdms.n_cond), selection)
+            return selection
+    else:
+        assert len(ceil_set) == len(test_set), \
+            'train_set and test_set must have the same length'
+        n_folds = len(test_set)
+
+        def get_ceil(i):
+            return ceil_set[i][0]
+
+        def get_test(i):
+            return test_set[i][0].get_vectors()
+
+        def get_selection(i, pred):
+            if pred is None:
+                pred = rdms
+            return np.sort(_selection(
+                pred.pattern_descriptors[pattern_descriptor],
+                test_set[i][1]))
+    pred_test = pool_rdm(rdms, method=method)
+    # folds with the same test patterns are compared together
+    folds = {}
+    for i in range(n_folds):
+        folds.setdefault(tuple(get_selection(i, None).tolist()),
+                         []).append(i)
+    noise_min = np.empty(n_folds)
+    noise_max = np.empty(n_folds)
+    for fold_idx in folds.values():
+        preds = [_subsample_vectors(
+            pred_test.get_vectors(), pred_test.n_cond,
+            selection=get_selection(fold_idx[0], None))]
+        for i in fold_idx:
+            pred = pool_rdm(get_ceil(i), method=method)
+            preds.append(_subsample_vectors(
+                pred.get_vectors(), pred.n_cond,
+                selection=get_selection(i, pred)))
+        tests = [get_test(i) for i in fold_idx]
+        sim = compare(RDMs(np.concatenate(preds)),
+                      RDMs(np.concatenate(tests)),
+                      method)
+        splits = np.cumsum([len(test) for test in tests])[:-1]
+        for j, (i, sim_fold) in enumerate(
+                zip(fold_idx, np.split(sim, splits, axis=1))):
+            noise_min[i] = np.mean(sim_fold[j + 1])
+            noise_max[i] = np.mean(sim_fold[0])
+    noise_min = np.mean(noise_min)
+    noise_max = np.mean(noise_max)
     return noise_min, noise_max
 
 
+def _positions(patterns, n_cond):
+    """ the pattern positions of a set of a FoldPlan, None for all"""
+    if patterns is None:
+        return np.arange(n_cond)
+    return patterns
+
+
 def boot_noise_ceiling(rdms, method='cosine', rdm_descriptor='index'):
     """ calculates a noise ceiling by leave one out & full set
 
@@ -63,6 +123,13 @@ def boot_noise_ceiling(rdms, method='cosine', rdm_descriptor='index'):
         list: [lower nc-bound, upper nc-bound]
 
     """
+    if not isinstance(rdms, SparseRDMs):
+        vectors = _pool_vectors(rdms, _pool_rule(method)[0]).astype(
+            np.float64)
+        nan_idx = ~np.isnan(vectors[0])
+        if not np.any(np.isnan(vectors[:, nan_idx])):
+            return _loo_noise_ceiling(rdms, vectors, nan_idx, method,
+                                      rdm_descriptor)
     _, test_set, ceil_set = sets_leave_one_out_rdm(rdms, rdm_descriptor)
     pred_test = pool_rdm(rdms, method=method)
     noise_min = []
@@ -76,3 +143,113 @@ def boot_noise_ceiling(rdms, method='cosine', rdm_descriptor='index'):
     noise_min = np.mean(np.array(noise_min))
     noise_max = np.mean(np.array(noise_max))
     return noise_min, noise_max
+
+
+def _loo_noise_ceiling(rdms, vectors, nan_idx, method, rdm_descriptor):
+    """ boot_noise_ceiling for RDMs with equal nan positions in time
+    linear in the number of RDMs
+
+    Pooling averages the RDM vectors after normalizing each of them. Each
+    leave one out pool is thus the sum over all normalized vectors minus
+    the sum over the left out group. The pools are compared to the RDMs
+    of their left out group only.
+
+    Args:
+        rdms(rsatoolbox.rdm.RDMs): data to calculate noise ceiling
+        vectors(numpy.ndarray): the RDM vectors normalized for pooling,
+            see rsatoolbox.util.pooling._pool_vectors
+        nan_idx(numpy.ndarray): the non-nan entries of the vectors
+        method(string): comparison method to use
+        rdm_descriptor(string): descriptor to group rdms
+
+    Returns:
+        list: [lower nc-bound, upper nc-bound]
+
+    """
+    vectors = vectors[:, nan_idx]
+    _, groups = np.unique(rdms.rdm_descriptors[rdm_descriptor],
+                          return_inverse=True)
+    groups = groups.reshape(-1)
+    order = np.argsort(groups, kind='stable')
+    size = np.bincount(groups)
+    total = np.sum(vectors, axis=0)
+    if len(size) > 1:
+        group_sums = np.add.reduceat(vectors[order],
+                                     np.cumsum(size) - size, axis=0)
+        pools = np.concatenate([
+            (total - group_sums) / (len(vectors) - size).reshape(-1, 1),
+            total.reshape(1, -1) / len(vectors)])
+    else:
+        # a single group is not left out, see sets_leave_one_out_rdm
+        pools = np.tile(total / len(vectors), (2, 1))
+    if _pool_rule(method)[0] == 'corr':
+        pools = pools - np.min(pools, axis=1, keepdims=True)
+    data = rdms.get_vectors()[:, nan_idx]
+    pool_idx = np.stack([np.minimum(groups, len(pools) - 2),
+                         np.full(len(groups), len(pools) - 1)])
+    if get_method(method).prepare is not None:
+        left, _ = _prepare_vectors(pools, method, nan_idx=nan_idx)
+        _, right = _prepare_vectors(
+            data.astype(np.float64, copy=False), method, nan_idx=nan_idx)
+        sim = np.einsum('bjk,jk->bj', left[pool_idx], right)
+    else:
+        pools_full = np.full((len(pools), len(nan_idx)), np.nan)
+        pools_full[:, nan_idx] = pools
+        data_full = np.full((len(data), len(nan_idx)), np.nan)
+        data_full[:, nan_idx] = data
+        sim = np.empty(pool_idx.shape)
+        for rdm_idx in np.split(order, np.cumsum(size)[:-1]):
+            sim[0, rdm_idx] = compare(pools_full[pool_idx[0, rdm_idx[:1]]],
+                                      data_full[rdm_idx], method)
+        sim[1] = compare(pools_full[-1:], data_full, method)
+    # mean over the RDMs of each group, then over groups
+    noise_min, noise_max = np.bincount(
+        np.tile(groups, 2) + np.repeat([0, len(size)], len(groups)),
+        weights=sim.ravel()).reshape(2, -1) @ (1 / size) / len(size)
+    return noise_min, noise_max
+
+
+def _gram_noise_ceiling(gram, weights, groups):
+    """ boot_noise_ceiling for the cosine and corr methods computed from
+    the inner products of the data RDMs, for many samples at once
+
+    For these methods the pooled RDM is the mean of the normalized RDMs,
+    such that its similarity to each RDM is a function of the inner
+    products. Each leave one out pool is the full pool minus the left out
+    group.
+
+    Args:
+        gram(numpy.ndarray): n_samples x n_rdm x n_rdm inner products of
+            the (centered) RDM vectors in each sample, n_samples may be 1
+        weights(numpy.ndarray): n_samples x n_rdm, how often each RDM
+            is contained in each sample, n_samples may be 1
+        groups(numpy.ndarray): n_rdm x n_groups indicator of the
+            rdm_descriptor value of each RDM
+
+    Returns:
+        numpy.ndarray: lower nc-bounds, n_samples
+        numpy.ndarray: upper nc-bounds, n_samples
+
+    """
+    n_samples = max(gram.shape[0], weights.shape[0])
+    gram = np.broadcast_to(gram, (n_samples,) + gram.shape[1:])
+    weights = np.broadcast_to(weights, (n_samples, weights.shape[1]))
+    norms = np.sqrt(np.einsum('bjj->bj', gram))
+    gram = gram / norms[:, :, None] / norms[:, None, :]
+    size = groups.sum(0)
+    counts = weights @ groups / size
+    present = counts > 0
+    sums = np.einsum('bk,bjk->bj', weights, gram)
+    total = np.einsum('bj,bj->b', weights, sums).reshape(-1, 1)
+    group_sums = sums @ groups
+    within = np.einsum('jg,bjg->bg', groups, gram @ groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        upper = group_sums / size / np.sqrt(total)
+        loo_total = total - 2 * counts * group_sums + counts ** 2 * within
+        lower = (group_sums - counts * within) / size / np.sqrt(loo_total)
+        n_present = present.sum(1)
+        noise_min = np.where(present, lower, 0).sum(1) / n_present
+        noise_max = np.where(present, upper, 0).sum(1) / n_present
+    # a single group is not left out, see sets_leave_one_out_rdm
+    noise_min = np.where(n_present == 1, noise_max, noise_min)
+    return noise_min, noise_max
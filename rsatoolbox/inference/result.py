@@ -35,6 +35,11 @@ class Result:
         noise_ceiling(numpy.ndarray):
             noise ceiling such that np.mean(noise_ceiling[0]) is the lower
             bound and np.mean(noise_ceiling[1]) is the higher one.
+        mc_error(float):
+            Monte Carlo error of the bootstrap, i.e. the precision of
+            the variances and bootstrap p-values achieved with the
+            number of bootstrap samples, see
+            rsatoolbox.util.inference_util.bootstrap_mc_error
 
     Attributes:
         as inputs
@@ -42,7 +47,7 @@ class Result:
     """
 
     def __init__(self, models, evaluations, method, cv_method, noise_ceiling,
-                 variances=None, dof=1, fitter=None):
+                 variances=None, dof=1, fitter=None, mc_error=None):
         if isinstance(models, rsatoolbox.model.Model):
             models = [models]
         assert len(models) == evaluations.shape[1], 'evaluations shape does' \
@@ -56,6 +61,7 @@ class Result:
         self.variances = variances
         self.dof = dof
         self.fitter = fitter
+        self.mc_error = mc_error
         self.n_bootstraps = evaluations.shape[0]
         if variances is not None:
             # if the variances only refer to the models this should have the
@@ -163,6 +169,8 @@ class Result:
         result_dict['noise_ceiling'] = self.noise_ceiling
         result_dict['method'] = self.method
         result_dict['cv_method'] = self.cv_method
+        if self.mc_error is not None:
+            result_dict['mc_error'] = self.mc_error
         result_dict['models'] = {}
         for i_model in range(len(self.models)):
             key = 'model_%d' % i_model
@@ -310,6 +318,10 @@ def result_from_dict(result_dict):
         dof = result_dict['dof']
     else:
         dof = None
+    if 'mc_error' in result_dict.keys():
+        mc_error = result_dict['mc_error']
+    else:
+        mc_error = None
     evaluations = result_dict['evaluations']
     method = result_dict['method']
     cv_method = result_dict['cv_method']
@@ -320,4 +332,4 @@ def result_from_dict(result_dict):
         models[i_model] = rsatoolbox.model.model_from_dict(
             result_dict['models'][key])
     return Result(models, evaluations, method, cv_method, noise_ceiling,
-                  variances=variances, dof=dof)
+                  variances=variances, dof=dof, mc_error=mc_error)
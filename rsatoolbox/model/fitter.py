@@ -6,9 +6,9 @@ Parameter fitting methods for models
 
 import numpy as np
 import scipy.optimize as opt
-import scipy.sparse
 from rsatoolbox.rdm import compare
-from rsatoolbox.util.matrix import get_v
+from rsatoolbox.rdm.compare import get_method
+from rsatoolbox.util.matrix import get_v, factorize_v, solve_v
 from rsatoolbox.util.pooling import pool_rdm
 from rsatoolbox.util.rdm_utils import _parse_input_rdms
 
@@ -253,28 +253,12 @@ def fit_regress(model, data, method='cosine', pattern_idx=None,
     y = data_mean.get_vectors()
     vectors, y, nan_idx = _parse_input_rdms(vectors, y)
     # Normalizations
-    if method == 'cosine':
-        v = None
-    elif method == 'corr':
-        vectors = vectors - np.mean(vectors, 1, keepdims=True)
-        v = None
-    elif method == 'cosine_cov':
-        v = get_v(pred.n_cond, sigma_k)
-        v = v[nan_idx[0]][:, nan_idx[0]]
-    elif method == 'corr_cov':
-        vectors = vectors - np.mean(vectors, 1, keepdims=True)
-        y = y - np.mean(y)
-        v = get_v(pred.n_cond, sigma_k)
-        v = v[nan_idx[0]][:, nan_idx[0]]
-    else:
-        raise ValueError('method argument invalid')
-    if v is None:
+    vectors, y, whiten = _regression_normalize(vectors, y, method)
+    if not whiten:
         X = vectors @ vectors.T + ridge_weight * np.eye(vectors.shape[0])
         y = vectors @ y.T
     else:
-        v_inv_x = np.array([scipy.sparse.linalg.cg(v, vectors[i],
-                                                   atol=10 ** -9)[0]
-                            for i in range(vectors.shape[0])])
+        v_inv_x = solve_v(vectors, pred.n_cond, sigma_k, nan_idx[0])
         y = v_inv_x @ y.T
         X = vectors @ v_inv_x.T + ridge_weight * np.eye(vectors.shape[0])
     theta = np.linalg.solve(X, y)
@@ -321,21 +305,12 @@ def fit_regress_nn(model, data, method='cosine', pattern_idx=None,
     y = data_mean.get_vectors()
     vectors, y, nan_idx = _parse_input_rdms(vectors, y)
     # Normalizations
-    if method == 'cosine':
-        v = None
-    elif method == 'corr':
-        vectors = vectors - np.mean(vectors, 1, keepdims=True)
-        v = None
-    elif method == 'cosine_cov':
-        v = get_v(pred.n_cond, sigma_k)
-        v = v[nan_idx[0]][:, nan_idx[0]]
-    elif method == 'corr_cov':
-        vectors = vectors - np.mean(vectors, 1, keepdims=True)
-        y = y - np.mean(y)
+    vectors, y, whiten = _regression_normalize(vectors, y, method)
+    if whiten:
         v = get_v(pred.n_cond, sigma_k)
         v = v[nan_idx[0]][:, nan_idx[0]]
     else:
-        raise ValueError('method argument invalid')
+        v = None
     theta, _ = _nn_least_squares(vectors.T, y[0], ridge_weight=ridge_weight, V=v)
     return theta.flatten() / np.sqrt(np.sum(theta ** 2))
 
@@ -371,6 +346,32 @@ def _loss(theta, model, data, method='cosine', sigma_k=None,
         + np.sum(theta * theta) * ridge_weight
 
 
+def _regression_normalize(vectors, y, method):
+    """Normalizes model and data vectors for fitting by regression, as
+    declared by the comparison method in the registry
+
+    Args:
+        vectors(numpy.ndarray): model RDM vectors without nans
+        y(numpy.ndarray): pooled data RDM vector without nans
+        method(String): comparison method, must be a linear method
+
+    Returns:
+        vectors(numpy.ndarray): normalized model RDM vectors
+        y(numpy.ndarray): normalized data RDM vector
+        whiten(bool): whether the fit must use the whitened inner product
+
+    """
+    info = get_method(method)
+    if not info.linear:
+        raise ValueError('method argument invalid')
+    if info.center:
+        vectors = vectors - np.mean(vectors, 1, keepdims=True)
+        if info.whiten:
+            # the whitened inner product depends on the mean of y as well
+            y = y - np.mean(y)
+    return vectors, y, info.whiten
+
+
 def _nn_least_squares(A, y, ridge_weight=0, V=None):
     """ non-negative least squares
     essentially scipy.optimize.nnls extended to accept a ridge_regression
@@ -397,9 +398,7 @@ def _nn_least_squares(A, y, ridge_weight=0, V=None):
         w = A.T @ y
         ATA = A.T @ A + ridge_weight * np.eye(A.shape[1])
     else:
-        V_A = np.array([scipy.sparse.linalg.cg(V, A[:, i],
-                                               atol=10 ** -9)[0]
-                        for i in range(A.shape[1])])
+        V_A = factorize_v(V)(A).T
         y_V_A = V_A @ y
         w = A.T @ V @ y
         ATA = A.T @ V_A.T + ridge_weight * np.eye(A.shape[1])
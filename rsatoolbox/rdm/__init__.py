@@ -3,6 +3,8 @@ from .rdms import concat
 from .rdms import get_categorical_rdm
 from .rdms import load_rdm
 from .rdms import rdms_from_dict
+from .sparse import SparseRDMs
+from .sparse import sparse_from_rdms
 from .transform import rank_transform
 from .transform import sqrt_transform
 from .transform import positive_transform
@@ -23,3 +25,11 @@ from .compare import compare_rho_a
 from .compare import compare_correlation_cov_weighted
 from .compare import compare_cosine_cov_weighted
 from .compare import compare_neg_riemannian_distance
+from .compare import compare_blocked
+from .compare import ComparisonMethod
+from .compare import register_method
+from .compare import get_method
+from .compare_plan import ComparisonPlan
+from .compare_plan import RankCache
+from .library import RDMIndex
+from .library import load_rdm_index
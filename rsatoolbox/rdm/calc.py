@@ -13,10 +13,12 @@ from rsatoolbox.rdm.rdms import concat
 from rsatoolbox.rdm.combine import from_partials
 from rsatoolbox.data import average_dataset_by
 from rsatoolbox.util.rdm_utils import _extract_triu_
+from rsatoolbox.util.data_utils import compute_dtype
 
 
 def calc_rdm(dataset, method='euclidean', descriptor=None, noise=None,
-             cv_descriptor=None, prior_lambda=1, prior_weight=0.1):
+             cv_descriptor=None, prior_lambda=1, prior_weight=0.1,
+             dtype=None):
     """
     calculates an RDM from an input dataset
 
@@ -36,6 +38,11 @@ def calc_rdm(dataset, method='euclidean', descriptor=None, noise=None,
             precision matrix used to calculate the RDM
             used only for Mahalanobis and Crossnobis estimators
             defaults to an identity matrix, i.e. euclidean distance
+        dtype (numpy.dtype):
+            dtype of the returned dissimilarities, e.g. numpy.float32.
+            Computations run in the precision of the measurements
+            (at least single precision).
+            Defaults to the precision of the computation.
 
     Returns:
         rsatoolbox.rdm.rdms.RDMs: RDMs object with the one RDM
@@ -91,6 +98,8 @@ def calc_rdm(dataset, method='euclidean', descriptor=None, noise=None,
             raise(NotImplementedError)
         if descriptor is not None:
             rdm.sort_by(**{descriptor: 'alpha'})
+    if dtype is not None:
+        rdm.dissimilarities = rdm.dissimilarities.astype(dtype, copy=False)
     return rdm
 
 
@@ -474,7 +483,8 @@ def _calc_pairwise_differences(measurements):
 
 def _parse_input(dataset, descriptor):
     if descriptor is None:
-        measurements = dataset.measurements
+        measurements = dataset.measurements.astype(
+            compute_dtype(dataset.measurements.dtype), copy=False)
         desc = np.arange(measurements.shape[0])
         descriptor = 'pattern'
     else:
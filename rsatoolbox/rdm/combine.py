@@ -4,9 +4,10 @@ from __future__ import annotations
 from copy import deepcopy
 from typing import TYPE_CHECKING, List, Optional, Tuple
 import numpy as np
-from numpy import sqrt, nan, inf, ndarray
-from scipy.spatial.distance import squareform
+from numpy import sqrt, inf, ndarray
 import rsatoolbox.rdm.rdms
+from rsatoolbox.util.data_utils import compute_dtype
+from rsatoolbox.rdm.sparse import SparseRDMs, _pair_mean, _row_sum
 if TYPE_CHECKING:
     from rsatoolbox.rdm.rdms import RDMs
 
@@ -14,7 +15,8 @@ if TYPE_CHECKING:
 def from_partials(
         list_of_rdms: List[RDMs],
         all_patterns: Optional[List[str]] = None,
-        descriptor: str = 'conds') -> RDMs:
+        descriptor: str = 'conds',
+        sparse: bool = False) -> RDMs:
     """Make larger RDMs with missing values where needed
 
     Any object-level descriptors will be turned into rdm_descriptors
@@ -28,6 +30,8 @@ def from_partials(
             pattern descriptor chosen.
         descriptor (str, optional): The pattern descriptor on the basis
             of which to expand. Defaults to 'conds'.
+        sparse (bool, optional): Return a SparseRDMs object, which stores
+            only the observed pairs. Defaults to False.
 
     Returns:
         RDMs: Object containing all input rdms on the larger scale,
@@ -67,26 +71,53 @@ def from_partials(
     rdm_descriptors = dict([(n, [None]*n_rdms) for n in rdm_desc_names])
     measure = None
     vector_len = int(n_patterns * (n_patterns-1) / 2)
-    vectors = np.full((n_rdms, vector_len), np.nan)
+    dtype = compute_dtype(np.result_type(
+        *[rdms.dissimilarities for rdms in list_of_rdms]))
+    if sparse:
+        values = []
+        pair_index = []
+        indptr = [np.zeros(1, int)]
+    else:
+        vectors = np.full((n_rdms, vector_len), np.nan, dtype=dtype)
+    pattern_pos = dict([(p, i) for i, p in enumerate(all_patterns)])
     rdm_id = 0
     for rdms in list_of_rdms:
         measure = rdms.dissimilarity_measure
-        pidx = [all_patterns.index(i) for i in pdescs(rdms, descriptor)]
-        for rdm_local_id, utv in enumerate(rdms.dissimilarities):
-            rdm = np.full((len(all_patterns), len(all_patterns)), np.nan)
-            rdm[np.ix_(pidx, pidx)] = squareform(utv, checks=False)
-            vectors[rdm_id, :] = squareform(rdm, checks=False)
-            for name in rdm_descriptors.keys():
-                if name == 'index':
-                    rdm_descriptors['index'][rdm_id] = rdm_id
-                elif name in rdms.rdm_descriptors:
-                    val = rdms.rdm_descriptors[name][rdm_local_id]
-                    rdm_descriptors[name][rdm_id] = val
-                elif name in rdms.descriptors:
-                    rdm_descriptors[name][rdm_id] = rdms.descriptors[name]
-                else:
-                    rdm_descriptors[name] = None
-            rdm_id += 1
+        pidx = np.array([pattern_pos[i] for i in pdescs(rdms, descriptor)],
+                        dtype=int)
+        source_idx, target_idx = _condensed_index_map(pidx, n_patterns)
+        rdm_ids = slice(rdm_id, rdm_id + rdms.n_rdm)
+        if sparse:
+            source_values = rdms.dissimilarities[:, source_idx]
+            observed = ~np.isnan(source_values)
+            order = np.argsort(target_idx)
+            observed = observed[:, order]
+            values.append(source_values[:, order][observed].astype(dtype))
+            pair_index.append(np.broadcast_to(
+                target_idx[order], observed.shape)[observed])
+            indptr.append(indptr[-1][-1] + np.cumsum(observed.sum(1)))
+        else:
+            vectors[rdm_ids, target_idx] = \
+                rdms.dissimilarities[:, source_idx]
+        for name in rdm_descriptors.keys():
+            if name == 'index':
+                rdm_descriptors['index'][rdm_ids] = range(
+                    rdm_id, rdm_id + rdms.n_rdm)
+            elif name in rdms.rdm_descriptors:
+                rdm_descriptors[name][rdm_ids] = rdms.rdm_descriptors[name]
+            elif name in rdms.descriptors:
+                rdm_descriptors[name][rdm_ids] = \
+                    [rdms.descriptors[name]] * rdms.n_rdm
+        rdm_id += rdms.n_rdm
+    if sparse:
+        return SparseRDMs(
+            np.concatenate(values), np.concatenate(pair_index),
+            np.concatenate(indptr), n_patterns,
+            dissimilarity_measure=measure,
+            descriptors=descriptors,
+            rdm_descriptors=rdm_descriptors,
+            pattern_descriptors=dict([(descriptor, all_patterns)])
+        )
     return rsatoolbox.rdm.RDMs(
         dissimilarities=vectors,
         dissimilarity_measure=measure,
@@ -96,6 +127,31 @@ def from_partials(
     )
 
 
+def _condensed_index_map(pidx: ndarray, n_patterns: int
+                         ) -> Tuple[ndarray, ndarray]:
+    """Maps the entries of a condensed RDM vector over the patterns pidx
+    to the entries of a condensed vector over n_patterns patterns
+
+    Pairs which map onto the diagonal (repeated patterns) are dropped.
+
+    Args:
+        pidx (ndarray): position of each source pattern among all patterns
+        n_patterns (int): number of patterns in the target RDM
+
+    Returns:
+        (ndarray, ndarray): Tuple of the source and target indices
+    """
+    source_i, source_j = np.triu_indices(len(pidx), 1)
+    target_i = np.minimum(pidx[source_i], pidx[source_j])
+    target_j = np.maximum(pidx[source_i], pidx[source_j])
+    valid = target_i != target_j
+    target_i = target_i[valid]
+    target_j = target_j[valid]
+    target_idx = (n_patterns * target_i - target_i * (target_i + 1) // 2
+                  + target_j - target_i - 1)
+    return np.nonzero(valid)[0], target_idx
+
+
 def rescale(rdms, method: str = 'evidence'):
     """Bring RDMs closer together
 
@@ -103,12 +159,16 @@ def rescale(rdms, method: str = 'evidence'):
     Also adds an RDM descriptor with the weights used.
 
     Args:
+        rdms (RDMs or SparseRDMs): the RDMs to rescale
         method (str, optional): One of 'evidence', 'setsize' or
             'simple'. Defaults to 'evidence'.
 
     Returns:
-        RDMs: RDMs object with the aligned RDMs
+        RDMs: RDMs object with the aligned RDMs, SparseRDMs for
+            SparseRDMs input with one array of weights per RDM
     """
+    if isinstance(rdms, SparseRDMs):
+        return _rescale_sparse(rdms, method)
     aligned, weights = _rescale(rdms.dissimilarities, method)
     rdm_descriptors = deepcopy(rdms.rdm_descriptors)
     if weights is not None:
@@ -122,6 +182,60 @@ def rescale(rdms, method: str = 'evidence'):
     )
 
 
+def _rescale_sparse(rdms: SparseRDMs, method: str) -> SparseRDMs:
+    """Rescale SparseRDMs
+
+    Same iteration as _rescale, using only the observed pairs.
+
+    Args:
+        rdms (SparseRDMs): the RDMs to rescale
+        method (str): one of 'evidence', 'setsize' or 'simple'.
+
+    Returns:
+        SparseRDMs: the aligned RDMs
+    """
+    values = rdms.values
+    counts = rdms.get_counts()
+    rows = rdms.get_rows()
+    if method == 'evidence':
+        weights = (values ** 2).clip(0.2 ** 2)
+    elif method == 'setsize':
+        weights = (1 / counts)[rows]
+    else:
+        weights = np.ones(values.shape)
+    scaled = values / sqrt(_row_sum(values ** 2, rdms.indptr))[rows]
+    observed = rdms.get_matrix()
+    observed.data = np.ones(len(values))
+    weighted_scaled = rdms.get_matrix()
+    weighted_scaled.data = scaled * weights
+    weight_sums = np.bincount(rdms.pair_index, weights=weights,
+                              minlength=rdms.n_pairs)
+    any_observed = weight_sums > 0
+
+    def _norms(estimate):
+        """norms of the estimate restricted to each RDM's pairs"""
+        return sqrt(observed @ np.where(any_observed, estimate, 0) ** 2)
+
+    current_estimate = _scale(_pair_mean(values, rdms.pair_index,
+                                         rdms.n_pairs))
+    prev_estimate = np.full([rdms.n_pairs, ], -inf)
+    while _ss(current_estimate - prev_estimate) > 1e-8:
+        prev_estimate = current_estimate
+        with np.errstate(invalid='ignore', divide='ignore'):
+            current_estimate = _scale(
+                (weighted_scaled.T @ _norms(prev_estimate)) / weight_sums)
+    aligned = scaled * _norms(prev_estimate)[rows]
+    rdm_descriptors = deepcopy(rdms.rdm_descriptors)
+    rdm_descriptors['rescalingWeights'] = np.split(weights, rdms.indptr[1:-1])
+    return SparseRDMs(
+        aligned, rdms.pair_index.copy(), rdms.indptr.copy(), rdms.n_cond,
+        dissimilarity_measure=rdms.dissimilarity_measure,
+        descriptors=deepcopy(rdms.descriptors),
+        rdm_descriptors=rdm_descriptors,
+        pattern_descriptors=deepcopy(rdms.pattern_descriptors)
+    )
+
+
 def _mean(vectors: ndarray, weights: ndarray = None) -> ndarray:
     """Weighted mean of RDM vectors, ignores nans
 
@@ -179,23 +293,36 @@ def _rescale(dissim: ndarray, method: str) -> Tuple[ndarray, ndarray]:
         (ndarray, ndarray): Tuple of the aligned dissimilarity vectors
             and the weights used
     """
-    n_rdms, n_conds = dissim.shape
+    n_conds = dissim.shape[1]
+    observed = ~np.isnan(dissim)
     if method == 'evidence':
         weights = (dissim ** 2).clip(0.2 ** 2)
     elif method == 'setsize':
-        setsize = np.isfinite(dissim).sum(axis=1)
-        weights = np.tile(1 / setsize, [n_conds, 1]).T
+        setsize = observed.sum(axis=1)
+        weights = np.repeat((1 / setsize)[:, None], n_conds, axis=1)
     else:
         weights = np.ones(dissim.shape)
-    weights[np.isnan(dissim)] = np.nan
+    weights[~observed] = np.nan
+
+    # the scaled RDMs and the weighting do not change during the iteration,
+    # such that each step reduces to two matrix-vector products
+    observed_float = observed.astype(dissim.dtype)
+    scaled = _scale(dissim)
+    weighted_scaled = np.where(observed, scaled * weights, 0)
+    weight_sums = np.nansum(weights, axis=0)
+    any_observed = weight_sums > 0
+
+    def _norms(estimate):
+        """norms of the estimate restricted to each RDM's pairs"""
+        return sqrt(observed_float @ np.where(any_observed, estimate, 0) ** 2)
 
     current_estimate = _scale(_mean(dissim))
     prev_estimate = np.full([n_conds, ], -inf)
     while _ss(current_estimate - prev_estimate) > 1e-8:
-        prev_estimate = current_estimate.copy()
-        tiled_estimate = np.tile(current_estimate, [n_rdms, 1])
-        tiled_estimate[np.isnan(dissim)] = nan
-        aligned = _scale(dissim) * sqrt(_ss(tiled_estimate))
-        current_estimate = _scale(_mean(aligned, weights))
+        prev_estimate = current_estimate
+        with np.errstate(invalid='ignore', divide='ignore'):
+            current_estimate = _scale(
+                (_norms(prev_estimate) @ weighted_scaled) / weight_sums)
+    aligned = scaled * _norms(prev_estimate)[:, None]
 
     return aligned, weights
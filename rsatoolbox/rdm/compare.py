@@ -5,18 +5,20 @@ Comparison methods for comparing two RDMs objects
 """
 import numpy as np
 import scipy.stats
-from scipy import linalg
+import tqdm
+from joblib import Parallel, delayed, effective_n_jobs
 from scipy.optimize import minimize
-from scipy.stats._stats import _kendall_dis
-from scipy.spatial.distance import squareform
-from rsatoolbox.util.matrix import pairwise_contrast_sparse
+from rsatoolbox.util.matrix import solve_v
 from rsatoolbox.util.matrix import pairwise_contrast
 from rsatoolbox.util.rdm_utils import _get_n_from_reduced_vectors
 from rsatoolbox.util.rdm_utils import _get_n_from_length
+from rsatoolbox.util.rdm_utils import batch_rank
 from rsatoolbox.util.matrix import row_col_indicator_g
+from rsatoolbox.util.data_utils import compute_dtype
+from rsatoolbox.rdm.sparse import SparseRDMs
 
 
-def compare(rdm1, rdm2, method='cosine', sigma_k=None):
+def compare(rdm1, rdm2, method='cosine', sigma_k=None, nan_mode='equal'):
     """calculates the similarity between two RDMs objects using a chosen method
 
     Args:
@@ -47,39 +49,38 @@ def compare(rdm1, rdm2, method='cosine', sigma_k=None):
 
             'neg_riem_dist' = negative riemannian distance
 
+            further methods can be added with register_method
+
+            a function taking two RDM vectors without nans and returning
+            a scalar is applied to all pairs. These pairs are processed in
+            parallel within a :obj:`joblib.parallel_backend` context
+
         sigma_k (numpy.ndarray):
             covariance matrix of the pattern estimates.
             Used only for methods 'corr_cov' and 'cosine_cov'.
 
+        nan_mode (string): how to handle missing dissimilarities:
+
+            'equal' = all RDMs must have the same nan positions.
+            SparseRDMs which observe different pairs are compared
+            pairwise instead, if the method supports it
+
+            'pairwise' = each pair of RDMs is compared over the
+            entries observed in both. Only for methods which support it,
+            i.e. 'cosine', 'corr' and 'spearman'
+
     Returns:
         numpy.ndarray: dist:
             pariwise similarities between the RDMs from the RDMs objects
 
     """
-    if method == 'cosine':
-        sim = compare_cosine(rdm1, rdm2)
-    elif method == 'spearman':
-        sim = compare_spearman(rdm1, rdm2)
-    elif method == 'corr':
-        sim = compare_correlation(rdm1, rdm2)
-    elif method == 'kendall' or method == 'tau-b':
-        sim = compare_kendall_tau(rdm1, rdm2)
-    elif method == 'tau-a':
-        sim = compare_kendall_tau_a(rdm1, rdm2)
-    elif method == 'rho-a':
-        sim = compare_rho_a(rdm1, rdm2)
-    elif method == 'corr_cov':
-        sim = compare_correlation_cov_weighted(rdm1, rdm2, sigma_k=sigma_k)
-    elif method == 'cosine_cov':
-        sim = compare_cosine_cov_weighted(rdm1, rdm2, sigma_k=sigma_k)
-    elif method == 'neg_riem_dist':
-        sim = compare_neg_riemannian_distance(rdm1, rdm2, sigma_k=sigma_k)
-    else:
-        raise ValueError('Unknown RDM comparison method requested!')
-    return sim
+    if nan_mode not in ('equal', 'pairwise'):
+        raise ValueError('Unknown nan_mode requested!')
+    return get_method(method).compare(rdm1, rdm2, sigma_k=sigma_k,
+                                      nan_mode=nan_mode)
 
 
-def compare_cosine(rdm1, rdm2):
+def compare_cosine(rdm1, rdm2, nan_mode='equal'):
     """calculates the cosine similarities between two RDMs objects
 
     Args:
@@ -87,17 +88,21 @@ def compare_cosine(rdm1, rdm2):
             first set of RDMs
         rdm2 (rsatoolbox.rdm.RDMs):
             second set of RDMs
+        nan_mode (String):
+            'equal' or 'pairwise', see rsatoolbox.rdm.compare
     Returns:
         numpy.ndarray: dist
             cosine similarity between the two RDMs
 
     """
+    if nan_mode == 'pairwise':
+        return _pairwise_cosine(*_parse_input_pairwise(rdm1, rdm2))
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
     sim = _cosine(vector1, vector2)
     return sim
 
 
-def compare_correlation(rdm1, rdm2):
+def compare_correlation(rdm1, rdm2, nan_mode='equal'):
     """calculates the correlations between two RDMs objects
 
     Args:
@@ -105,11 +110,16 @@ def compare_correlation(rdm1, rdm2):
             first set of RDMs
         rdm2 (rsatoolbox.rdm.RDMs):
             second set of RDMs
+        nan_mode (String):
+            'equal' or 'pairwise', see rsatoolbox.rdm.compare
     Returns:
         numpy.ndarray: dist:
             correlations between the two RDMs
 
     """
+    if nan_mode == 'pairwise':
+        return _pairwise_cosine(*_parse_input_pairwise(rdm1, rdm2),
+                                center=True)
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
     # compute by subtracting the mean and then calculating cosine similarity
     vector1 = vector1 - np.mean(vector1, 1, keepdims=True)
@@ -159,7 +169,7 @@ def compare_correlation_cov_weighted(rdm1, rdm2, sigma_k=None):
     return sim
 
 
-def compare_spearman(rdm1, rdm2):
+def compare_spearman(rdm1, rdm2, nan_mode='equal'):
     """calculates the spearman rank correlations between
     two RDMs objects
 
@@ -168,14 +178,18 @@ def compare_spearman(rdm1, rdm2):
             first set of RDMs
         rdm2 (rsatoolbox.rdm.RDMs):
             second set of RDMs
+        nan_mode (String):
+            'equal' or 'pairwise', see rsatoolbox.rdm.compare
     Returns:
         numpy.ndarray: dist:
             rank correlations between the two RDMs
 
     """
+    if nan_mode == 'pairwise':
+        return _pairwise_spearman(*_parse_input_pairwise(rdm1, rdm2))
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
-    vector1 = np.apply_along_axis(scipy.stats.rankdata, 1, vector1)
-    vector2 = np.apply_along_axis(scipy.stats.rankdata, 1, vector2)
+    vector1 = batch_rank(vector1)
+    vector2 = batch_rank(vector2)
     vector1 = vector1 - np.mean(vector1, 1, keepdims=True)
     vector2 = vector2 - np.mean(vector2, 1, keepdims=True)
     sim = _cosine(vector1, vector2)
@@ -197,8 +211,8 @@ def compare_rho_a(rdm1, rdm2):
 
     """
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
-    vector1 = np.apply_along_axis(scipy.stats.rankdata, 1, vector1)
-    vector2 = np.apply_along_axis(scipy.stats.rankdata, 1, vector2)
+    vector1 = batch_rank(vector1)
+    vector2 = batch_rank(vector2)
     vector1 = vector1 - np.mean(vector1, 1, keepdims=True)
     vector2 = vector2 - np.mean(vector2, 1, keepdims=True)
     n = vector1.shape[1]
@@ -221,7 +235,7 @@ def compare_kendall_tau(rdm1, rdm2):
             kendall-tau correlation between the two RDMs
     """
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
-    sim = _all_combinations(vector1, vector2, _kendall_tau)
+    sim = _all_pairs_kendall(vector1, vector2, variant='b')
     return sim
 
 
@@ -239,18 +253,30 @@ def compare_kendall_tau_a(rdm1, rdm2):
             kendall-tau a between the two RDMs
     """
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
-    sim = _all_combinations(vector1, vector2, _tau_a)
+    sim = _all_pairs_kendall(vector1, vector2, variant='a')
     return sim
 
 
-def compare_neg_riemannian_distance(rdm1, rdm2, sigma_k=None):
+def compare_neg_riemannian_distance(rdm1, rdm2, sigma_k=None,
+                                    n_jobs=None, backend='threading'):
     """calculates the negative Riemannian distance between two RDMs objects.
 
+    The second moment matrices of all RDMs and the whitening of each
+    generalized eigenproblem are computed once. Each optimization starts
+    from the closed form scalings of G1 and sigma_k to G2.
+
     Args:
         rdm1 (rsatoolbox.rdm.RDMs):
             first set of RDMs
         rdm2 (rsatoolbox.rdm.RDMs):
             second set of RDMs
+        sigma_k (numpy.ndarray):
+            covariance matrix of the pattern estimates
+        n_jobs (int):
+            number of parallel jobs over the RDMs in rdm1,
+            None means 1 unless in a :obj:`joblib.parallel_backend` context
+        backend (String):
+            joblib backend, 'threading' or 'loky' for processes
     Returns:
         numpy.ndarray: dist:
             negative Riemannian distance between the two RDMs
@@ -267,17 +293,179 @@ def compare_neg_riemannian_distance(rdm1, rdm2, sigma_k=None):
     T = np.block([
         [np.eye(n_cond - 1), np.zeros((n_cond-1, vector1.shape[1] - n_cond + 1))],
         [0.5 * pairs, np.diag(-0.5 * np.ones(vector1.shape[1] - n_cond + 1))]])
-    vec_G1 = vector1@np.transpose(T)
-    vec_G2 = vector2@np.transpose(T)
+    G1 = _vec_to_g(vector1@np.transpose(T), n_cond)
+    G2 = _vec_to_g(vector2@np.transpose(T), n_cond)
+    # the generalized eigenproblems for G2 become standard ones after
+    # whitening with the inverse cholesky factor of G2
+    L2_inv = np.linalg.inv(np.linalg.cholesky(G2))
+    sigma_k_w = L2_inv @ sigma_k_hat @ np.swapaxes(L2_inv, 1, 2)
+    if effective_n_jobs(n_jobs) == 1:
+        sim = [_riemannian_row(g1, L2_inv, sigma_k_w) for g1 in G1]
+    else:
+        sim = Parallel(n_jobs=n_jobs, backend=backend)(
+            delayed(_riemannian_row)(g1, L2_inv, sigma_k_w) for g1 in G1)
+    return np.array(sim).reshape(len(G1), len(G2))
+
+
+def compare_blocked(rdm1, rdm2, method='cosine', sigma_k=None,
+                    nan_mode='equal', block_size=1024, out=None, top_k=None,
+                    n_jobs=None):
+    """compares two large sets of RDMs tile by tile with bounded memory
+
+    rdm2 is prepared once, rdm1 is processed in blocks of block_size RDMs
+    and each block is compared to block_size RDMs of rdm2 at a time.
+    Instead of the full similarity matrix only the top_k most similar RDMs
+    of rdm2 can be kept for each RDM of rdm1.
+
+    Args:
+        rdm1 (rsatoolbox.rdm.RDMs):
+            first set of RDMs, e.g. searchlight RDMs
+        rdm2 (rsatoolbox.rdm.RDMs):
+            second set of RDMs, e.g. candidate models
+        method (string):
+            comparison method, see rsatoolbox.rdm.compare
+        sigma_k (numpy.ndarray):
+            covariance matrix of the pattern estimates
+        nan_mode (string):
+            'equal' or 'pairwise', see rsatoolbox.rdm.compare
+        block_size (int):
+            number of RDMs per tile along each side
+        out (numpy.ndarray or String):
+            n_rdm1 x n_rdm2 array to write the similarities into, e.g. a
+            numpy.memmap. A file name creates a new .npy memmap.
+            Ignored if top_k is given
+        top_k (int):
+            if given, returns only the top_k most similar RDMs of rdm2
+            for each RDM of rdm1
+        n_jobs (int):
+            number of threads working on separate blocks of rdm1,
+            None means 1 unless in a :obj:`joblib.parallel_backend` context
+
+    Returns:
+        numpy.ndarray: similarities, n_rdm1 x n_rdm2, or if top_k is given:
+        indices and similarities of the best matches, each n_rdm1 x top_k,
+        sorted by decreasing similarity
 
-    sim = _all_combinations(vec_G1, vec_G2, _riemannian_distance, sigma_k_hat)
+    """
+    vectors1 = _get_vectors_2d(rdm1)
+    vectors2 = _get_vectors_2d(rdm2)
+    if not vectors1.shape[1] == vectors2.shape[1]:
+        raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+    n1, n2 = vectors1.shape[0], vectors2.shape[0]
+    if get_method(method).prepare is not None and nan_mode == 'equal':
+        vectors2 = vectors2.astype(compute_dtype(vectors2.dtype), copy=False)
+        nan_idx = ~np.isnan(vectors2[0])
+        if np.any(np.isnan(vectors2[:, nan_idx])) \
+                or not np.all(np.isnan(vectors2[:, ~nan_idx])):
+            raise ValueError('rdm2 contains RDMs with different nan positions')
+        _, right = _prepare_vectors(vectors2[:, nan_idx], method, sigma_k,
+                                    nan_idx)
+
+        def _prepare_rows(rows):
+            vectors = vectors1[rows].astype(
+                compute_dtype(vectors1.dtype), copy=False)
+            vectors_no_nan = vectors[:, nan_idx]
+            if np.any(np.isnan(vectors_no_nan)) \
+                    or not np.all(np.isnan(vectors[:, ~nan_idx])):
+                raise ValueError('rdm1 and rdm2 have different nan positions')
+            left, _ = _prepare_vectors(vectors_no_nan, method, sigma_k,
+                                       nan_idx)
+            return lambda cols: left @ right[cols].T
+    else:
+        def _prepare_rows(rows):
+            return lambda cols: compare(
+                vectors1[rows], vectors2[cols], method=method,
+                sigma_k=sigma_k, nan_mode=nan_mode)
+    col_blocks = [slice(start, min(start + block_size, n2))
+                  for start in range(0, n2, block_size)]
+    row_blocks = [slice(start, min(start + block_size, n1))
+                  for start in range(0, n1, block_size)]
+    if top_k is not None:
+        top_k = min(top_k, n2)
+        idx = np.empty((n1, top_k), dtype=np.intp)
+        sim = np.empty((n1, top_k))
+    elif isinstance(out, str):
+        sim = np.lib.format.open_memmap(out, mode='w+', dtype=np.float64,
+                                        shape=(n1, n2))
+    elif out is None:
+        sim = np.empty((n1, n2))
+    else:
+        if not out.shape == (n1, n2):
+            raise ValueError('out must have shape n_rdm1 x n_rdm2')
+        sim = out
+
+    def _row_block(rows):
+        tile = _prepare_rows(rows)
+        if top_k is None:
+            for cols in col_blocks:
+                sim[rows, cols] = tile(cols)
+            return
+        idx[rows], sim[rows] = _blocked_top_k(tile, col_blocks, top_k)
+
+    if effective_n_jobs(n_jobs) == 1:
+        for rows in row_blocks:
+            _row_block(rows)
+    else:
+        Parallel(n_jobs=n_jobs, backend='threading')(
+            delayed(_row_block)(rows) for rows in row_blocks)
+    if isinstance(sim, np.memmap):
+        sim.flush()
+    if top_k is not None:
+        return idx, sim
     return sim
 
 
-def _all_combinations(vectors1, vectors2, func, *args, **kwargs):
+def _blocked_top_k(tile, col_blocks, top_k):
+    """finds the top_k largest similarities per row over column blocks
+
+    Args:
+        tile (callable):
+            returns the similarities for a slice of columns
+        col_blocks (list):
+            slices of columns to process one at a time
+        top_k (int):
+            number of best matches to keep
+
+    Returns:
+        numpy.ndarray: indices of the best matches, n_rows x top_k
+        numpy.ndarray: their similarities, sorted in decreasing order
+
+    """
+    best_idx = best_sim = None
+    for cols in col_blocks:
+        # merge the current best with the new tile and keep the top_k
+        sim = tile(cols)
+        idx = np.broadcast_to(np.arange(cols.start, cols.stop), sim.shape)
+        if best_idx is not None:
+            sim = np.concatenate([best_sim, sim], axis=1)
+            idx = np.concatenate([best_idx, idx], axis=1)
+        if sim.shape[1] > top_k:
+            keep = np.argpartition(-sim, top_k - 1, axis=1)[:, :top_k]
+            sim = np.take_along_axis(sim, keep, axis=1)
+            idx = np.take_along_axis(idx, keep, axis=1)
+        best_idx, best_sim = idx, sim
+    order = np.argsort(-best_sim, axis=1, kind='stable')
+    return (np.take_along_axis(best_idx, order, axis=1),
+            np.take_along_axis(best_sim, order, axis=1))
+
+
+def _get_vectors_2d(rdm):
+    """returns the vectors of RDMs or an array of vectors as a 2D array"""
+    if isinstance(rdm, np.ndarray):
+        return rdm.reshape(-1, rdm.shape[-1])
+    return rdm.get_vectors()
+
+
+def _all_combinations(vectors1, vectors2, func, *args, n_jobs=None,
+                      backend='threading', chunk_size=None, progress=False,
+                      **kwargs):
     """runs a function func on all combinations of v1 in vectors1
     and v2 in vectors2 and puts the results into an array
 
+    The pairs are processed in chunks of consecutive pairs, which can run
+    in parallel. The results are always in the same order, independent of
+    the number of jobs and the chunk size.
+
     Args:
         vectors1 (numpy.ndarray):
             first set of values
@@ -286,19 +474,121 @@ def _all_combinations(vectors1, vectors2, func, *args, **kwargs):
         func (function):
             function to be applied, should take two input vectors
             and return one scalar
+        n_jobs (int):
+            number of parallel jobs,
+            None means 1 unless in a :obj:`joblib.parallel_backend` context
+        backend (String):
+            joblib backend, 'threading' or 'loky' for processes, which
+            requires func to be picklable
+        chunk_size (int):
+            number of pairs per job, by default the pairs are split into
+            4 chunks per job
+        progress (bool):
+            whether to show a progress bar over the chunks
     Returns:
         numpy.ndarray: value: function result over all pairs
 
     """
-    value = np.empty((len(vectors1), len(vectors2)))
-    k1 = 0
-    for v1 in vectors1:
-        k2 = 0
-        for v2 in vectors2:
-            value[k1, k2] = func(v1, v2, *args, **kwargs)
-            k2 += 1
-        k1 += 1
-    return value
+    n_pairs = len(vectors1) * len(vectors2)
+    jobs = effective_n_jobs(n_jobs)
+    if chunk_size is None:
+        chunk_size = max(1, -(-n_pairs // (4 * jobs)))
+    chunks = [(start, min(start + chunk_size, n_pairs))
+              for start in range(0, n_pairs, chunk_size)]
+    if jobs == 1:
+        results = (_combinations_chunk(vectors1, vectors2, func, start, stop,
+                                       args, kwargs)
+                   for start, stop in chunks)
+    else:
+        results = _parallel_chunks(vectors1, vectors2, func, chunks, args,
+                                   kwargs, n_jobs, backend, jobs)
+    if progress:
+        results = tqdm.tqdm(results, total=len(chunks))
+    value = np.concatenate([np.empty(0)] + list(results))
+    return value.reshape(len(vectors1), len(vectors2))
+
+
+def _parallel_chunks(vectors1, vectors2, func, chunks, args, kwargs,
+                     n_jobs, backend, jobs):
+    """yields the results of _combinations_chunk for the chunks in order,
+    running one chunk per job at a time on the same workers. This reports
+    progress without the generator output of newer joblib versions"""
+    with Parallel(n_jobs=n_jobs, backend=backend) as parallel:
+        for first in range(0, len(chunks), jobs):
+            yield from parallel(
+                delayed(_combinations_chunk)(vectors1, vectors2, func,
+                                             start, stop, args, kwargs)
+                for start, stop in chunks[first:first + jobs])
+
+
+def _combinations_chunk(vectors1, vectors2, func, start, stop, args, kwargs):
+    """applies func to the pairs start to stop of vectors1 x vectors2 in
+    row major order"""
+    n2 = len(vectors2)
+    return np.array([func(vectors1[k // n2], vectors2[k % n2], *args, **kwargs)
+                     for k in range(start, stop)], dtype=float)
+
+
+def _prepare_vectors(vectors, method, sigma_k=None, nan_idx=None,
+                     ranked=False):
+    """prepares RDM vectors for a bilinear comparison method, such that the
+    similarities are left1 @ right2.T. This allows preparing one side of
+    a comparison once and reusing it. Uses the prepare hook of the method
+    in the registry.
+
+    Args:
+        vectors (numpy.ndarray):
+            RDM vectors (2D) without nan entries
+        method (String):
+            comparison method with a prepare hook
+        sigma_k (numpy.ndarray):
+            covariance matrix of the pattern estimates
+        nan_idx (numpy.ndarray):
+            vector of non-nan entries of the full RDM vectors
+        ranked (bool):
+            whether the vectors are ranks already, e.g. from a RankCache
+
+    Returns:
+        left (numpy.ndarray): vectors to use on the left side
+        right (numpy.ndarray): vectors to use on the right side
+
+    """
+    prepare = get_method(method).prepare
+    if prepare is None:
+        raise ValueError('method ' + str(method) + ' cannot be prepared')
+    return prepare(vectors, sigma_k=sigma_k, nan_idx=nan_idx, ranked=ranked)
+
+
+def _prepare_builtin(vectors, method, sigma_k=None, nan_idx=None,
+                     ranked=False):
+    """prepare hook of the bilinear methods defined in this module:
+    'cosine', 'corr', 'spearman', 'rho-a', 'cosine_cov' and 'corr_cov'.
+    See _prepare_vectors for the arguments"""
+    if method in ('spearman', 'rho-a') and not ranked:
+        vectors = batch_rank(vectors)
+    if method in ('corr', 'corr_cov', 'spearman', 'rho-a'):
+        vectors = vectors - np.mean(vectors, 1, keepdims=True)
+    if method in ('cosine', 'corr', 'spearman'):
+        vectors = vectors / np.sqrt(
+            np.einsum('ij,ij->i', vectors, vectors)).reshape((-1, 1))
+        return vectors, vectors
+    elif method == 'rho-a':
+        n = vectors.shape[1]
+        return vectors * (12 / (n ** 3 - n)), vectors
+    elif method in ('cosine_cov', 'corr_cov'):
+        if nan_idx is None:
+            nan_idx = np.ones(vectors.shape[1], bool)
+        if (sigma_k is not None) and (sigma_k.ndim >= 2):
+            n_cond = _get_n_from_reduced_vectors(nan_idx.reshape(1, -1))
+            vectors_m = solve_v(vectors, n_cond, sigma_k, nan_idx)
+            norm = np.sqrt(np.einsum('ij,ij->i', vectors, vectors_m))
+            return vectors_m / norm.reshape((-1, 1)), \
+                vectors / norm.reshape((-1, 1))
+        vectors_m = _cov_weighting(vectors, nan_idx, sigma_k)
+        vectors_m /= np.sqrt(np.einsum('ij,ij->i', vectors_m,
+                                       vectors_m)).reshape((-1, 1))
+        return vectors_m, vectors_m
+    raise ValueError('method ' + str(method) + ' cannot be prepared')
 
 
 def _cosine_cov_weighted_slow(vector1, vector2, sigma_k=None, nan_idx=None):
@@ -322,16 +612,11 @@ def _cosine_cov_weighted_slow(vector1, vector2, sigma_k=None, nan_idx=None):
     """
     if nan_idx is not None:
         n_cond = _get_n_from_reduced_vectors(nan_idx.reshape(1, -1))
-        v = _get_v(n_cond, sigma_k)
-        v = v[nan_idx][:, nan_idx]
     else:
         n_cond = _get_n_from_reduced_vectors(vector1)
-        v = _get_v(n_cond, sigma_k)
-    # compute V^-1 vector1/2 for all vectors by solving Vx = vector1/2
-    vector1_m = np.array([scipy.sparse.linalg.cg(v, vector1[i], atol=0)[0]
-                          for i in range(vector1.shape[0])])
-    vector2_m = np.array([scipy.sparse.linalg.cg(v, vector2[i], atol=0)[0]
-                          for i in range(vector2.shape[0])])
+    # compute V^-1 vector1/2 for all vectors with the cached factorization
+    vector1_m = solve_v(vector1, n_cond, sigma_k, nan_idx)
+    vector2_m = solve_v(vector2, n_cond, sigma_k, nan_idx)
     # compute the inner products v1^T (V^-1 v2) for all combinations
     cos = np.einsum('ij,kj->ik', vector1, vector2_m)
     # divide by sqrt(v1^T (V^-1 v1))
@@ -470,115 +755,336 @@ def _cosine(vector1, vector2):
     return cos
 
 
-def _riemannian_distance(vec_G1, vec_G2, sigma_k):
-    """computes the Riemannian distance between two vectorized second moments
+def _pairwise_cosine(vector1, vector2, center=False):
+    """computes cosine similarities or correlations between all pairs of
+    vectors over the entries which are observed (not nan) in both.
+    All sums over the joint entries are masked matrix products.
 
     Args:
-        vec_G1 (numpy.ndarray):
-            first vectorized second-moment
-        vec_G2 (numpy.ndarray):
-            second vectorized second-moment
+        vector1 (numpy.ndarray):
+            first vectors (2D), nan for missing entries
+        vector2 (numpy.ndarray):
+            second vectors (2D), nan for missing entries
+        center (bool):
+            whether to subtract the means over the joint entries,
+            i.e. compute correlations
+
+    Returns:
+        numpy.ndarray: similarities, nan for pairs without variance
+
+    """
+    mask1 = (~np.isnan(vector1)).astype(vector1.dtype)
+    mask2 = (~np.isnan(vector2)).astype(vector2.dtype)
+    if center:
+        # centering each vector first does not change the correlations,
+        # but avoids cancellation in the sums below
+        vector1 = vector1 - np.nanmean(vector1, 1, keepdims=True)
+        vector2 = vector2 - np.nanmean(vector2, 1, keepdims=True)
+    vector1 = np.nan_to_num(vector1, nan=0.0)
+    vector2 = np.nan_to_num(vector2, nan=0.0)
+    prod = vector1 @ vector2.T
+    sq1 = (vector1 ** 2) @ mask2.T
+    sq2 = mask1 @ (vector2 ** 2).T
+    if center:
+        count = mask1 @ mask2.T
+        sum1 = vector1 @ mask2.T
+        sum2 = mask1 @ vector2.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prod -= sum1 * sum2 / count
+            sq1 -= sum1 ** 2 / count
+            sq2 -= sum2 ** 2 / count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sim = prod / np.sqrt(sq1 * sq2)
+    return sim
 
-        Returns:
-            neg_riem (float):
-                negative riemannian distance
-    """
-    n_cond = _get_n_from_length(len(vec_G1))
-    G1 = np.diag(vec_G1[0:(n_cond-1)])+squareform(vec_G1[(n_cond-1):len(vec_G1)])
-    G2 = np.diag(vec_G2[0:(n_cond-1)])+squareform(vec_G2[(n_cond-1):len(vec_G2)])
-
-    def fun(theta):
-        return np.sqrt((np.log(linalg.eigvalsh(
-            np.exp(theta[0]) * G1 + np.exp(theta[1]) * sigma_k, G2))**2).sum())
-    theta = minimize(fun, (0, 0), method='Nelder-Mead')
-    neg_riem = -1 * theta.fun
-    return neg_riem
 
+def _pairwise_spearman(vector1, vector2):
+    """computes spearman correlations between all pairs of vectors over the
+    entries which are observed (not nan) in both.
 
-def _kendall_tau(vector1, vector2):
-    """computes the kendall-tau between two vectors
+    The ranks depend on the joint entries. Removing entries does not change
+    the order of the remaining ones, such that each vector is sorted only
+    once and its ranks over any set of joint entries are counted from that
+    order. For each nan pattern of the first vectors, all second vectors
+    are ranked in one batch and each first vector is ranked once for all
+    nan patterns of the second vectors.
 
     Args:
         vector1 (numpy.ndarray):
-            first vector
-        vector1 (numpy.ndarray):
-            second vector
+            first vectors (2D), nan for missing entries
+        vector2 (numpy.ndarray):
+            second vectors (2D), nan for missing entries
+
     Returns:
-        tau (float):
-            kendall-tau
+        numpy.ndarray: rank correlations, nan for pairs without variance
 
     """
-    tau = scipy.stats.kendalltau(vector1, vector2).correlation
-    return tau
+    masks1, group1 = np.unique(~np.isnan(vector1), axis=0,
+                               return_inverse=True)
+    masks2, group2 = np.unique(~np.isnan(vector2), axis=0,
+                               return_inverse=True)
+    group1 = group1.reshape(-1)
+    group2 = group2.reshape(-1)
+    ties1 = _tie_groups(vector1)
+    # the second vectors are ranked as a stack through flat indices
+    offset = np.arange(0, vector2.size, vector2.shape[1]).reshape(-1, 1)
+    order2, inverse2, first2, last2 = _tie_groups(vector2)
+    order2 = order2 + group2.reshape(-1, 1) * vector2.shape[1]
+    ties2 = [order2] + [None if t is None else t + offset
+                        for t in (inverse2, first2, last2)]
+    sim = np.empty((vector1.shape[0], vector2.shape[0]))
+    for i_mask, mask1 in enumerate(masks1):
+        joint = mask1 & masks2
+        ranks2 = _masked_ranks(joint, *ties2)
+        sq2 = np.einsum('ij,ij->i', ranks2, ranks2)
+        for row in np.flatnonzero(group1 == i_mask):
+            ranks1 = _masked_ranks(
+                joint, *(None if t is None else t[row] for t in ties1))
+            ranks1 = ranks1[group2]
+            prod = np.einsum('ij,ij->i', ranks1, ranks2)
+            sq1 = np.einsum('ij,ij->i', ranks1, ranks1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sim[row] = prod / np.sqrt(sq1 * sq2)
+    return sim
 
 
-def _tau_a(vector1, vector2):
-    """computes kendall-tau a between two vectors
-    based on modifying scipy.stats.kendalltau
+def _tie_groups(vectors):
+    """sorts vectors and finds the groups of tied values in the sorted
+    order as needed by _masked_ranks. nan entries are sorted last and
+    each forms its own group.
 
     Args:
-        vector1 (numpy.ndarray):
-            first vector
-        vector1 (numpy.ndarray):
-            second vector
+        vectors (numpy.ndarray):
+            vectors (2D), nan for missing entries
+
     Returns:
-        tau (float):
-            kendall-tau a
-
-    """
-    size = vector1.size
-    vector1, vector2 = _sort_and_rank(vector1, vector2)
-    vector2, vector1 = _sort_and_rank(vector2, vector1)
-    dis = _kendall_dis(vector1, vector2)  # discordant pairs
-    obs = np.r_[True, (vector1[1:] != vector1[:-1]) |
-                      (vector2[1:] != vector2[:-1]), True]
-    cnt = np.diff(np.nonzero(obs)[0]).astype('int64', copy=False)
-    ntie = (cnt * (cnt - 1) // 2).sum()  # joint ties
-    xtie, x0, x1 = _count_rank_tie(vector1)     # ties in x, stats
-    ytie, y0, y1 = _count_rank_tie(vector2)     # ties in y, stats
-    tot = (size * (size - 1)) // 2
-    # Note that tot = con + dis + (xtie - ntie) + (ytie - ntie) + ntie
-    #               = con + dis + xtie + ytie - ntie
-    con_minus_dis = tot - xtie - ytie + ntie - 2 * dis
-    tau = con_minus_dis / tot
-    # Limit range to fix computational errors
-    tau = min(1., max(-1., tau))
-    return tau
+        order (numpy.ndarray): sorting indices of each vector
+        inverse (numpy.ndarray): positions of the entries in the order
+        first (numpy.ndarray): first sorted position of each tie group
+        last (numpy.ndarray): last sorted position of each tie group
+            first and last are None if there are no ties
+
+    """
+    n = vectors.shape[1]
+    order = np.argsort(vectors, axis=1, kind='stable')
+    inverse = np.argsort(order, axis=1)
+    x_sorted = np.take_along_axis(vectors, order, axis=1)
+    new_group = np.ones(vectors.shape, bool)
+    new_group[:, 1:] = x_sorted[:, 1:] != x_sorted[:, :-1]
+    if np.all(new_group):
+        return order, inverse, None, None
+    pos = np.broadcast_to(np.arange(n), vectors.shape)
+    first = np.maximum.accumulate(np.where(new_group, pos, 0), axis=1)
+    group_end = np.ones(vectors.shape, bool)
+    group_end[:, :-1] = new_group[:, 1:]
+    last = np.minimum.accumulate(
+        np.where(group_end, pos, n)[:, ::-1], axis=1)[:, ::-1]
+    return order, inverse, first, last
+
+
+def _take(values, index):
+    """indexes the trailing index.ndim axes of values as one flat axis"""
+    return values.reshape(values.shape[:values.ndim - index.ndim] + (-1,))[
+        ..., index]
+
+
+def _masked_ranks(mask, order, inverse, first, last):
+    """average ranks of presorted vectors over the entries selected by mask,
+    centered on their mean and zero for all other entries.
+
+    Either a single vector is ranked for each row of mask, with 1D indices,
+    or a stack of vectors, with indices flattened over the stack.
 
+    Args:
+        mask (numpy.ndarray):
+            entries to rank over, which must exclude the nan entries
+        order, inverse, first, last (numpy.ndarray):
+            sorting and tie groups of the vectors from _tie_groups
 
-def _sort_and_rank(vector1, vector2):
-    """does the sort and rank step of the _tau calculation"""
-    perm = np.argsort(vector2, kind='mergesort')
-    vector1 = vector1[perm]
-    vector2 = vector2[perm]
-    vector2 = np.r_[True, vector2[1:] != vector2[:-1]].cumsum(dtype=np.intp)
-    return vector1, vector2
+    Returns:
+        numpy.ndarray: centered ranks in the original order
 
+    """
+    kept = _take(mask, order)
+    count = np.cumsum(kept, axis=-1, dtype=np.int32)
+    if first is None:
+        before = count - kept
+        end = count
+    else:
+        before = _take(count - kept, first)
+        end = _take(count, last)
+    # average ranks over n entries always have the mean (n + 1) / 2
+    ranks = (before + end - count[..., -1:]) / 2
+    ranks *= kept
+    return _take(ranks, inverse)
 
-def _count_rank_tie(ranks):
-    """ counts tied ranks for kendall-tau calculation"""
-    cnt = np.bincount(ranks).astype('int64', copy=False)
-    cnt = cnt[cnt > 1]
-    return ((cnt * (cnt - 1) // 2).sum(),
-            (cnt * (cnt - 1.) * (cnt - 2)).sum(),
-            (cnt * (cnt - 1.) * (2*cnt + 5)).sum())
 
+def _vec_to_g(vec_G, n_cond):
+    """converts vectorized second moments into a stack of matrices
+
+    Args:
+        vec_G (numpy.ndarray):
+            vectorized second-moments, one per row
+        n_cond (int):
+            number of conditions
+
+    Returns:
+        numpy.ndarray: n x (n_cond - 1) x (n_cond - 1) second moments
+
+    """
+    G = np.zeros((len(vec_G), n_cond - 1, n_cond - 1))
+    diag = np.arange(n_cond - 1)
+    G[:, diag, diag] = vec_G[:, :(n_cond - 1)]
+    row, col = np.triu_indices(n_cond - 1, 1)
+    G[:, row, col] = vec_G[:, (n_cond - 1):]
+    G[:, col, row] = vec_G[:, (n_cond - 1):]
+    return G
+
+
+def _riemannian_row(G1, L2_inv, sigma_k_w):
+    """computes the negative Riemannian distances of one second moment G1
+    to a stack of second moments, given by their inverse cholesky factors
+
+    Args:
+        G1 (numpy.ndarray):
+            second moment matrix
+        L2_inv (numpy.ndarray):
+            inverse cholesky factors of the second moments G2
+        sigma_k_w (numpy.ndarray):
+            sigma_k whitened by each L2_inv
+
+    Returns:
+        numpy.ndarray: negative riemannian distances
+
+    """
+    G1_w = L2_inv @ G1 @ np.swapaxes(L2_inv, 1, 2)
+    # scalings which match G1 or sigma_k alone to G2 in closed form
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_scale = -np.stack([
+            np.mean(np.log(np.linalg.eigvalsh(G1_w)), axis=1),
+            np.mean(np.log(np.linalg.eigvalsh(sigma_k_w)), axis=1)], axis=1)
+    log_scale[~np.isfinite(log_scale)] = 0
+    neg_riem = np.empty(len(G1_w))
+    for i, (g1, s_k) in enumerate(zip(G1_w, sigma_k_w)):
+        def fun(theta):
+            return np.sqrt((np.log(np.linalg.eigvalsh(
+                np.exp(theta[0]) * g1 + np.exp(theta[1]) * s_k))**2).sum())
+        # start with both terms contributing half
+        theta = minimize(fun, log_scale[i] - np.log(2), method='Nelder-Mead')
+        neg_riem[i] = -1 * theta.fun
+    return neg_riem
 
-def _get_v(n_cond, sigma_k):
-    """ get the rdm covariance from sigma_k """
-    # calculate Xi
-    c_mat = pairwise_contrast_sparse(np.arange(n_cond))
-    if sigma_k is None:
-        xi = c_mat @ c_mat.transpose()
-    elif sigma_k.ndim == 1:
-        sigma_k = scipy.sparse.diags(sigma_k)
-        xi = c_mat @ sigma_k @ c_mat.transpose()
-    else:
-        sigma_k = scipy.sparse.csr_matrix(sigma_k)
-        xi = c_mat @ sigma_k @ c_mat.transpose()
-    # calculate V
-    v = xi.multiply(xi).tocsc()
-    return v
+
+def _all_pairs_kendall(vectors1, vectors2, variant='a'):
+    """computes kendall tau a or b for all pairs of vectors.
+
+    Each vector is converted to dense integer ranks and the tie counts are
+    computed once. The pairs are then processed in chunks: sorting the
+    partners of a vector by its ranks yields the joint ties and the
+    discordant pairs as the inversions of the sorted partners, which are
+    counted for all pairs of a chunk at once.
+
+    Args:
+        vectors1 (numpy.ndarray):
+            first set of vectors, n1 x n_pairs
+        vectors2 (numpy.ndarray):
+            second set of vectors, n2 x n_pairs
+        variant (String):
+            'a' for tau-a, 'b' for the tie corrected tau-b
+
+    Returns:
+        numpy.ndarray: n1 x n2 kendall tau values
+
+    """
+    if len(vectors1) > len(vectors2):
+        return _all_pairs_kendall(vectors2, vectors1, variant).T
+    size = vectors1.shape[1]
+    # dense ranks are at most size, joint keys fit into int32 mostly
+    dtype = np.int32 if (size + 1) ** 2 < 2 ** 31 else np.int64
+    ranks1 = batch_rank(vectors1, method='dense').astype(dtype)
+    ranks2 = batch_rank(vectors2, method='dense').astype(dtype)
+    tot = (size * (size - 1)) // 2
+    n_y = ranks2.max(initial=0) + 1
+    xtie = _count_ties(np.sort(ranks1, axis=1))
+    ytie = _count_ties(np.sort(ranks2, axis=1))
+    sim = np.empty((len(ranks1), len(ranks2)))
+    chunk_size = max(1, 2 ** 20 // max(len(ranks2) * size, 1))
+    for start in range(0, len(ranks1), chunk_size):
+        rank_x = ranks1[start:start + chunk_size]
+        # sorted by the ranks of x and within ties of x by the ranks of y
+        joint = np.sort(rank_x[:, None] * n_y + ranks2[None], axis=2)
+        joint = joint.reshape(-1, size)
+        ntie = _count_ties(joint).reshape(len(rank_x), -1)
+        dis = _count_inversions(joint % n_y).reshape(len(rank_x), -1)
+        x_tie = xtie[start:start + chunk_size, None]
+        con_minus_dis = tot - x_tie - ytie + ntie - 2 * dis
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if variant == 'a':
+                sim[start:start + chunk_size] = con_minus_dis / tot
+            else:
+                sim[start:start + chunk_size] = (
+                    con_minus_dis / np.sqrt(tot - x_tie)
+                    / np.sqrt(tot - ytie))
+    # Limit range to fix computational errors
+    return np.clip(sim, -1, 1)
+
+
+def _count_inversions(values):
+    """ counts the pairs i < j with values[:, i] > values[:, j] in each row
+    of an array of non-negative integers, as a merge sort over all rows
+
+    Blocks of 8 are counted directly. Each further level sorts blocks of
+    width 2w, which consist of two sorted halves.
+    Sorting keys value * size + position, an element of the right half is
+    preceded by the smaller or equal elements of the left half, such that
+    the inversions between the halves follow from the merged positions of
+    the right elements. The keys are sorted in place from level to level.
+    """
+    n_rows, n = values.shape
+    # blocks of 8 are counted by comparing all pairs within them
+    size = max(8, 1 << max(n - 1, 0).bit_length())
+    top = int(values.max(initial=0)) + 1
+    # sums of positions must fit as well
+    dtype = np.int32 if max(top + 1, size) * size < 2 ** 31 else np.int64
+    # padding at the end with the largest value adds no inversions
+    keys = np.full((n_rows, size), top, dtype=dtype)
+    keys[:, :n] = values
+    small = keys.reshape(n_rows, -1, 8)
+    inversions = np.zeros(n_rows, np.int64)
+    for i in range(7):
+        inversions += np.count_nonzero(
+            small[:, :, i:i + 1] > small[:, :, i + 1:], axis=(1, 2))
+    keys *= size
+    keys += np.arange(size, dtype=dtype)
+    keys.reshape(-1, 8).sort(axis=1)
+    right = np.empty_like(keys)
+    width, level = 8, 3
+    while width < size:
+        block = 2 * width
+        keys.reshape(-1, block).sort(axis=1)
+        # whether each element comes from the right half of its block
+        np.right_shift(keys, level, out=right)
+        np.bitwise_and(right, 1, out=right)
+        rank_sum = np.einsum('ij,j->i', right,
+                             np.arange(size, dtype=dtype) % block)
+        # inversions of a right element: width minus the left elements
+        # before it, i.e. width - (its merged position - its half position)
+        inversions += ((size // block) * (width * width
+                                          + width * (width - 1) // 2)
+                       - rank_sum)
+        width, level = block, level + 1
+    return inversions
+
+
+def _count_ties(sorted_values):
+    """ counts the tied pairs in each row of a row-wise sorted array"""
+    n = sorted_values.shape[1]
+    pos = np.arange(n)
+    new_run = np.ones(sorted_values.shape, bool)
+    new_run[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    run_start = np.maximum.accumulate(np.where(new_run, pos, 0), axis=1)
+    # each element is tied with all earlier elements of its run
+    return (pos - run_start).sum(axis=1)
 
 
 def _parse_input_rdms(rdm1, rdm2):
@@ -592,6 +1098,8 @@ def _parse_input_rdms(rdm1, rdm2):
             second set of RDMs
 
     """
+    if isinstance(rdm1, SparseRDMs) or isinstance(rdm2, SparseRDMs):
+        return _parse_input_sparse(rdm1, rdm2)
     if not isinstance(rdm1, np.ndarray):
         vector1 = rdm1.get_vectors()
     else:
@@ -608,9 +1116,336 @@ def _parse_input_rdms(rdm1, rdm2):
             vector2 = rdm2
     if not vector1.shape[1] == vector2.shape[1]:
         raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+    # reduced precision RDMs are compared in at least single precision
+    vector1 = vector1.astype(compute_dtype(vector1.dtype), copy=False)
+    vector2 = vector2.astype(compute_dtype(vector2.dtype), copy=False)
     nan_idx = ~np.isnan(vector1)
     vector1_no_nan = vector1[nan_idx].reshape(vector1.shape[0], -1)
     vector2_no_nan = vector2[~np.isnan(vector2)].reshape(vector2.shape[0], -1)
     if not vector1_no_nan.shape[1] == vector2_no_nan.shape[1]:
         raise ValueError('rdm1 and rdm2 have different nan positions')
     return vector1_no_nan, vector2_no_nan, nan_idx[0]
+
+
+def _parse_input_pairwise(rdm1, rdm2):
+    """Gets the full vector representation of input RDMs with nans for
+    missing entries, raises an error if the two RDMs objects have different
+    dimensions. The nan positions may differ between RDMs.
+    For SparseRDMs inputs only the pairs returned by _common_pairs are
+    filled in.
+
+    Args:
+        rdm1 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            first set of RDMs
+        rdm2 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            second set of RDMs
+
+    """
+    pairs = _common_pairs(rdm1, rdm2)
+    vectors = []
+    for rdm in (rdm1, rdm2):
+        if isinstance(rdm, SparseRDMs):
+            vector = rdm.get_vectors(pairs)
+        elif isinstance(rdm, np.ndarray):
+            vector = rdm.reshape(-1, rdm.shape[-1])
+        else:
+            vector = rdm.get_vectors()
+        if pairs is not None and not isinstance(rdm, SparseRDMs):
+            if not vector.shape[1] == _n_pairs(rdm1, rdm2):
+                raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+            vector = vector[:, pairs]
+        vectors.append(vector.astype(compute_dtype(vector.dtype), copy=False))
+    if not vectors[0].shape[1] == vectors[1].shape[1]:
+        raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+    return vectors[0], vectors[1]
+
+
+def _common_pairs(rdm1, rdm2):
+    """Finds the pairs which can enter a pairwise comparison if at least one
+    input is a SparseRDMs object, i.e. the pairs observed by some RDM of
+    each sparse input. All other pairs are dropped without filling them.
+
+    Args:
+        rdm1 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            first set of RDMs
+        rdm2 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            second set of RDMs
+
+    Returns:
+        numpy.ndarray: sorted pair indices, None without sparse inputs
+
+    """
+    pairs = None
+    for rdm in (rdm1, rdm2):
+        if isinstance(rdm, SparseRDMs):
+            if pairs is None:
+                pairs = rdm.get_pairs()
+            else:
+                if not rdm1.n_pairs == rdm2.n_pairs:
+                    raise ValueError(
+                        'rdm1 and rdm2 must be RDMs of equal shape')
+                pairs = np.intersect1d(pairs, rdm.get_pairs(),
+                                       assume_unique=True)
+    return pairs
+
+
+def _n_pairs(rdm1, rdm2):
+    """length of the vectorform of the SparseRDMs among the inputs"""
+    if isinstance(rdm1, SparseRDMs):
+        return rdm1.n_pairs
+    return rdm2.n_pairs
+
+
+def _equal_pairs(rdm1, rdm2):
+    """Checks whether all RDMs observe the same pairs if at least one input
+    is a SparseRDMs object. Dense inputs are always reported as equal,
+    their nan positions are checked by _parse_input_rdms.
+
+    Args:
+        rdm1 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            first set of RDMs
+        rdm2 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            second set of RDMs
+
+    Returns:
+        bool: False if the observed pairs differ between any RDMs
+
+    """
+    if not (isinstance(rdm1, SparseRDMs) or isinstance(rdm2, SparseRDMs)):
+        return True
+    masks = []
+    for rdm in (rdm1, rdm2):
+        if isinstance(rdm, SparseRDMs):
+            if not rdm.has_equal_pairs():
+                return False
+            masks.append(rdm.get_observed()[1])
+        else:
+            if isinstance(rdm, np.ndarray):
+                vector = rdm.reshape(-1, rdm.shape[-1])
+            else:
+                vector = rdm.get_vectors()
+            masks.append(~np.isnan(vector))
+    if not masks[0].shape[-1] == masks[1].shape[-1]:
+        # left for _parse_input_sparse to report
+        return True
+    return not np.any(masks[0] != masks[1])
+
+
+def _parse_input_sparse(rdm1, rdm2):
+    """Gets the vectors over the observed pairs if at least one input is a
+    SparseRDMs object. The stored pair index is used as the mask directly,
+    such that no nan-scan over the full vectors is needed.
+
+    Args:
+        rdm1 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            first set of RDMs
+        rdm2 (rsatoolbox.rdm.RDMs or SparseRDMs):
+            second set of RDMs
+
+    """
+    if isinstance(rdm1, SparseRDMs):
+        vector1, mask = rdm1.get_observed()
+        sparse_other = rdm2
+    else:
+        vector2, mask = rdm2.get_observed()
+        sparse_other = rdm1
+    if isinstance(sparse_other, SparseRDMs):
+        vector_other, mask_other = sparse_other.get_observed()
+        if not mask.shape == mask_other.shape:
+            raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+        if np.any(mask != mask_other):
+            raise ValueError('rdm1 and rdm2 have different nan positions')
+    else:
+        if isinstance(sparse_other, np.ndarray):
+            dense = sparse_other.reshape(-1, sparse_other.shape[-1])
+        else:
+            dense = sparse_other.get_vectors()
+        if not dense.shape[1] == mask.shape[0]:
+            raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+        vector_other = dense[:, mask]
+        if (np.any(np.isnan(vector_other))
+                or not np.all(np.isnan(dense[:, ~mask]))):
+            raise ValueError('rdm1 and rdm2 have different nan positions')
+    if isinstance(rdm1, SparseRDMs):
+        vector2 = vector_other
+    else:
+        vector1 = vector_other
+    vector1 = vector1.astype(compute_dtype(vector1.dtype), copy=False)
+    vector2 = vector2.astype(compute_dtype(vector2.dtype), copy=False)
+    return vector1, vector2, mask
+
+
+class ComparisonMethod:
+    """ a comparison method and its declared capabilities
+
+    Args:
+        name (String):
+            name of the method, as passed to compare
+        function (function):
+            batched kernel, takes two sets of RDMs and returns the
+            n_rdm1 x n_rdm2 similarities. Takes sigma_k and nan_mode as
+            keyword arguments if the method supports them
+        pool (String):
+            how RDMs are pooled to maximize this similarity:
+            'mean', 'cosine' (normalized), 'corr' (standardized)
+            or 'rank' (rank transformed)
+        prepare (function):
+            optional hook for bilinear methods, which returns (left, right)
+            for vectors without nans, such that the similarities are
+            left1 @ right2.T. Called with keyword arguments sigma_k,
+            nan_idx and ranked. Enables ComparisonPlan, compare_blocked
+            and RDMIndex
+        ranked (bool):
+            whether the method depends on the ranks of the dissimilarities
+            only. Enables reusing ranks across bootstrap samples
+        center (bool):
+            whether the method subtracts the mean of each RDM
+        whiten (bool):
+            whether the method whitens with the covariance of the RDM
+            entries
+        sigma_k (bool):
+            whether the method uses the pattern covariance sigma_k
+        nan_pairwise (bool):
+            whether the method supports nan_mode='pairwise'
+        linear (bool):
+            whether the similarity is a normalized inner product, such
+            that models can be fit to it by linear regression
+
+    """
+
+    def __init__(self, name, function, pool='mean', prepare=None,
+                 ranked=False, center=False, whiten=False, sigma_k=False,
+                 nan_pairwise=False, linear=False):
+        if pool not in ('mean', 'cosine', 'corr', 'rank'):
+            raise ValueError('Unknown pooling rule: ' + str(pool))
+        self.name = name
+        self.function = function
+        self.pool = pool
+        self.prepare = prepare
+        self.ranked = ranked
+        self.center = center
+        self.whiten = whiten
+        self.sigma_k = sigma_k
+        self.nan_pairwise = nan_pairwise
+        self.linear = linear
+
+    def __repr__(self):
+        """
+        defines string which is printed for the object
+        """
+        return (f'rsatoolbox.rdm.ComparisonMethod(\n'
+                f'name = {self.name}\n'
+                f'pool = {self.pool}\n'
+                f'prepared = {self.prepare is not None}\n'
+                )
+
+    def compare(self, rdm1, rdm2, sigma_k=None, nan_mode='equal'):
+        """ calculates the similarities between two sets of RDMs
+
+        Args:
+            rdm1 (rsatoolbox.rdm.RDMs):
+                first set of RDMs
+            rdm2 (rsatoolbox.rdm.RDMs):
+                second set of RDMs
+            sigma_k (numpy.ndarray):
+                covariance matrix of the pattern estimates, passed on only
+                if the method uses it
+            nan_mode (string):
+                'equal' or 'pairwise', see compare
+
+        Returns:
+            numpy.ndarray: similarities, n_rdm1 x n_rdm2
+
+        """
+        kwargs = {}
+        if self.sigma_k:
+            kwargs['sigma_k'] = sigma_k
+        if self.nan_pairwise:
+            if nan_mode == 'equal' and not _equal_pairs(rdm1, rdm2):
+                nan_mode = 'pairwise'
+            kwargs['nan_mode'] = nan_mode
+        elif nan_mode == 'pairwise':
+            raise ValueError('nan_mode pairwise is not available for method '
+                             + str(self.name))
+        return self.function(rdm1, rdm2, **kwargs)
+
+
+_METHODS = {}
+
+
+def register_method(name, function, **kwargs):
+    """ adds a comparison method to the registry, which makes it available
+    in compare and to all functions that take a comparison method.
+    Existing methods with the same name are replaced.
+
+    Args:
+        name (String):
+            name of the method
+        function (function):
+            batched kernel, see ComparisonMethod
+        **kwargs:
+            declared capabilities, see ComparisonMethod
+
+    Returns:
+        ComparisonMethod: the registered method
+
+    """
+    method = ComparisonMethod(name, function, **kwargs)
+    _METHODS[name] = method
+    return method
+
+
+def get_method(method):
+    """ looks up a comparison method in the registry
+
+    Args:
+        method (String or function):
+            name of a registered method or a function, which is applied to
+            all pairs of RDM vectors without nans
+
+    Returns:
+        ComparisonMethod: the method with its capabilities
+
+    """
+    if isinstance(method, ComparisonMethod):
+        return method
+    if callable(method):
+        return ComparisonMethod(
+            getattr(method, '__name__', str(method)),
+            lambda rdm1, rdm2: _all_combinations(
+                *_parse_input_rdms(rdm1, rdm2)[:2], method))
+    if method not in _METHODS:
+        raise ValueError('Unknown RDM comparison method requested!')
+    return _METHODS[method]
+
+
+def _prepare_hook(name):
+    """ prepare hook for a bilinear method of this module"""
+    def prepare(vectors, sigma_k=None, nan_idx=None, ranked=False):
+        return _prepare_builtin(vectors, name, sigma_k=sigma_k,
+                                nan_idx=nan_idx, ranked=ranked)
+    return prepare
+
+
+register_method('cosine', compare_cosine, pool='cosine',
+                prepare=_prepare_hook('cosine'), nan_pairwise=True,
+                linear=True)
+register_method('corr', compare_correlation, pool='corr',
+                prepare=_prepare_hook('corr'), center=True,
+                nan_pairwise=True, linear=True)
+register_method('spearman', compare_spearman, pool='rank',
+                prepare=_prepare_hook('spearman'), ranked=True, center=True,
+                nan_pairwise=True)
+register_method('rho-a', compare_rho_a, pool='rank',
+                prepare=_prepare_hook('rho-a'), ranked=True, center=True)
+register_method('kendall', compare_kendall_tau, pool='rank', ranked=True)
+register_method('tau-b', compare_kendall_tau, pool='rank', ranked=True)
+register_method('tau-a', compare_kendall_tau_a, pool='rank', ranked=True)
+register_method('cosine_cov', compare_cosine_cov_weighted, pool='cosine',
+                prepare=_prepare_hook('cosine_cov'), whiten=True,
+                sigma_k=True, linear=True)
+register_method('corr_cov', compare_correlation_cov_weighted, pool='corr',
+                prepare=_prepare_hook('corr_cov'), center=True, whiten=True,
+                sigma_k=True, linear=True)
+register_method('neg_riem_dist', compare_neg_riemannian_distance,
+                pool='mean', sigma_k=True)
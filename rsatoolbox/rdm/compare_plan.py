@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comparison plans, which prepare one side of compare once
+
+Evaluations compare the same model RDMs to many data RDMs, e.g. in each
+bootstrap sample. A ComparisonPlan normalizes, ranks or whitens the model
+side once per pattern subset and reuses this preparation for all data RDMs.
+
+Rank based methods additionally need to rank each data sample. A RankCache
+ranks the data RDMs once and derives the ranks of bootstrap samples from
+these without sorting again.
+"""
+
+from collections import OrderedDict
+import numpy as np
+from rsatoolbox.util.data_utils import compute_dtype
+from rsatoolbox.util.rdm_utils import batch_rank
+from rsatoolbox.util.rdm_utils import _selection
+from rsatoolbox.util.rdm_utils import _pair_source
+from rsatoolbox.util.rdm_utils import _subsample_vectors
+from .compare import compare
+from .compare import _prepare_vectors
+from .compare import get_method
+
+
+class ComparisonPlan:
+    """ RDMs prepared for repeated comparisons with a fixed method
+
+    plan.compare(rdm2, pattern_idx) is equivalent to
+    compare(rdm1.subsample_pattern(pattern_descriptor, pattern_idx),
+    rdm2, method, sigma_k). The prepared vectors are kept for the
+    maxsize most recently used pattern subsets.
+
+    Args:
+        rdm1 (rsatoolbox.rdm.RDMs):
+            the fixed side of the comparisons, e.g. model predictions
+        method (String):
+            comparison method, see rsatoolbox.rdm.compare
+        sigma_k (numpy.ndarray):
+            covariance matrix of the pattern estimates
+        pattern_descriptor (String):
+            descriptor used to interpret pattern_idx
+        maxsize (int):
+            number of pattern subsets to keep prepared
+
+    """
+
+    def __init__(self, rdm1, method='cosine', sigma_k=None,
+                 pattern_descriptor='index', maxsize=128):
+        self.rdm1 = rdm1
+        self.method = method
+        self.sigma_k = sigma_k
+        self.pattern_descriptor = pattern_descriptor
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def __repr__(self):
+        """
+        defines string which is printed for the object
+        """
+        return (f'rsatoolbox.rdm.ComparisonPlan(\n'
+                f'method = {self.method}\n'
+                f'{self.rdm1.n_rdm} RDM(s) over {self.rdm1.n_cond} '
+                f'conditions\n'
+                f'{len(self._cache)} pattern subset(s) prepared\n'
+                )
+
+    def compare(self, rdm2, pattern_idx=None, ranked=False):
+        """ compares the prepared RDMs to rdm2
+
+        Args:
+            rdm2 (rsatoolbox.rdm.RDMs or numpy.ndarray):
+                second set of RDMs
+            pattern_idx (numpy.ndarray):
+                optional, patterns of rdm1 to subsample before comparison
+            ranked (bool):
+                whether rdm2 contains ranks already, e.g. from a RankCache.
+                Skips ranking for 'spearman' and 'rho-a'
+
+        Returns:
+            numpy.ndarray: similarities, n_rdm1 x n_rdm2
+
+        """
+        prepared = self._get(pattern_idx)
+        if get_method(self.method).prepare is None:
+            return compare(prepared, rdm2, method=self.method,
+                           sigma_k=self.sigma_k)
+        left, nan_idx = prepared
+        if isinstance(rdm2, np.ndarray):
+            vectors2 = rdm2.reshape(-1, rdm2.shape[-1])
+        else:
+            vectors2 = rdm2.get_vectors()
+        if not vectors2.shape[1] == nan_idx.shape[0]:
+            raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+        vectors2 = vectors2.astype(compute_dtype(vectors2.dtype), copy=False)
+        vectors2_no_nan = vectors2[:, nan_idx]
+        if (np.any(np.isnan(vectors2_no_nan))
+                or not np.all(np.isnan(vectors2[:, ~nan_idx]))):
+            raise ValueError('rdm1 and rdm2 have different nan positions')
+        _, right = _prepare_vectors(vectors2_no_nan, self.method,
+                                    self.sigma_k, nan_idx, ranked=ranked)
+        return left @ right.T
+
+    def _get(self, pattern_idx):
+        """ returns the prepared side for a pattern subset, computing it
+        if it is not cached"""
+        if pattern_idx is None:
+            key = None
+        else:
+            key = tuple(np.sort(np.asarray(pattern_idx)).tolist())
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        vectors = self.rdm1.get_vectors()
+        vectors = vectors.astype(compute_dtype(vectors.dtype), copy=False)
+        if pattern_idx is not None:
+            vectors = _subsample_vectors(
+                vectors, self.rdm1.n_cond, selection=np.sort(_selection(
+                    self.rdm1.pattern_descriptors[self.pattern_descriptor],
+                    pattern_idx)))
+        if get_method(self.method).prepare is not None:
+            nan_idx = ~np.isnan(vectors[0])
+            left, _ = _prepare_vectors(
+                vectors[:, nan_idx], self.method, self.sigma_k, nan_idx)
+            prepared = (left, nan_idx)
+        else:
+            prepared = vectors
+        self._cache[key] = prepared
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return prepared
+
+
+class RankCache:
+    """ ranks of a stack of RDMs, which are reused for subsamples
+
+    The RDMs are ranked once. Subsampling RDMs only selects rows of the
+    ranks. Subsampling patterns, possibly with repetitions, yields vectors
+    whose entries are copies of the original entries, such that their order
+    is known from the original ranks. The new ranks are then counted with
+    one bincount per call instead of sorting.
+
+    cache.get_ranks(...) equals batch_rank of the vectors of
+    rdms.subsample(rdm_descriptor, rdm_idx).subsample_pattern(
+    pattern_descriptor, pattern_idx)
+
+    Args:
+        rdms (rsatoolbox.rdm.RDMs):
+            the RDMs to be ranked
+
+    """
+
+    def __init__(self, rdms):
+        self.rdms = rdms
+        dense = batch_rank(rdms.get_vectors(), method='dense')
+        self.n_levels = int(np.nanmax(dense, initial=0)) + 1
+        # levels start at 1, 0 marks nan entries
+        self._levels = np.nan_to_num(dense, nan=0).astype(np.intp)
+
+    def __repr__(self):
+        """
+        defines string which is printed for the object
+        """
+        return (f'rsatoolbox.rdm.RankCache(\n'
+                f'{self.rdms.n_rdm} RDM(s) over {self.rdms.n_cond} '
+                f'conditions\n'
+                )
+
+    def get_ranks(self, rdm_descriptor='index', rdm_idx=None,
+                  pattern_descriptor='index', pattern_idx=None):
+        """ ranks of subsampled RDMs, nan where the subsampled vectors are nan
+
+        Args:
+            rdm_descriptor (String):
+                descriptor to interpret rdm_idx
+            rdm_idx (numpy.ndarray):
+                RDMs to subsample with repetitions as in RDMs.subsample,
+                None for all
+            pattern_descriptor (String):
+                descriptor to interpret pattern_idx
+            pattern_idx (numpy.ndarray):
+                patterns to subsample with repetitions as in
+                RDMs.subsample_pattern, None for all
+
+        Returns:
+            numpy.ndarray: average ranks, n_rdm x n_dissimilarities
+
+        """
+        levels = self._levels
+        if rdm_idx is not None:
+            levels = levels[_selection(
+                self.rdms.rdm_descriptors[rdm_descriptor], rdm_idx)]
+        if pattern_idx is not None:
+            selection = np.sort(_selection(
+                self.rdms.pattern_descriptors[pattern_descriptor],
+                pattern_idx))
+            # pairs of the same pattern are nan
+            source = _pair_source(self.rdms.n_cond, selection)
+            levels = np.where(source == -1, 0, levels[:, source])
+        n_rdm = levels.shape[0]
+        offsets = (np.arange(n_rdm) * self.n_levels).reshape(-1, 1)
+        counts = np.bincount((levels + offsets).ravel(),
+                             minlength=n_rdm * self.n_levels)
+        counts = counts.reshape(n_rdm, self.n_levels)
+        counts[:, 0] = 0
+        # average rank of a level: entries below it plus (count + 1) / 2
+        rank_levels = np.cumsum(counts, axis=1) - (counts - 1) / 2
+        ranks = np.take_along_axis(rank_levels, levels, axis=1)
+        ranks[levels == 0] = np.nan
+        return ranks
+
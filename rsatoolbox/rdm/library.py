@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nearest neighbour search over a large library of model RDMs
+
+The library RDMs are normalized, ranked or whitened once for a comparison
+method, such that the similarity to a query is a single inner product.
+Queries are answered exactly, by blocks over the library, or approximately,
+by preselecting candidates with a random projection of the prepared vectors
+and computing exact similarities for these candidates only.
+"""
+
+import numpy as np
+from rsatoolbox.util.data_utils import compute_dtype
+from rsatoolbox.util.descriptor_utils import dict_to_list
+from rsatoolbox.util.file_io import write_dict_hdf5
+from rsatoolbox.util.file_io import write_dict_pkl
+from rsatoolbox.util.file_io import read_dict_hdf5
+from rsatoolbox.util.file_io import read_array_hdf5
+from rsatoolbox.util.file_io import read_dict_pkl
+from rsatoolbox.util.file_io import remove_file
+from .compare import _prepare_vectors
+from .compare import _blocked_top_k
+from .compare import _get_vectors_2d
+from .compare import get_method
+
+
+class RDMIndex:
+    """ index over a library of RDMs for finding the best matches to
+    query RDMs under a comparison method
+
+    Args:
+        rdms (rsatoolbox.rdm.RDMs):
+            the library, all RDMs must have the same nan positions
+        method (String):
+            comparison method with a prepare hook, e.g. 'cosine', 'corr',
+            'spearman', 'rho-a', 'cosine_cov' and 'corr_cov'
+        sigma_k (numpy.ndarray):
+            covariance matrix of the pattern estimates
+        n_projections (int):
+            dimension of the random projection used for approximate
+            queries. None for exact queries only
+        seed (int):
+            seed for the random projection
+
+    Attributes:
+        vectors (numpy.ndarray): prepared library vectors
+        nan_idx (numpy.ndarray): non-nan entries of the RDM vectors
+        projection (numpy.ndarray): random projection matrix or None
+        sketch (numpy.ndarray): projected library vectors or None
+
+    """
+
+    def __init__(self, rdms, method='cosine', sigma_k=None,
+                 n_projections=None, seed=0):
+        if get_method(method).prepare is None:
+            raise ValueError('method ' + str(method)
+                             + ' is not supported by RDMIndex')
+        self.method = method
+        self.sigma_k = sigma_k
+        self.n_projections = n_projections
+        self.seed = seed
+        if rdms is None:
+            # filled in by load_rdm_index
+            return
+        vectors = _get_vectors_2d(rdms)
+        vectors = vectors.astype(compute_dtype(vectors.dtype), copy=False)
+        self.nan_idx = ~np.isnan(vectors[0])
+        vectors = vectors[:, self.nan_idx]
+        if np.any(np.isnan(vectors)):
+            raise ValueError('library RDMs have different nan positions')
+        _, self.vectors = _prepare_vectors(vectors, method, sigma_k,
+                                           self.nan_idx)
+        if isinstance(rdms, np.ndarray):
+            self.rdm_descriptors = {'index': list(range(len(vectors)))}
+            self.pattern_descriptors = {}
+        else:
+            self.rdm_descriptors = rdms.rdm_descriptors
+            self.pattern_descriptors = rdms.pattern_descriptors
+        self._project()
+
+    def __repr__(self):
+        """
+        defines string which is printed for the object
+        """
+        return (f'rsatoolbox.rdm.RDMIndex(\n'
+                f'method = {self.method}\n'
+                f'{len(self)} RDM(s) with {self.vectors.shape[1]} '
+                f'dissimilarities\n'
+                f'n_projections = {self.n_projections}\n'
+                )
+
+    def __len__(self) -> int:
+        """
+        The number of RDMs in the library.
+        """
+        return self.vectors.shape[0]
+
+    def query(self, rdm, top_k=10, exact=True, n_candidates=None,
+              block_size=4096):
+        """ finds the library RDMs most similar to each query RDM
+
+        Args:
+            rdm (rsatoolbox.rdm.RDMs or numpy.ndarray):
+                query RDMs with the nan positions of the library
+            top_k (int):
+                number of matches to return per query RDM
+            exact (bool):
+                whether to compute the similarity to every library RDM.
+                If False, only the n_candidates RDMs closest to the query
+                in the random projection are compared exactly
+            n_candidates (int):
+                number of candidates for approximate queries,
+                defaults to 10 * top_k
+            block_size (int):
+                number of library RDMs compared at a time in exact queries
+
+        Returns:
+            numpy.ndarray: indices of the best matches, n_query x top_k
+            numpy.ndarray: their similarities, sorted in decreasing order
+
+        """
+        vectors = _get_vectors_2d(rdm)
+        if not vectors.shape[1] == self.nan_idx.shape[0]:
+            raise ValueError('query RDMs and library must be of equal shape')
+        vectors = vectors.astype(compute_dtype(vectors.dtype), copy=False)
+        vectors_no_nan = vectors[:, self.nan_idx]
+        if (np.any(np.isnan(vectors_no_nan))
+                or not np.all(np.isnan(vectors[:, ~self.nan_idx]))):
+            raise ValueError('query RDMs and library have different nan '
+                             'positions')
+        left, _ = _prepare_vectors(vectors_no_nan, self.method, self.sigma_k,
+                                   self.nan_idx)
+        top_k = min(top_k, len(self))
+        if exact:
+            col_blocks = [slice(start, min(start + block_size, len(self)))
+                          for start in range(0, len(self), block_size)]
+            return _blocked_top_k(
+                lambda cols: left @ self.vectors[cols].T, col_blocks, top_k)
+        if self.sketch is None:
+            raise ValueError('approximate queries require n_projections')
+        if n_candidates is None:
+            n_candidates = 10 * top_k
+        n_candidates = min(max(n_candidates, top_k), len(self))
+        approx = (left @ self.projection) @ self.sketch.T
+        candidates = np.argpartition(-approx, n_candidates - 1,
+                                     axis=1)[:, :n_candidates]
+        # sorting the candidates makes reads from memory-mapped vectors local
+        candidates = np.sort(candidates, axis=1)
+        sim = np.einsum('ij,ikj->ik', left, self.vectors[candidates])
+        keep = np.argpartition(-sim, top_k - 1, axis=1)[:, :top_k]
+        sim = np.take_along_axis(sim, keep, axis=1)
+        idx = np.take_along_axis(candidates, keep, axis=1)
+        order = np.argsort(-sim, axis=1, kind='stable')
+        return (np.take_along_axis(idx, order, axis=1),
+                np.take_along_axis(sim, order, axis=1))
+
+    def save(self, filename, file_type='hdf5', overwrite=False):
+        """ saves the index into a file
+
+        Args:
+            filename(String): path to file to save to
+                [or opened file]
+            file_type(String): Type of file to create:
+                hdf5: hdf5 file
+                pkl: pickle file
+            overwrite(Boolean): overwrites file if it already exists
+
+        """
+        index_dict = self.to_dict()
+        if overwrite:
+            remove_file(filename)
+        if file_type == 'hdf5':
+            write_dict_hdf5(filename, index_dict)
+        elif file_type == 'pkl':
+            write_dict_pkl(filename, index_dict)
+
+    def to_dict(self):
+        """ converts the object into a dictionary, which can be saved to disk
+
+        Returns:
+            index_dict(dict): dictionary containing all information required
+                to recreate the RDMIndex object
+        """
+        index_dict = {}
+        index_dict['method'] = self.method
+        index_dict['sigma_k'] = self.sigma_k
+        index_dict['n_projections'] = self.n_projections
+        index_dict['seed'] = self.seed
+        index_dict['nan_idx'] = self.nan_idx
+        index_dict['vectors'] = self.vectors
+        index_dict['projection'] = self.projection
+        index_dict['sketch'] = self.sketch
+        index_dict['rdm_descriptors'] = self.rdm_descriptors
+        index_dict['pattern_descriptors'] = self.pattern_descriptors
+        return index_dict
+
+    def _project(self):
+        """ draws the random projection and projects the library"""
+        if self.n_projections is None:
+            self.projection = None
+            self.sketch = None
+            return
+        rng = np.random.default_rng(self.seed)
+        self.projection = rng.standard_normal(
+            (self.vectors.shape[1], self.n_projections)) \
+            / np.sqrt(self.n_projections)
+        self.sketch = self.vectors @ self.projection
+
+
+def load_rdm_index(filename, file_type=None, mmap_mode=None):
+    """ loads a RDMIndex object from disk
+
+    Args:
+        filename(String): path to file to load
+        file_type(String): 'hdf5' or 'pkl', default: inferred from filename
+        mmap_mode(String): None or a numpy.memmap mode ('r', 'r+', 'c').
+            If given, the library vectors of a hdf5 file are memory-mapped
+
+    Returns:
+        RDMIndex: the loaded index
+
+    """
+    if file_type is None:
+        if isinstance(filename, str):
+            if filename[-4:] == '.pkl':
+                file_type = 'pkl'
+            elif filename[-3:] == '.h5' or filename[-4:] == 'hdf5':
+                file_type = 'hdf5'
+    if file_type == 'hdf5':
+        index_dict = read_dict_hdf5(filename, exclude=['vectors'])
+        index_dict['vectors'] = read_array_hdf5(filename, 'vectors',
+                                                mmap_mode=mmap_mode)
+        index_dict['rdm_descriptors'] = dict_to_list(
+            index_dict['rdm_descriptors'])
+        index_dict['pattern_descriptors'] = dict_to_list(
+            index_dict['pattern_descriptors'])
+    elif file_type == 'pkl':
+        if mmap_mode is not None:
+            raise ValueError('memory mapping requires a hdf5 file')
+        index_dict = read_dict_pkl(filename)
+    else:
+        raise ValueError('filetype not understood')
+    return rdm_index_from_dict(index_dict)
+
+
+def rdm_index_from_dict(index_dict):
+    """ creates a RDMIndex object from a dictionary
+
+    Args:
+        index_dict(dict): dictionary with information
+
+    Returns:
+        RDMIndex: the regenerated index
+
+    """
+    n_projections = index_dict['n_projections']
+    index = RDMIndex(None, method=str(index_dict['method']),
+                     sigma_k=index_dict['sigma_k'],
+                     n_projections=(None if n_projections is None
+                                    else int(n_projections)),
+                     seed=int(index_dict['seed']))
+    index.nan_idx = np.asarray(index_dict['nan_idx'], bool)
+    index.vectors = index_dict['vectors']
+    index.rdm_descriptors = index_dict['rdm_descriptors']
+    index.pattern_descriptors = index_dict['pattern_descriptors']
+    index.projection = index_dict['projection']
+    index.sketch = index_dict['sketch']
+    return index
@@ -21,6 +21,7 @@ from rsatoolbox.util.data_utils import extract_dict
 from rsatoolbox.util.file_io import write_dict_hdf5
 from rsatoolbox.util.file_io import write_dict_pkl
 from rsatoolbox.util.file_io import read_dict_hdf5
+from rsatoolbox.util.file_io import read_array_hdf5
 from rsatoolbox.util.file_io import read_dict_pkl
 from rsatoolbox.util.file_io import remove_file
 
@@ -40,6 +41,9 @@ class RDMs:
             descriptors with 1 value per RDM
         pattern_descriptors (dict):
             descriptors with 1 value per RDM column
+        dtype (numpy.dtype):
+            dtype to store the dissimilarities in, e.g. numpy.float32
+            to halve memory use. Defaults to the dtype of dissimilarities
 
     Attributes:
         n_rdm(int): number of rdms
@@ -51,7 +55,10 @@ class RDMs:
                  dissimilarity_measure=None,
                  descriptors=None,
                  rdm_descriptors=None,
-                 pattern_descriptors=None):
+                 pattern_descriptors=None,
+                 dtype=None):
+        if dtype is not None:
+            dissimilarities = np.asarray(dissimilarities, dtype=dtype)
         self.dissimilarities, self.n_rdm, self.n_cond = \
             batch_to_vectors(dissimilarities)
         if descriptors is None:
@@ -320,7 +327,7 @@ class RDMs:
                                                  rdm.rdm_descriptors)
         self.n_rdm = self.n_rdm + rdm.n_rdm
 
-    def save(self, filename, file_type='hdf5', overwrite=False):
+    def save(self, filename, file_type='hdf5', overwrite=False, dtype=None):
         """ saves the RDMs object into a file
 
         Args:
@@ -330,9 +337,14 @@ class RDMs:
                 hdf5: hdf5 file
                 pkl: pickle file
             overwrite(Boolean): overwrites file if it already exists
+            dtype(numpy.dtype): dtype to store the dissimilarities in,
+                e.g. numpy.float16. Defaults to their current dtype
 
         """
         rdm_dict = self.to_dict()
+        if dtype is not None:
+            rdm_dict['dissimilarities'] = \
+                rdm_dict['dissimilarities'].astype(dtype, copy=False)
         if overwrite:
             remove_file(filename)
         if file_type == 'hdf5':
@@ -458,11 +470,23 @@ def rdms_from_dict(rdm_dict):
     return rdms
 
 
-def load_rdm(filename, file_type=None):
+def load_rdm(filename, file_type=None, mmap_mode=None, by=None, value=None):
     """ loads a RDMs object from disk
 
+    For hdf5 files the dissimilarities can be memory-mapped instead of
+    loaded and a subset of RDMs can be selected before any dissimilarities
+    are read. This allows working with RDM stacks larger than memory.
+
     Args:
         filename(String): path to file to load
+        file_type(String): 'hdf5' or 'pkl', default: inferred from filename
+        mmap_mode(String): None or a numpy.memmap mode ('r', 'r+', 'c').
+            If given, the dissimilarities of a hdf5 file are memory-mapped
+        by(String): rdm_descriptor to select RDMs by, as in RDMs.subset
+        value: value(s) of the rdm_descriptor to select, as in RDMs.subset
+
+    Returns:
+        rsatoolbox.rdm.RDMs: the loaded RDMs
 
     """
     if file_type is None:
@@ -472,9 +496,29 @@ def load_rdm(filename, file_type=None):
             elif filename[-3:] == '.h5' or filename[-4:] == 'hdf5':
                 file_type = 'hdf5'
     if file_type == 'hdf5':
-        rdm_dict = read_dict_hdf5(filename)
+        if mmap_mode is None and value is None:
+            rdm_dict = read_dict_hdf5(filename)
+        else:
+            rdm_dict = read_dict_hdf5(filename, exclude=['dissimilarities'])
+            rdm_dict['rdm_descriptors'] = dict_to_list(
+                rdm_dict['rdm_descriptors'])
+            if value is None:
+                selection = None
+            else:
+                if by is None:
+                    by = 'index'
+                selection = num_index(rdm_dict['rdm_descriptors'][by], value)
+                rdm_dict['rdm_descriptors'] = extract_dict(
+                    rdm_dict['rdm_descriptors'], selection)
+            rdm_dict['dissimilarities'] = read_array_hdf5(
+                filename, 'dissimilarities', mmap_mode=mmap_mode,
+                selection=selection)
     elif file_type == 'pkl':
+        if mmap_mode is not None:
+            raise ValueError('memory mapping requires a hdf5 file')
         rdm_dict = read_dict_pkl(filename)
+        if value is not None:
+            return rdms_from_dict(rdm_dict).subset(by, value)
     else:
         raise ValueError('filetype not understood')
     return rdms_from_dict(rdm_dict)
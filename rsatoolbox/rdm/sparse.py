@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sparse storage of partially observed RDMs
+
+Only the observed dissimilarities are stored, in a CSR-like layout:
+the values of all RDMs concatenated, the condensed pair index of each value
+and one offset per RDM. Memory and compute thus scale with the number of
+observed pairs instead of n_cond * (n_cond - 1) / 2 per RDM.
+"""
+
+from collections.abc import Iterable
+from copy import deepcopy
+import numpy as np
+from scipy.sparse import csr_matrix
+import rsatoolbox.rdm.rdms
+from rsatoolbox.util.descriptor_utils import num_index
+from rsatoolbox.util.descriptor_utils import check_descriptor_length_error
+from rsatoolbox.util.descriptor_utils import subset_descriptor
+from rsatoolbox.util.data_utils import extract_dict
+
+
+class SparseRDMs:
+    """ RDMs with an explicit index of the observed pairs
+
+    Args:
+        values (numpy.ndarray):
+            observed dissimilarities of all RDMs concatenated
+        pair_index (numpy.ndarray):
+            index of each value into the vectorform of the RDM,
+            sorted within each RDM
+        indptr (numpy.ndarray):
+            n_rdm + 1 offsets, the values of RDM i are
+            values[indptr[i]:indptr[i + 1]]
+        n_cond (int):
+            number of patterns
+        dissimilarity_measure (String):
+            a description of the dissimilarity measure (e.g. 'Euclidean')
+        descriptors (dict):
+            descriptors with 1 value per RDMs object
+        rdm_descriptors (dict):
+            descriptors with 1 value per RDM
+        pattern_descriptors (dict):
+            descriptors with 1 value per RDM column
+
+    Attributes:
+        n_rdm(int): number of rdms
+        n_cond(int): number of patterns
+        n_pairs(int): length of the full vectorform of an RDM
+
+    """
+
+    def __init__(self, values, pair_index, indptr, n_cond,
+                 dissimilarity_measure=None,
+                 descriptors=None,
+                 rdm_descriptors=None,
+                 pattern_descriptors=None):
+        self.n_cond = int(n_cond)
+        self.n_pairs = self.n_cond * (self.n_cond - 1) // 2
+        index_dtype = np.int32 if self.n_pairs < 2 ** 31 else np.int64
+        self.values = np.asarray(values)
+        self.pair_index = np.asarray(pair_index, dtype=index_dtype)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.n_rdm = len(self.indptr) - 1
+        assert self.values.shape == self.pair_index.shape, \
+            'values and pair_index must have the same length'
+        assert self.indptr[-1] == len(self.values), \
+            'indptr does not match the number of values'
+        self.descriptors = {} if descriptors is None else descriptors
+        self.rdm_descriptors = _parse_descriptors(
+            rdm_descriptors, 'rdm_descriptors', self.n_rdm)
+        self.pattern_descriptors = _parse_descriptors(
+            pattern_descriptors, 'pattern_descriptors', self.n_cond)
+        self.dissimilarity_measure = dissimilarity_measure
+
+    def __repr__(self):
+        """
+        defines string which is printed for the object
+        """
+        return (f'rsatoolbox.rdm.{self.__class__.__name__}(\n'
+                f'{self.n_rdm} RDM(s) over {self.n_cond} conditions\n'
+                f'with {len(self.values)} of {self.n_rdm * self.n_pairs} '
+                f'pairs observed\n'
+                f'dissimilarity_measure = \n{self.dissimilarity_measure}\n'
+                )
+
+    def __len__(self) -> int:
+        """
+        The number of RDMs in this stack.
+        """
+        return self.n_rdm
+
+    def __getitem__(self, idx):
+        """
+        allows indexing with []
+        """
+        rows = np.arange(self.n_rdm)[np.array(idx)].reshape(-1)
+        return self._take(rows, subset_descriptor(self.rdm_descriptors, idx))
+
+    def get_counts(self):
+        """ Returns the number of observed pairs per RDM
+
+        Returns:
+            numpy.ndarray: number of observed pairs for each RDM
+
+        """
+        return np.diff(self.indptr)
+
+    def get_rows(self):
+        """ Returns the RDM each stored value belongs to
+
+        Returns:
+            numpy.ndarray: row index for each entry of values
+
+        """
+        return np.repeat(np.arange(self.n_rdm), self.get_counts())
+
+    def get_mask(self):
+        """ Returns the observed pairs as a boolean mask
+
+        Returns:
+            numpy.ndarray: n_rdm x n_pairs, True where a pair is observed
+
+        """
+        mask = np.zeros((self.n_rdm, self.n_pairs), bool)
+        mask[self.get_rows(), self.pair_index] = True
+        return mask
+
+    def get_matrix(self):
+        """ Returns the observed values as a sparse matrix
+
+        Returns:
+            scipy.sparse.csr_matrix: n_rdm x n_pairs matrix of the values
+
+        """
+        return csr_matrix((self.values, self.pair_index, self.indptr),
+                          shape=(self.n_rdm, self.n_pairs))
+
+    def get_vectors(self, pairs=None):
+        """ Returns RDMs as np.ndarray with each RDM as a vector and
+        nans for the unobserved pairs
+
+        Args:
+            pairs (numpy.ndarray): sorted indices of the pairs to return,
+                defaults to all pairs
+
+        Returns:
+            numpy.ndarray: RDMs as a matrix with one row per RDM
+
+        """
+        rows = self.get_rows()
+        columns = self.pair_index
+        values = self.values
+        if pairs is None:
+            n_pairs = self.n_pairs
+        else:
+            n_pairs = len(pairs)
+            columns = np.searchsorted(pairs, self.pair_index)
+            keep = columns < n_pairs
+            keep[keep] = pairs[columns[keep]] == self.pair_index[keep]
+            rows, columns, values = rows[keep], columns[keep], values[keep]
+        vectors = np.full((self.n_rdm, n_pairs), np.nan,
+                          dtype=np.result_type(self.values, np.float16))
+        vectors[rows, columns] = values
+        return vectors
+
+    def get_pairs(self):
+        """ Returns the pairs observed in at least one RDM
+
+        Returns:
+            numpy.ndarray: sorted indices of the observed pairs
+
+        """
+        return np.unique(self.pair_index)
+
+    def has_equal_pairs(self):
+        """ Checks whether all RDMs observe the same pairs
+
+        Returns:
+            bool: True if the observed pairs are equal for all RDMs
+
+        """
+        counts = self.get_counts()
+        if self.n_rdm == 0 or np.any(counts != counts[0]):
+            return False
+        pair_index = self.pair_index.reshape(self.n_rdm, -1)
+        return not np.any(pair_index != pair_index[0])
+
+    def get_observed(self):
+        """ Returns the values over the pairs observed in all RDMs.
+        Requires that all RDMs observe the same pairs.
+
+        Returns:
+            numpy.ndarray: vectors, n_rdm x n_observed values
+            numpy.ndarray: mask, n_pairs boolean mask of observed pairs
+
+        """
+        if not self.has_equal_pairs():
+            raise ValueError('RDMs have different nan positions')
+        mask = np.zeros(self.n_pairs, bool)
+        mask[self.pair_index[:self.indptr[1]]] = True
+        return self.values.reshape(self.n_rdm, -1), mask
+
+    def to_rdms(self):
+        """ converts into a dense RDMs object with nans for unobserved pairs
+
+        Returns:
+            rsatoolbox.rdm.RDMs: dense RDMs
+
+        """
+        return rsatoolbox.rdm.rdms.RDMs(
+            dissimilarities=self.get_vectors(),
+            dissimilarity_measure=self.dissimilarity_measure,
+            descriptors=deepcopy(self.descriptors),
+            rdm_descriptors=deepcopy(self.rdm_descriptors),
+            pattern_descriptors=deepcopy(self.pattern_descriptors))
+
+    def subset(self, by, value):
+        """ Returns a set of fewer RDMs matching descriptor values
+
+        Args:
+            by(String): the descriptor by which the subset selection
+                        is made from descriptors
+            value:      the value by which the subset selection is made
+                        from descriptors
+
+        Returns:
+            SparseRDMs object, with fewer RDMs
+
+        """
+        if by is None:
+            by = 'index'
+        selection = num_index(self.rdm_descriptors[by], value)
+        return self._take(selection,
+                          extract_dict(self.rdm_descriptors, selection))
+
+    def mean(self, weights=None):
+        """Average rdm of all rdms contained, averaging each pair over
+        the RDMs which observe it
+
+        Args:
+            weights (str or ndarray, optional): One of:
+                None: No weighting applied
+                str: Use the weights contained in the `rdm_descriptor`
+                    with this name, one array per RDM
+                ndarray: Weights of the same shape as values
+
+        Returns:
+            `rsatoolbox.rdm.rdms.RDMs`: New RDMs object with one vector
+        """
+        if isinstance(weights, str):
+            weights = np.concatenate(self.rdm_descriptors[weights])
+        mean = _pair_mean(self.values, self.pair_index, self.n_pairs,
+                          weights)
+        return rsatoolbox.rdm.rdms.RDMs(
+            dissimilarities=mean.reshape(1, -1),
+            dissimilarity_measure=self.dissimilarity_measure,
+            descriptors=deepcopy(self.descriptors),
+            pattern_descriptors=deepcopy(self.pattern_descriptors))
+
+    def _take(self, rows, rdm_descriptors):
+        """ selects the RDMs in rows with the given rdm_descriptors"""
+        starts = self.indptr[rows]
+        counts = self.indptr[np.asarray(rows) + 1] - starts
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        value_idx = (np.repeat(starts - indptr[:-1], counts)
+                     + np.arange(indptr[-1]))
+        return SparseRDMs(
+            self.values[value_idx], self.pair_index[value_idx], indptr,
+            self.n_cond,
+            dissimilarity_measure=self.dissimilarity_measure,
+            descriptors=self.descriptors,
+            rdm_descriptors=rdm_descriptors,
+            pattern_descriptors=self.pattern_descriptors)
+
+
+def sparse_from_rdms(rdms):
+    """ converts a dense RDMs object with nans for unobserved pairs
+    into a SparseRDMs object
+
+    Args:
+        rdms(rsatoolbox.rdm.RDMs): RDMs to convert
+
+    Returns:
+        SparseRDMs: the observed entries of rdms
+
+    """
+    vectors = rdms.get_vectors()
+    rows, pair_index = np.nonzero(~np.isnan(vectors))
+    indptr = np.concatenate(
+        ([0], np.cumsum(np.bincount(rows, minlength=rdms.n_rdm))))
+    return SparseRDMs(
+        vectors[rows, pair_index], pair_index, indptr, rdms.n_cond,
+        dissimilarity_measure=rdms.dissimilarity_measure,
+        descriptors=deepcopy(rdms.descriptors),
+        rdm_descriptors=deepcopy(rdms.rdm_descriptors),
+        pattern_descriptors=deepcopy(rdms.pattern_descriptors))
+
+
+def _row_sum(values, indptr):
+    """ sums the values of each RDM of a sparse layout
+
+    Args:
+        values(numpy.ndarray): concatenated values
+        indptr(numpy.ndarray): offsets per RDM
+
+    Returns:
+        numpy.ndarray: one sum per RDM
+
+    """
+    sums = np.zeros(len(indptr) - 1, dtype=np.result_type(values, float))
+    non_empty = indptr[1:] > indptr[:-1]
+    sums[non_empty] = np.add.reduceat(values, indptr[:-1][non_empty])
+    return sums
+
+
+def _pair_mean(values, pair_index, n_pairs, weights=None):
+    """ weighted mean per pair over the RDMs which observe it,
+    nan for pairs observed by no RDM"""
+    if weights is None:
+        weights = np.ones(len(values))
+    weight_sums = np.bincount(pair_index, weights=weights,
+                              minlength=n_pairs)
+    sums = np.bincount(pair_index, weights=values * weights,
+                       minlength=n_pairs)
+    mean = np.full(n_pairs, np.nan)
+    observed = weight_sums > 0
+    mean[observed] = sums[observed] / weight_sums[observed]
+    return mean
+
+
+def _parse_descriptors(descriptors, name, n_element):
+    """ checks descriptors and adds the default index"""
+    if descriptors is None:
+        descriptors = {}
+    else:
+        for k, v in descriptors.items():
+            if not isinstance(v, Iterable) or isinstance(v, str):
+                descriptors[k] = [v]
+        check_descriptor_length_error(descriptors, name, n_element)
+    if 'index' not in descriptors.keys():
+        descriptors['index'] = list(range(n_element))
+    return descriptors
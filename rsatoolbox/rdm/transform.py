@@ -5,107 +5,119 @@
 
 from copy import deepcopy
 import numpy as np
-from scipy.stats import rankdata
+from rsatoolbox.util.rdm_utils import batch_rank
 from .rdms import RDMs
 
 
-def rank_transform(rdms, method='average'):
+def rank_transform(rdms, method='average', inplace=False):
     """ applies a rank_transform and generates a new RDMs object
     This assigns a rank to each dissimilarity estimate in the RDM,
     deals with rank ties and saves ranks as new dissimilarity estimates.
     As an effect, all non-diagonal entries of the RDM will
     range from 1 to (n_dim²-n_dim)/2, if the RDM has the dimensions
     n_dim x n_dim.
+    All RDMs are ranked together in one batch. Missing values (nan) are
+    ignored for the ranking and stay nan.
 
     Args:
         rdms(RDMs): RDMs object
         method(String):
             controls how ranks are assigned to equal values
             options are: ‘average’, ‘min’, ‘max’, ‘dense’, ‘ordinal’
+        inplace(bool): overwrite the dissimilarities of rdms instead of
+            creating a new RDMs object with copied descriptors
 
     Returns:
         rdms_new(RDMs): RDMs object with rank transformed dissimilarities
 
     """
-    dissimilarities = rdms.get_vectors()
-    dissimilarities = np.array([rankdata(dissimilarities[i], method=method)
-                                for i in range(rdms.n_rdm)])
+    dissimilarities = batch_rank(rdms.get_vectors(), method=method)
     measure = rdms.dissimilarity_measure
     if not measure[-7:] == '(ranks)':
         measure = measure + ' (ranks)'
-    rdms_new = RDMs(dissimilarities,
-                    dissimilarity_measure=measure,
-                    descriptors=deepcopy(rdms.descriptors),
-                    rdm_descriptors=deepcopy(rdms.rdm_descriptors),
-                    pattern_descriptors=deepcopy(rdms.pattern_descriptors))
-    return rdms_new
+    return _new_rdms(rdms, dissimilarities, measure, inplace)
 
 
-def sqrt_transform(rdms):
+def sqrt_transform(rdms, inplace=False):
     """ applies a square root transform and generates a new RDMs object
     This sets values blow 0 to 0 and takes a square root of each entry.
     It also adds a sqrt to the dissimilarity_measure entry.
 
     Args:
         rdms(RDMs): RDMs object
+        inplace(bool): overwrite the dissimilarities of rdms instead of
+            creating a new RDMs object with copied descriptors
 
     Returns:
         rdms_new(RDMs): RDMs object with sqrt transformed dissimilarities
 
     """
-    dissimilarities = rdms.get_vectors()
-    dissimilarities[dissimilarities < 0] = 0
-    dissimilarities = np.sqrt(dissimilarities)
+    dissimilarities = _positive(rdms.get_vectors(), inplace)
+    np.sqrt(dissimilarities, out=dissimilarities)
     if rdms.dissimilarity_measure == 'squared euclidean':
         dissimilarity_measure = 'euclidean'
     elif rdms.dissimilarity_measure == 'squared mahalanobis':
         dissimilarity_measure = 'mahalanobis'
     else:
         dissimilarity_measure = 'sqrt of' + rdms.dissimilarity_measure
-    rdms_new = RDMs(dissimilarities,
-                    dissimilarity_measure=dissimilarity_measure,
-                    descriptors=deepcopy(rdms.descriptors),
-                    rdm_descriptors=deepcopy(rdms.rdm_descriptors),
-                    pattern_descriptors=deepcopy(rdms.pattern_descriptors))
-    return rdms_new
+    return _new_rdms(rdms, dissimilarities, dissimilarity_measure, inplace)
 
 
-def positive_transform(rdms):
+def positive_transform(rdms, inplace=False):
     """ sets all negative entries in an RDM to zero and returns a new RDMs
 
     Args:
         rdms(RDMs): RDMs object
+        inplace(bool): overwrite the dissimilarities of rdms instead of
+            creating a new RDMs object with copied descriptors
 
     Returns:
         rdms_new(RDMs): RDMs object with sqrt transformed dissimilarities
 
     """
-    dissimilarities = rdms.get_vectors()
-    dissimilarities[dissimilarities < 0] = 0
-    rdms_new = RDMs(dissimilarities,
-                    dissimilarity_measure=rdms.dissimilarity_measure,
-                    descriptors=deepcopy(rdms.descriptors),
-                    rdm_descriptors=deepcopy(rdms.rdm_descriptors),
-                    pattern_descriptors=deepcopy(rdms.pattern_descriptors))
-    return rdms_new
+    dissimilarities = _positive(rdms.get_vectors(), inplace)
+    return _new_rdms(rdms, dissimilarities, rdms.dissimilarity_measure,
+                     inplace)
 
 
-def transform(rdms, fun):
+def transform(rdms, fun, inplace=False):
     """ applies an arbitray function ``fun`` to the dissimilarities and
     returns a new RDMs object.
 
     Args:
         rdms(RDMs): RDMs object
+        fun(callable): function applied to the stack of dissimilarity
+            vectors
+        inplace(bool): store the result in rdms instead of
+            creating a new RDMs object with copied descriptors
 
     Returns:
         rdms_new(RDMs): RDMs object with sqrt transformed dissimilarities
 
     """
-    dissimilarities = rdms.get_vectors()
-    dissimilarities = fun(dissimilarities)
-    rdms_new = RDMs(dissimilarities,
-                    dissimilarity_measure='transformed ' + rdms.dissimilarity_measure,
-                    descriptors=deepcopy(rdms.descriptors),
-                    rdm_descriptors=deepcopy(rdms.rdm_descriptors),
-                    pattern_descriptors=deepcopy(rdms.pattern_descriptors))
-    return rdms_new
+    dissimilarities = fun(rdms.get_vectors())
+    return _new_rdms(rdms, dissimilarities,
+                     'transformed ' + rdms.dissimilarity_measure, inplace)
+
+
+def _positive(dissimilarities, inplace):
+    """ sets negative entries to zero, in place if requested. Otherwise
+    a new float array is returned and the input stays untouched"""
+    if inplace and np.issubdtype(dissimilarities.dtype, np.floating):
+        return np.maximum(dissimilarities, 0, out=dissimilarities)
+    return np.maximum(dissimilarities, 0, dtype=np.result_type(
+        dissimilarities, np.float16))
+
+
+def _new_rdms(rdms, dissimilarities, dissimilarity_measure, inplace):
+    """ stores transformed dissimilarities either in rdms itself or in a
+    new RDMs object with copied descriptors"""
+    if inplace:
+        rdms.dissimilarities = dissimilarities
+        rdms.dissimilarity_measure = dissimilarity_measure
+        return rdms
+    return RDMs(dissimilarities,
+                dissimilarity_measure=dissimilarity_measure,
+                descriptors=deepcopy(rdms.descriptors),
+                rdm_descriptors=deepcopy(rdms.rdm_descriptors),
+                pattern_descriptors=deepcopy(rdms.pattern_descriptors))
@@ -41,3 +41,13 @@ def get_unique_inverse(array):
     s = np.empty(temp.size, temp.dtype)
     s[temp] = np.arange(temp.size)
     return u[temp], s[inverse]
+
+
+def compute_dtype(dtype):
+    """returns the floating point type to compute in for data of dtype.
+    Reduced precision floats are computed in at least single precision,
+    all other data in double precision as before.
+    """
+    if np.issubdtype(dtype, np.floating):
+        return np.promote_types(dtype, np.float32)
+    return np.dtype(np.float64)
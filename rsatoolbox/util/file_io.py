@@ -81,32 +81,83 @@ def _write_list(group, key, value):
             l_group[str(i)] = v
 
 
-def read_dict_hdf5(file):
+def read_dict_hdf5(file, exclude=None):
     """ writes a nested dictionary containing strings & arrays as data into
     a hdf5 file
 
     Args:
         file: a filename or opened readable file
+        exclude(list): top level keys not to be loaded, e.g. large arrays
+            which are read separately by read_array_hdf5
 
     Returns:
         dictionary(dict): the loaded dict
 
     """
     file = h5py.File(file, 'r')
-    return _read_group(file)
+    return _read_group(file, exclude)
 
 
-def _read_group(group):
+def read_array_hdf5(file, key, mmap_mode=None, selection=None):
+    """ reads a single array from a hdf5 file without loading the rest
+    of the file. Only the rows in selection are read from disk.
+
+    If mmap_mode is given and the array is stored contiguously and
+    uncompressed (the h5py default, used by write_dict_hdf5) the array
+    is returned as a numpy.memmap into the file instead of being loaded.
+    Memory mapping requires a filename, for opened files and
+    chunked datasets the selected rows are read into memory instead.
+
+    Args:
+        file: a filename or opened readable file
+        key(String): name of the dataset in the file
+        mmap_mode(String): None or a numpy.memmap mode: 'r', 'r+', 'c'
+        selection(numpy.ndarray): row indices to read, default: all rows
+
+    Returns:
+        numpy.ndarray: the array or the selected rows of it
+
+    """
+    with h5py.File(file, 'r') as h5file:
+        dset = h5file[key]
+        offset = dset.id.get_offset()
+        shape = dset.shape
+        dtype = dset.dtype
+        if (mmap_mode is None or offset is None
+                or not isinstance(file, (str, Path))):
+            if selection is None:
+                return dset[()]
+            selection = np.asarray(selection, dtype=int)
+            if len(selection) == 0:
+                return np.empty((0,) + shape[1:], dtype=dtype)
+            # h5py requires increasing indices for fancy indexing
+            unique_idx, inverse = np.unique(selection, return_inverse=True)
+            return dset[unique_idx][inverse]
+    array = np.memmap(file, mode=mmap_mode, dtype=dtype, shape=shape,
+                      offset=offset, order='C')
+    if selection is not None:
+        selection = np.asarray(selection, dtype=int)
+        if len(selection) > 0 and np.all(np.diff(selection) == 1):
+            # contiguous ranges stay memory-mapped
+            array = array[selection[0]:selection[-1] + 1]
+        else:
+            array = np.asarray(array[selection])
+    return array
+
+
+def _read_group(group, exclude=None):
     """ reads a group from a hdf5 file into a dict, which allows recursion"""
     dictionary = {}
     for key in group.keys():
+        if exclude is not None and key in exclude:
+            continue
         if isinstance(group[key], h5py.Group):
             dictionary[key] = _read_group(group[key])
         elif group[key].shape is None:
             dictionary[key] = None
         else:
             dictionary[key] = np.array(group[key])
-            if dictionary[key].dtype.type is np.string_:
+            if dictionary[key].dtype.type is np.bytes_:
                 dictionary[key] = np.array(group[key]).astype('unicode')
             # if (len(dictionary[key].shape) == 1
             #     and dictionary[key].shape[0] == 1):
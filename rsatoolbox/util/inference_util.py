@@ -6,11 +6,12 @@ Inference module utilities
 
 import numpy as np
 from scipy import stats
-from scipy.stats import rankdata, wilcoxon
+from scipy.stats import wilcoxon
 from scipy.stats import t as tdist
 from collections.abc import Iterable
 from rsatoolbox.model import Model
-from rsatoolbox.rdm import RDMs
+from rsatoolbox.rdm.sparse import SparseRDMs
+from .pooling import _pool_sparse, _pool_rule, _pool_dense
 from .matrix import pairwise_contrast
 from .rdm_utils import batch_to_matrices
 
@@ -84,86 +85,10 @@ def pool_rdm(rdms, method='cosine'):
             under the chosen method
 
     """
-    rdm_vec = rdms.get_vectors()
-    if method == 'euclid':
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'neg_riem_dist':
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'cosine':
-        rdm_vec = rdm_vec / np.sqrt(np.nanmean(rdm_vec ** 2, axis=1,
-                                               keepdims=True))
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'corr':
-        rdm_vec = rdm_vec - np.nanmean(rdm_vec, axis=1, keepdims=True)
-        rdm_vec = rdm_vec / np.nanstd(rdm_vec, axis=1, keepdims=True)
-        rdm_vec = _nan_mean(rdm_vec)
-        rdm_vec = rdm_vec - np.nanmin(rdm_vec)
-    elif method == 'cosine_cov':
-        rdm_vec = rdm_vec / np.sqrt(np.nanmean(rdm_vec ** 2, axis=1,
-                                               keepdims=True))
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'corr_cov':
-        rdm_vec = rdm_vec - np.nanmean(rdm_vec, axis=1, keepdims=True)
-        rdm_vec = rdm_vec / np.nanstd(rdm_vec, axis=1, keepdims=True)
-        rdm_vec = _nan_mean(rdm_vec)
-        rdm_vec = rdm_vec - np.nanmin(rdm_vec)
-    elif method == 'spearman' or method == 'rho-a':
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'rho-a':
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'kendall' or method == 'tau-b':
-        Warning('Noise ceiling for tau based on averaged ranks!')
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'tau-a':
-        Warning('Noise ceiling for tau based on averaged ranks!')
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    else:
-        raise ValueError('Unknown RDM comparison method requested!')
-    return RDMs(rdm_vec,
-                dissimilarity_measure=rdms.dissimilarity_measure,
-                descriptors=rdms.descriptors,
-                rdm_descriptors=None,
-                pattern_descriptors=rdms.pattern_descriptors)
-
-
-def _nan_mean(rdm_vector):
-    """ takes the average over a rdm_vector with nans for masked entries
-    without a warning
-
-    Args:
-        rdm_vector(numpy.ndarray): set of rdm_vectors to be averaged
-
-    Returns:
-        rdm_mean(numpy.ndarray): the mean rdm
-
-    """
-    nan_idx = ~np.isnan(rdm_vector[0])
-    mean_values = np.mean(rdm_vector[:, nan_idx], axis=0)
-    rdm_mean = np.empty((1, rdm_vector.shape[1]))
-    rdm_mean.fill(np.nan)
-    rdm_mean[:, nan_idx] = mean_values
-    return rdm_mean
-
-
-def _nan_rank_data(rdm_vector):
-    """ rank_data for vectors with nan entries
-
-    Args:
-        rdm_vector(numpy.ndarray): the vector to be rank_transformed
-
-    Returns:
-        ranks(numpy.ndarray): the ranks with nans where the original vector
-            had nans
-
-    """
-    ranks_no_nan = rankdata(rdm_vector[~np.isnan(rdm_vector)])
-    ranks = np.ones_like(rdm_vector) * np.nan
-    ranks[~np.isnan(rdm_vector)] = ranks_no_nan
-    return ranks
+    if isinstance(rdms, SparseRDMs):
+        return _pool_sparse(rdms, method, corr_offset=0)
+    rule, _ = _pool_rule(method)
+    return _pool_dense(rdms, rule, corr_offset=0)
 
 
 def all_tests(evaluations, noise_ceil, test_type='t-test',
@@ -571,6 +496,75 @@ def extract_variances(variance, nc_included=True):
     return model_variances, diff_variances, nc_variances
 
 
+def bootstrap_mc_error(evaluations, noise_ceil=None, alpha=0.05):
+    """ Monte Carlo error of the statistics of a bootstrap, which shrinks
+    with the number of bootstrap samples
+
+    The statistics are the standard deviations and the bootstrap p-values
+    of the model evaluations, of their pairwise differences and, if the
+    noise ceiling is given per sample, of their differences to the lower
+    noise ceiling. The error of a standard deviation is its standard error
+    relative to the standard deviation itself. The error of a p-value is
+    its absolute standard error.
+
+    The precision of a p-value matters only for the decision whether it is
+    below alpha. A p-value thus enters only while alpha lies within two
+    standard errors of it. Otherwise, e.g. for pairwise differences with
+    p-values around 0.5, its error of about 1 / sqrt(n) would dominate
+    without changing any test.
+
+    Args:
+        evaluations (numpy.ndarray):
+            bootstrap evaluations, bootstrap samples x models x ...
+            Samples with nan evaluations are ignored
+        noise_ceil (numpy.ndarray):
+            noise ceilings per bootstrap sample, 2 x bootstrap samples,
+            None for a fixed noise ceiling
+        alpha (float):
+            significance level the p-values are compared to, which
+            should include any correction for multiple tests.
+            None includes all p-values
+
+    Returns:
+        float: the largest Monte Carlo error, inf for fewer than 2 samples
+
+    """
+    evaluations = np.asarray(evaluations, dtype=float)
+    while evaluations.ndim > 2:
+        evaluations = np.nanmean(evaluations, axis=-1)
+    eval_ok = np.isfinite(evaluations[:, 0])
+    evaluations = evaluations[eval_ok]
+    n_model = evaluations.shape[1]
+    stats_samples = [evaluations,
+                     evaluations @ pairwise_contrast(np.arange(n_model)).T]
+    # pairwise tests are two sided, the others one sided
+    two_sided = [np.zeros(n_model, bool),
+                 np.ones(stats_samples[1].shape[1], bool)]
+    if noise_ceil is not None:
+        noise_lower = np.asarray(noise_ceil, dtype=float)[0][eval_ok]
+        stats_samples.append(noise_lower.reshape(-1, 1) - evaluations)
+        two_sided.append(np.zeros(n_model, bool))
+    stats_samples = np.concatenate(stats_samples, axis=1)
+    two_sided = np.concatenate(two_sided)
+    n = stats_samples.shape[0]
+    if n < 2:
+        return np.inf
+    dev2 = (stats_samples - np.mean(stats_samples, axis=0)) ** 2
+    var = np.mean(dev2, axis=0)
+    constant = var == 0
+    # delta method: se(sd) / sd = se(var) / var / 2
+    sd_error = np.std(dev2, axis=0) / np.where(constant, 1, var) \
+        / np.sqrt(n) / 2
+    sd_error[constant] = 0
+    p = np.mean(stats_samples > 0, axis=0)
+    p_value = np.where(two_sided, 2 * np.minimum(p, 1 - p), 1 - p)
+    p_error = np.where(two_sided, 2, 1) * np.sqrt(p * (1 - p) / n)
+    if alpha is not None:
+        p_error = p_error[np.abs(p_value - alpha) <= 2 * p_error]
+    return float(max(np.max(sd_error, initial=0),
+                     np.max(p_error, initial=0)))
+
+
 def get_errorbars(model_var, evaluations, dof, error_bars='sem',
                   test_type='t-test'):
     """ computes errorbars for the model-evaluations from a results object
@@ -4,10 +4,13 @@
 Collection of different utility Matrices
 """
 
+from functools import lru_cache
 from typing import List
 
 import numpy as np
-from scipy.sparse import coo_matrix, csr_matrix
+import scipy.linalg
+from scipy.sparse import coo_matrix, csr_matrix, diags, issparse
+from scipy.sparse.linalg import splu
 
 
 def indicator(index_vector, positive=False):
@@ -167,6 +170,8 @@ def get_v(n_cond, sigma_k):
     c_mat = pairwise_contrast_sparse(np.arange(n_cond))
     if sigma_k is None:
         xi = c_mat @ c_mat.transpose()
+    elif sigma_k.ndim == 1:
+        xi = c_mat @ diags(sigma_k) @ c_mat.transpose()
     else:
         sigma_k = csr_matrix(sigma_k)
         xi = c_mat @ sigma_k @ c_mat.transpose()
@@ -175,6 +180,78 @@ def get_v(n_cond, sigma_k):
     return v
 
 
+def solve_v(vectors, n_cond, sigma_k=None, nan_idx=None):
+    """ computes V^-1 x for each RDM vector x, where V is the rdm covariance
+    from get_v. The factorization of V is cached, keyed by n_cond, sigma_k
+    and the pattern of valid entries, such that repeated calls with the
+    same setting only solve the triangular systems.
+
+    Args:
+        vectors (numpy.ndarray): RDM vectors (2D), restricted to nan_idx
+        n_cond (int): number of conditions
+        sigma_k (numpy.ndarray): optional, covariance between patterns
+        nan_idx (numpy.ndarray): optional, boolean vector of the entries
+            of the full RDM vector which are present in vectors
+
+    Returns:
+        numpy.ndarray: V^-1 x for each row x of vectors
+
+    """
+    if sigma_k is None:
+        sigma_key = None
+    else:
+        sigma_k = np.ascontiguousarray(sigma_k, dtype=np.float64)
+        sigma_key = (sigma_k.shape, sigma_k.tobytes())
+    if nan_idx is None or np.all(nan_idx):
+        nan_key = None
+    else:
+        nan_key = np.packbits(nan_idx).tobytes()
+    solve = _v_solver(n_cond, sigma_key, nan_key)
+    return solve(np.asarray(vectors, dtype=np.float64).T).T
+
+
+@lru_cache(maxsize=16)
+def _v_solver(n_cond, sigma_key, nan_key):
+    """ cached factorization of V, see solve_v"""
+    if sigma_key is None:
+        sigma_k = None
+    else:
+        sigma_k = np.frombuffer(sigma_key[1]).reshape(sigma_key[0])
+    v = get_v(n_cond, sigma_k)
+    if nan_key is not None:
+        nan_idx = np.unpackbits(np.frombuffer(nan_key, dtype=np.uint8),
+                                count=v.shape[0]).astype(bool)
+        v = v[nan_idx][:, nan_idx]
+    return factorize_v(v)
+
+
+def factorize_v(v):
+    """ factorizes an rdm covariance V
+
+    Sparse V (diagonal or no sigma_k) get a sparse LU decomposition, dense
+    ones (full sigma_k) a Cholesky decomposition.
+
+    Args:
+        v (scipy.sparse.spmatrix or numpy.ndarray): rdm covariance
+
+    Returns:
+        function: solves V x = b for all columns of b at once
+
+    """
+    if issparse(v):
+        if v.nnz < 0.1 * v.shape[0] * v.shape[1]:
+            return splu(v.tocsc()).solve
+        v_dense = v.toarray()
+    else:
+        v_dense = np.asarray(v)
+    try:
+        factor = scipy.linalg.cho_factor(v_dense)
+        return lambda b: scipy.linalg.cho_solve(factor, b)
+    except np.linalg.LinAlgError:
+        factor = scipy.linalg.lu_factor(v_dense)
+        return lambda b: scipy.linalg.lu_solve(factor, b)
+
+
 def _row_col_indicator(row_i, col_i, n_cond):
     """ Helper function that writes the correct pattern for the
     row / column indicator matrix
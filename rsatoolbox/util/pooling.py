@@ -7,10 +7,12 @@ Created on Tue Oct 20 23:58:28 2020
 """
 
 import numpy as np
-import scipy.sparse
 from scipy.stats import rankdata
 from rsatoolbox.rdm import RDMs
-from rsatoolbox.util.matrix import get_v
+from rsatoolbox.rdm.compare import get_method
+from rsatoolbox.rdm.sparse import SparseRDMs, _pair_mean, _row_sum
+from rsatoolbox.util.matrix import solve_v
+from rsatoolbox.util.rdm_utils import batch_rank
 
 
 def pool_rdm(rdms, method='cosine', sigma_k=None):
@@ -23,66 +25,61 @@ def pool_rdm(rdms, method='cosine', sigma_k=None):
             RDMs to be pooled
         method : String, optional
             Which comparison method to optimize for. The default is 'cosine'.
+            The pooling rule is declared by the method in the registry of
+            rsatoolbox.rdm.compare, 'euclid' gives the plain mean.
 
     Returns:
         pyrsa.rdm.RDMs: the pooled RDM, i.e. a RDM with maximal performance
             under the chosen method
 
     """
-    rdm_vec = rdms.get_vectors()
+    rule, whiten = _pool_rule(method)
+    if isinstance(rdms, SparseRDMs):
+        if whiten:
+            rdms = rdms.to_rdms()
+        else:
+            return _pool_sparse(rdms, method)
+    return _pool_dense(rdms, rule, corr_offset=0.01, whiten=whiten,
+                       sigma_k=sigma_k)
+
+
+def _pool_rule(method):
+    """ the pooling rule declared by a comparison method and whether the
+    method whitens. 'euclid' pools by the plain mean.
+
+    Args:
+        method(String): comparison method to optimize for
+
+    Returns:
+        rule(String): 'mean', 'cosine', 'corr' or 'rank'
+        whiten(bool): whether the method whitens the RDM entries
+
+    """
     if method == 'euclid':
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'cosine':
-        rdm_vec = rdm_vec / np.sqrt(np.nanmean(rdm_vec ** 2, axis=1,
-                                               keepdims=True))
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'corr':
-        rdm_vec = rdm_vec - np.nanmean(rdm_vec, axis=1, keepdims=True)
-        rdm_vec = rdm_vec / np.nanstd(rdm_vec, axis=1, keepdims=True)
-        rdm_vec = _nan_mean(rdm_vec)
-        rdm_vec = rdm_vec - np.nanmin(rdm_vec) + 0.01
-    elif method == 'cosine_cov':
-        v = get_v(rdms.n_cond, sigma_k=sigma_k)
-        ok_idx = np.all(np.isfinite(rdm_vec), axis=0)
-        v = v[ok_idx][:, ok_idx]
-        rdm_vec_nonan = rdm_vec[:, ok_idx]
-        v_inv_x = np.array([scipy.sparse.linalg.cg(v, rdm_vec_nonan[i],
-                                                   atol=10 ** -9)[0]
-                            for i in range(rdms.n_rdm)])
-        rdm_norms = np.einsum('ij, ij->i', rdm_vec_nonan, v_inv_x).reshape(
-            [rdms.n_rdm, 1])
-        rdm_vec = rdm_vec / np.sqrt(rdm_norms)
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'corr_cov':
-        rdm_vec = rdm_vec - np.nanmean(rdm_vec, axis=1, keepdims=True)
-        v = get_v(rdms.n_cond, sigma_k=sigma_k)
-        ok_idx = np.all(np.isfinite(rdm_vec), axis=0)
-        v = v[ok_idx][:, ok_idx]
-        rdm_vec_nonan = rdm_vec[:, ok_idx]
-        v_inv_x = np.array([scipy.sparse.linalg.cg(v, rdm_vec_nonan[i],
-                                                   atol=10 ** -9)[0]
-                            for i in range(rdms.n_rdm)])
-        rdm_norms = np.einsum('ij, ij->i', rdm_vec_nonan, v_inv_x).reshape(
-            [rdms.n_rdm, 1])
-        rdm_vec = rdm_vec / np.sqrt(rdm_norms)
-        rdm_vec = _nan_mean(rdm_vec)
-        rdm_vec = rdm_vec - np.nanmin(rdm_vec) + 0.01
-    elif method == 'spearman' or method == 'rho-a':
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'rho-a':
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'kendall' or method == 'tau-b':
-        Warning('Noise ceiling for tau based on averaged ranks!')
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    elif method == 'tau-a':
-        Warning('Noise ceiling for tau based on averaged ranks!')
-        rdm_vec = np.array([_nan_rank_data(v) for v in rdm_vec])
-        rdm_vec = _nan_mean(rdm_vec)
-    else:
-        raise ValueError('Unknown RDM comparison method requested!')
+        return 'mean', False
+    info = get_method(method)
+    return info.pool, info.whiten
+
+
+def _pool_dense(rdms, rule, corr_offset=0.01, whiten=False, sigma_k=None):
+    """ pools RDMs with nans for masked entries by a pooling rule
+
+    Args:
+        rdms(rsatoolbox.rdm.RDMs): RDMs to be pooled
+        rule(String): 'mean', 'cosine', 'corr' or 'rank'
+        corr_offset(float): added after the minimum is subtracted for
+            the 'corr' rule
+        whiten(bool): whether to normalize with the whitened norm
+        sigma_k(numpy.ndarray): pattern covariance for whitening
+
+    Returns:
+        rsatoolbox.rdm.RDMs: the pooled RDM
+
+    """
+    rdm_vec = _pool_vectors(rdms, rule, whiten=whiten, sigma_k=sigma_k)
+    rdm_vec = _nan_mean(rdm_vec)
+    if rule == 'corr':
+        rdm_vec = rdm_vec - np.nanmin(rdm_vec) + corr_offset
     return RDMs(rdm_vec,
                 dissimilarity_measure=rdms.dissimilarity_measure,
                 descriptors=rdms.descriptors,
@@ -90,6 +87,41 @@ def pool_rdm(rdms, method='cosine', sigma_k=None):
                 pattern_descriptors=rdms.pattern_descriptors)
 
 
+def _pool_vectors(rdms, rule, whiten=False, sigma_k=None):
+    """ the RDM vectors normalized by a pooling rule, whose mean is the
+    pooled RDM up to the shift of the 'corr' rule
+
+    Args:
+        rdms(rsatoolbox.rdm.RDMs): RDMs to be pooled
+        rule(String): 'mean', 'cosine', 'corr' or 'rank'
+        whiten(bool): whether to normalize with the whitened norm
+        sigma_k(numpy.ndarray): pattern covariance for whitening
+
+    Returns:
+        numpy.ndarray: normalized RDM vectors
+
+    """
+    rdm_vec = rdms.get_vectors()
+    if rule == 'rank':
+        rdm_vec = batch_rank(rdm_vec)
+    elif rule in ('cosine', 'corr'):
+        if rule == 'corr':
+            rdm_vec = rdm_vec - np.nanmean(rdm_vec, axis=1, keepdims=True)
+        if whiten:
+            ok_idx = np.all(np.isfinite(rdm_vec), axis=0)
+            rdm_vec_nonan = rdm_vec[:, ok_idx]
+            v_inv_x = solve_v(rdm_vec_nonan, rdms.n_cond, sigma_k, ok_idx)
+            rdm_norms = np.einsum('ij, ij->i', rdm_vec_nonan,
+                                  v_inv_x).reshape([rdms.n_rdm, 1])
+            rdm_vec = rdm_vec / np.sqrt(rdm_norms)
+        elif rule == 'cosine':
+            rdm_vec = rdm_vec / np.sqrt(np.nanmean(rdm_vec ** 2, axis=1,
+                                                   keepdims=True))
+        else:
+            rdm_vec = rdm_vec / np.nanstd(rdm_vec, axis=1, keepdims=True)
+    return rdm_vec
+
+
 def _nan_mean(rdm_vector):
     """ takes the average over a rdm_vector with nans for masked entries
     without a warning
@@ -108,18 +140,39 @@ def _nan_mean(rdm_vector):
     return rdm_mean
 
 
-def _nan_rank_data(rdm_vector):
-    """ rank_data for vectors with nan entries
+def _pool_sparse(rdms, method='cosine', corr_offset=0.01):
+    """ pools SparseRDMs using only the observed pairs. Each pair is
+    averaged over the RDMs which observe it.
 
     Args:
-        rdm_vector(numpy.ndarray): the vector to be rank_transformed
+        rdms(SparseRDMs): RDMs to be pooled
+        method(String): comparison method to optimize for
+        corr_offset(float): added after the minimum is subtracted for
+            correlation based methods
 
     Returns:
-        ranks(numpy.ndarray): the ranks with nans where the original vector
-            had nans
+        rsatoolbox.rdm.RDMs: the pooled RDM
 
     """
-    ranks_no_nan = rankdata(rdm_vector[~np.isnan(rdm_vector)])
-    ranks = np.ones_like(rdm_vector) * np.nan
-    ranks[~np.isnan(rdm_vector)] = ranks_no_nan
-    return ranks
+    rule, _ = _pool_rule(method)
+    values = rdms.values.astype(np.float64)
+    counts = rdms.get_counts()
+    rows = rdms.get_rows()
+    if rule == 'cosine':
+        values = values / np.sqrt(
+            _row_sum(values ** 2, rdms.indptr) / counts)[rows]
+    elif rule == 'corr':
+        values = values - (_row_sum(values, rdms.indptr) / counts)[rows]
+        values = values / np.sqrt(
+            _row_sum(values ** 2, rdms.indptr) / counts)[rows]
+    elif rule == 'rank':
+        values = np.concatenate(
+            [rankdata(v) for v in np.split(values, rdms.indptr[1:-1])])
+    rdm_vec = _pair_mean(values, rdms.pair_index, rdms.n_pairs)
+    if rule == 'corr':
+        rdm_vec = rdm_vec - np.nanmin(rdm_vec) + corr_offset
+    return RDMs(rdm_vec.reshape(1, -1),
+                dissimilarity_measure=rdms.dissimilarity_measure,
+                descriptors=rdms.descriptors,
+                rdm_descriptors=None,
+                pattern_descriptors=rdms.pattern_descriptors)
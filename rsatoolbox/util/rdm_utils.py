@@ -32,7 +32,8 @@ def batch_to_vectors(x):
         m = x
         n_rdm = x.shape[0]
         n_cond = x.shape[1]
-        v = np.ndarray((n_rdm, int(n_cond * (n_cond - 1) / 2)))
+        v = np.ndarray((n_rdm, int(n_cond * (n_cond - 1) / 2)),
+                       dtype=_float_dtype(x.dtype))
         for idx in np.arange(n_rdm):
             v[idx, :] = squareform(m[idx, :, :], checks=False)
     elif x.ndim == 1:
@@ -59,7 +60,7 @@ def batch_to_matrices(x):
         v = x
         n_rdm = x.shape[0]
         n_cond = _get_n_from_reduced_vectors(x)
-        m = np.ndarray((n_rdm, n_cond, n_cond))
+        m = np.ndarray((n_rdm, n_cond, n_cond), dtype=_float_dtype(x.dtype))
         for idx in np.arange(n_rdm):
             m[idx, :, :] = squareform(v[idx, :])
     elif x.ndim == 3:
@@ -69,6 +70,126 @@ def batch_to_matrices(x):
     return m, n_rdm, n_cond
 
 
+def batch_rank(x, method='average', axis=-1):
+    """ranks a stack of vectors along an axis in one pass.
+    Equivalent to applying scipy.stats.rankdata to each vector, except that
+    nan entries are ignored for ranking and stay nan in the output.
+
+    Args:
+        x (np.ndarray): values to be ranked
+        method (String):
+            controls how ranks are assigned to equal values
+            options are: 'average', 'min', 'max', 'dense', 'ordinal'
+        axis (int): axis along which to rank. Defaults to the last one
+
+    Returns:
+        np.ndarray: ranks, float64, same shape as x
+    """
+    if method not in ('average', 'min', 'max', 'dense', 'ordinal'):
+        raise ValueError('Unknown ranking method: ' + str(method))
+    x = np.moveaxis(np.asarray(x), axis, -1)
+    shape = x.shape
+    x = x.reshape(-1, shape[-1])
+    n = x.shape[1]
+    # stable sorting keeps ties in their original order and nans last
+    order = np.argsort(x, axis=1, kind='stable')
+    x_sorted = np.take_along_axis(x, order, axis=1)
+    valid = ~np.isnan(x_sorted)
+    pos = np.broadcast_to(np.arange(n), x.shape)
+    new_group = np.ones(x.shape, bool)
+    new_group[:, 1:] = x_sorted[:, 1:] != x_sorted[:, :-1]
+    if method == 'ordinal':
+        ranks_sorted = pos + 1.0
+    elif method == 'dense':
+        ranks_sorted = np.cumsum(new_group, axis=1, dtype=np.float64)
+    else:
+        first = np.maximum.accumulate(np.where(new_group, pos, 0), axis=1)
+        group_end = np.ones(x.shape, bool)
+        group_end[:, :-1] = new_group[:, 1:]
+        last = np.minimum.accumulate(
+            np.where(group_end, pos, n)[:, ::-1], axis=1)[:, ::-1]
+        if method == 'min':
+            ranks_sorted = first + 1.0
+        elif method == 'max':
+            ranks_sorted = last + 1.0
+        else:
+            ranks_sorted = (first + last) / 2 + 1
+    ranks_sorted[~valid] = np.nan
+    ranks = np.empty(x.shape)
+    np.put_along_axis(ranks, order, ranks_sorted, axis=1)
+    return np.moveaxis(ranks.reshape(shape), -1, axis)
+
+
+def _selection(descriptor, value):
+    """ indices of all entries of a descriptor equal to each value in turn,
+    as selected by RDMs.subsample and RDMs.subsample_pattern
+
+    Args:
+        descriptor (list or numpy.ndarray): descriptor values
+        value: value(s) to select, may contain repetitions
+
+    Returns:
+        numpy.ndarray: selected indices
+    """
+    descriptor = np.asarray(descriptor)
+    return np.concatenate(
+        [np.nonzero(descriptor == v)[0] for v in np.atleast_1d(value)]
+        + [np.empty(0, np.intp)]).astype(np.intp)
+
+
+def _pair_source(n_cond, selection):
+    """ index into the vectorform of an RDM for each pair of a pattern
+    selection, such that vectors[:, source] is the vectorform of the RDM
+    over the selected patterns. Pairs of the same pattern are -1.
+
+    Args:
+        n_cond (int): number of patterns of the original RDMs
+        selection (numpy.ndarray): selected patterns, sorted
+
+    Returns:
+        numpy.ndarray: source index of each pair
+    """
+    idx_1, idx_2 = np.triu_indices(len(selection), 1)
+    cond_1, cond_2 = selection[idx_1], selection[idx_2]
+    source = (n_cond * cond_1 - cond_1 * (cond_1 + 1) // 2
+              + cond_2 - cond_1 - 1)
+    source[cond_1 == cond_2] = -1
+    return source
+
+
+def _subsample_vectors(vectors, n_cond, rows=None, selection=None):
+    """ gathers the vectors of subsampled RDMs directly, equivalent to
+    RDMs.subsample followed by RDMs.subsample_pattern
+
+    Args:
+        vectors (numpy.ndarray): RDM vectors (2D)
+        n_cond (int): number of patterns
+        rows (numpy.ndarray): selected RDMs, None for all
+        selection (numpy.ndarray): selected patterns, sorted, None for all
+
+    Returns:
+        numpy.ndarray: vectors of the subsampled RDMs, with nans for pairs
+            of the same pattern
+    """
+    if rows is not None:
+        vectors = vectors[rows]
+    if selection is None:
+        return vectors
+    source = _pair_source(n_cond, selection)
+    vectors = vectors[:, source].astype(_float_dtype(vectors.dtype),
+                                        copy=False)
+    vectors[:, source == -1] = np.nan
+    return vectors
+
+
+def _float_dtype(dtype):
+    """keeps floating point dtypes, everything else is converted to float64
+    """
+    if np.issubdtype(dtype, np.floating):
+        return dtype
+    return np.float64
+
+
 def _get_n_from_reduced_vectors(x):
     """
     calculates the size of the RDM from the vector representation
@@ -62,6 +62,20 @@ class TestCalcRDM(unittest.TestCase):
                            method='euclidean')
         assert rdm.n_cond == 6
 
+    def test_calc_dtype(self):
+        d = self.test_data
+        rdm = rsr.calc_rdm(d, descriptor='conds', method='euclidean')
+        rdm_32 = rsr.calc_rdm(d, descriptor='conds', method='euclidean',
+                              dtype=np.float32)
+        assert rdm_32.dissimilarities.dtype == np.float32
+        assert_array_almost_equal(rdm.dissimilarities,
+                                  rdm_32.dissimilarities, decimal=5)
+        d_16 = rsa.data.Dataset(d.measurements, dtype=np.float16,
+                                obs_descriptors=d.obs_descriptors)
+        assert d_16.measurements.dtype == np.float16
+        rdm_16 = rsr.calc_rdm(d_16, descriptor='conds', method='correlation')
+        assert rdm_16.dissimilarities.dtype == np.float32
+
     def test_parse_input(self):
         from rsatoolbox.rdm.calc import _parse_input
         data = Mock()
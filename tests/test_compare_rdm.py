@@ -122,6 +122,50 @@ class TestCompareRDM(unittest.TestCase):
         assert result.shape[0] == 5
         assert result.shape[1] == 7
         assert np.all(result < 0)
+        result_parallel = compare_neg_riemannian_distance(
+            rdms2, rdms3, n_jobs=2)
+        assert_array_almost_equal(result, result_parallel)
+        result_loky = compare_neg_riemannian_distance(
+            rdms2, rdms3, n_jobs=2, backend='loky')
+        assert_array_almost_equal(result, result_loky)
+
+    def test_neg_riemannian_distance_reference(self):
+        from rsatoolbox.rdm.compare import compare_neg_riemannian_distance
+        from scipy import linalg
+        from scipy.optimize import minimize
+        from scipy.spatial.distance import squareform
+        rdms1 = np.array([[1, 2, 3, 2, 3, 1],
+                          [0.5, 1, 2, 1.5, 1, 2]])
+        rdms2 = np.array([[2, 1, 2, 3, 1, 2],
+                          [1, 1, 1, 1, 1, 1],
+                          [0.2, 1.5, 1, 2, 1, 0.5]])
+        result = compare_neg_riemannian_distance(rdms1, rdms2)
+        # minima of the generalized eigenproblem objective, started from
+        # a grid of scalings
+        P = np.block([-np.ones((3, 1)), np.eye(3)])
+        sigma_k = P @ P.T
+        expected = np.empty((2, 3))
+        for i, vec1 in enumerate(rdms1):
+            for j, vec2 in enumerate(rdms2):
+                G1 = -0.5 * P @ squareform(vec1) @ P.T
+                G2 = -0.5 * P @ squareform(vec2) @ P.T
+
+                def fun(theta):
+                    return np.sqrt((np.log(linalg.eigvalsh(
+                        np.exp(theta[0]) * G1 + np.exp(theta[1]) * sigma_k,
+                        G2))**2).sum())
+                expected[i, j] = -min(
+                    minimize(fun, (a, b), method='Nelder-Mead',
+                             options={'xatol': 1e-10, 'fatol': 1e-12}).fun
+                    for a in (-3, 0, 3) for b in (-3, 0, 3))
+        assert_array_almost_equal(result, expected, decimal=6)
+        assert_array_almost_equal(
+            result, [[-1.3995946, 0, -2.3407724],
+                     [-1.1332267, 0, -1.8283931]], decimal=6)
+        assert_array_almost_equal(
+            compare_neg_riemannian_distance(rdms1, rdms2, n_jobs=2,
+                                            backend='loky'),
+            result)
 
     def test_compare_corr_loop(self):
         from rsatoolbox.rdm.compare import compare_correlation
@@ -195,6 +239,47 @@ class TestCompareRDM(unittest.TestCase):
         result = compare_kendall_tau_a(self.test_rdm1, self.test_rdm2)
         assert np.all(result < 1)
 
+    def test_compare_kendall_ties(self):
+        from rsatoolbox.rdm.compare import compare_kendall_tau
+        from rsatoolbox.rdm.compare import compare_kendall_tau_a
+        import scipy.stats
+        vectors1 = np.random.randint(0, 3, (4, 15)).astype(float)
+        vectors2 = np.random.rand(5, 15)
+        vectors2[:2] = np.random.randint(0, 4, (2, 15))
+        tau_b = compare_kendall_tau(vectors1, vectors2)
+        tau_a = compare_kendall_tau_a(vectors1, vectors2)
+        sign1 = np.sign(vectors1[:, :, None] - vectors1[:, None])
+        sign2 = np.sign(vectors2[:, :, None] - vectors2[:, None])
+        assert_array_almost_equal(
+            tau_a, np.einsum('ijk,ljk->il', sign1, sign2) / 15 / 14)
+        for i in range(4):
+            for j in range(5):
+                self.assertAlmostEqual(
+                    tau_b[i, j],
+                    scipy.stats.kendalltau(vectors1[i], vectors2[j])[0])
+
+    def test_compare_kendall_long(self):
+        from rsatoolbox.rdm.compare import compare_kendall_tau
+        import scipy.stats
+        vectors1 = np.random.rand(3, 190)
+        vectors1[0] = np.random.randint(0, 5, 190)
+        vectors2 = np.random.rand(4, 190)
+        vectors2[1] = np.random.randint(0, 7, 190)
+        tau_b = compare_kendall_tau(vectors1, vectors2)
+        for i in range(3):
+            for j in range(4):
+                self.assertAlmostEqual(
+                    tau_b[i, j],
+                    scipy.stats.kendalltau(vectors1[i], vectors2[j])[0])
+
+    def test_count_inversions(self):
+        from rsatoolbox.rdm.compare import _count_inversions
+        for n in [1, 2, 7, 8, 9, 33]:
+            values = np.random.randint(0, 5, (3, n))
+            brute = np.sum(np.triu(values[:, :, None] > values[:, None], 1),
+                           axis=(1, 2))
+            np.testing.assert_array_equal(_count_inversions(values), brute)
+
     def test_compare(self):
         from rsatoolbox.rdm.compare import compare
         result = compare(self.test_rdm1, self.test_rdm1)
@@ -370,6 +455,76 @@ class TestCompareRDMNaN(unittest.TestCase):
         result = compare(self.test_rdm1, self.test_rdm2, method='cosine_cov')
         result = compare(self.test_rdm1, self.test_rdm2, method='kendall')
 
+    def test_compare_function(self):
+        from joblib import parallel_backend
+        from rsatoolbox.rdm.compare import compare, _all_combinations
+        from rsatoolbox.rdm.compare import _parse_input_rdms
+
+        def _corr(vector1, vector2):
+            return np.corrcoef(vector1, vector2)[0, 1]
+        expected = compare(self.test_rdm3, self.test_rdm2, method='corr')
+        assert_array_almost_equal(
+            compare(self.test_rdm3, self.test_rdm2, method=_corr), expected)
+        with parallel_backend('threading', n_jobs=2):
+            assert_array_almost_equal(
+                compare(self.test_rdm3, self.test_rdm2, method=_corr),
+                expected)
+        vector1, vector2, _ = _parse_input_rdms(self.test_rdm3,
+                                                self.test_rdm2)
+        assert_array_almost_equal(
+            _all_combinations(vector1, vector2, _corr, n_jobs=3,
+                              chunk_size=2),
+            expected)
+
+    def test_compare_pairwise(self):
+        from rsatoolbox.rdm.compare import compare
+        import scipy.stats
+        vectors1 = np.random.rand(3, 15)
+        vectors2 = np.random.rand(4, 15)
+        vectors1[np.random.rand(3, 15) < 0.2] = np.nan
+        vectors2[np.random.rand(4, 15) < 0.2] = np.nan
+        vectors2[1, [0, 4]] = np.nan
+        vectors2[2] = vectors2[1]
+        funcs = {
+            'cosine': lambda x, y: x @ y / np.linalg.norm(x) / np.linalg.norm(y),
+            'corr': lambda x, y: np.corrcoef(x, y)[0, 1],
+            'spearman': lambda x, y: scipy.stats.spearmanr(x, y).correlation}
+        for method, func in funcs.items():
+            result = compare(vectors1, vectors2, method=method,
+                             nan_mode='pairwise')
+            for i in range(3):
+                for j in range(4):
+                    joint = ~np.isnan(vectors1[i]) & ~np.isnan(vectors2[j])
+                    self.assertAlmostEqual(
+                        result[i, j],
+                        func(vectors1[i, joint], vectors2[j, joint]))
+        result = compare(self.test_rdm1, self.test_rdm2, method='corr',
+                         nan_mode='pairwise')
+        assert_array_almost_equal(
+            result, compare(self.test_rdm1, self.test_rdm2, method='corr'))
+        with self.assertRaises(ValueError):
+            compare(vectors1, vectors2, method='tau-a', nan_mode='pairwise')
+
+    def test_pairwise_spearman_distinct_masks(self):
+        from rsatoolbox.rdm.compare import compare
+        import scipy.stats
+        vectors1 = np.random.rand(5, 45)
+        vectors1[0] = np.random.randint(0, 4, 45)
+        vectors2 = np.random.rand(6, 45)
+        vectors2[2] = np.random.randint(0, 6, 45)
+        # every vector misses a different set of entries
+        vectors1[np.random.rand(5, 45) < 0.3] = np.nan
+        vectors2[np.random.rand(6, 45) < 0.3] = np.nan
+        result = compare(vectors1, vectors2, method='spearman',
+                         nan_mode='pairwise')
+        for i in range(5):
+            for j in range(6):
+                joint = ~np.isnan(vectors1[i]) & ~np.isnan(vectors2[j])
+                self.assertAlmostEqual(
+                    result[i, j],
+                    scipy.stats.spearmanr(vectors1[i, joint],
+                                          vectors2[j, joint]).correlation)
+
 
 class TestCompareCov(unittest.TestCase):
 
@@ -418,3 +573,147 @@ class TestCompareCov(unittest.TestCase):
             sigma_k=np.eye(6))
         assert_array_almost_equal(result, result_1D)
         assert_array_almost_equal(result, result_2D)
+
+
+class TestComparisonPlan(unittest.TestCase):
+    """ ComparisonPlan gives the same results as compare """
+
+    def setUp(self):
+        self.model_rdms = rsa.rdm.RDMs(np.random.rand(3, 28))
+        self.data_rdms = rsa.rdm.RDMs(np.random.rand(5, 28))
+
+    def test_plan_equals_compare(self):
+        from rsatoolbox.rdm import ComparisonPlan, compare
+        pattern_idx = np.array([0, 2, 2, 3, 5, 6, 7, 7])
+        data = self.data_rdms.subsample_pattern('index', pattern_idx)
+        for method in ['cosine', 'corr', 'spearman', 'rho-a', 'tau-a',
+                       'cosine_cov', 'corr_cov']:
+            plan = ComparisonPlan(self.model_rdms, method=method)
+            for _ in range(2):
+                assert_array_almost_equal(
+                    plan.compare(data, pattern_idx),
+                    compare(self.model_rdms.subsample_pattern(
+                        'index', pattern_idx), data, method=method))
+            assert_array_almost_equal(
+                plan.compare(self.data_rdms),
+                compare(self.model_rdms, self.data_rdms, method=method))
+
+    def test_plan_sigma_k(self):
+        from rsatoolbox.rdm import ComparisonPlan, compare
+        sigma_k = np.eye(8) + 0.1 * np.random.rand(8, 8)
+        sigma_k = sigma_k @ sigma_k.T
+        plan = ComparisonPlan(self.model_rdms, method='corr_cov',
+                              sigma_k=sigma_k)
+        assert_array_almost_equal(
+            plan.compare(self.data_rdms),
+            compare(self.model_rdms, self.data_rdms, method='corr_cov',
+                    sigma_k=sigma_k))
+
+    def test_plan_lru(self):
+        from rsatoolbox.rdm import ComparisonPlan
+        plan = ComparisonPlan(self.model_rdms, maxsize=2)
+        for idx in [[0, 1, 2], [1, 2, 3], [2, 1, 0], [3, 4, 5]]:
+            plan.compare(
+                self.data_rdms.subsample_pattern('index', idx), idx)
+        self.assertEqual(list(plan._cache.keys()),
+                         [(0, 1, 2), (3, 4, 5)])
+
+    def test_rank_cache(self):
+        from rsatoolbox.rdm import ComparisonPlan, RankCache
+        from rsatoolbox.util.rdm_utils import batch_rank
+        data = rsa.rdm.RDMs(np.round(np.random.rand(5, 28), 1))
+        ranks = RankCache(data)
+        rdm_idx = np.array([0, 0, 3, 4, 1])
+        pattern_idx = np.array([0, 2, 2, 3, 5, 6, 7, 7])
+        sample = data.subsample('index', rdm_idx).subsample_pattern(
+            'index', pattern_idx)
+        sample_ranks = ranks.get_ranks('index', rdm_idx,
+                                       'index', pattern_idx)
+        np.testing.assert_array_equal(
+            np.isnan(sample_ranks), np.isnan(sample.get_vectors()))
+        assert_array_almost_equal(
+            np.nan_to_num(sample_ranks),
+            np.nan_to_num(batch_rank(sample.get_vectors())))
+        plan = ComparisonPlan(self.model_rdms, method='spearman')
+        assert_array_almost_equal(
+            plan.compare(sample_ranks, pattern_idx, ranked=True),
+            plan.compare(sample, pattern_idx))
+
+
+class TestCompareBlocked(unittest.TestCase):
+
+    def setUp(self):
+        self.rdms1 = rsa.rdm.RDMs(np.random.rand(23, 15))
+        self.rdms2 = rsa.rdm.RDMs(np.random.rand(11, 15))
+
+    def test_blocked_equals_compare(self):
+        from rsatoolbox.rdm.compare import compare, compare_blocked
+        for method in ['cosine', 'corr', 'spearman', 'rho-a', 'corr_cov',
+                       'tau-a']:
+            result = compare_blocked(self.rdms1, self.rdms2, method=method,
+                                     block_size=4, n_jobs=2)
+            assert_array_almost_equal(
+                result, compare(self.rdms1, self.rdms2, method=method))
+
+    def test_blocked_top_k(self):
+        from rsatoolbox.rdm.compare import compare, compare_blocked
+        idx, sim = compare_blocked(self.rdms1, self.rdms2, method='corr',
+                                   block_size=4, top_k=3)
+        full = compare(self.rdms1, self.rdms2, method='corr')
+        order = np.argsort(-full, axis=1)[:, :3]
+        np.testing.assert_array_equal(idx, order)
+        assert_array_almost_equal(sim, np.take_along_axis(full, order, 1))
+
+    def test_blocked_memmap(self):
+        import os
+        import tempfile
+        from rsatoolbox.rdm.compare import compare, compare_blocked
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'sim.npy')
+            compare_blocked(self.rdms1, self.rdms2, block_size=5,
+                            out=file_name)
+            assert_array_almost_equal(
+                np.load(file_name), compare(self.rdms1, self.rdms2))
+
+
+class TestMethodRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.rdms1 = rsa.rdm.RDMs(np.random.rand(3, 15))
+        self.rdms2 = rsa.rdm.RDMs(np.random.rand(4, 15))
+
+    def tearDown(self):
+        from rsatoolbox.rdm.compare import _METHODS
+        _METHODS.pop('test_dot', None)
+
+    def test_builtin_capabilities(self):
+        from rsatoolbox.rdm import get_method
+        self.assertEqual(get_method('corr').pool, 'corr')
+        self.assertTrue(get_method('spearman').ranked)
+        self.assertTrue(get_method('corr_cov').whiten)
+        self.assertIsNone(get_method('tau-a').prepare)
+        with self.assertRaises(ValueError):
+            get_method('unknown')
+
+    def test_register_method(self):
+        from rsatoolbox.rdm import register_method, compare, ComparisonPlan
+        from rsatoolbox.util.pooling import pool_rdm
+
+        def _dot(rdm1, rdm2):
+            return rdm1.get_vectors() @ rdm2.get_vectors().T
+
+        def _prepare(vectors, sigma_k=None, nan_idx=None, ranked=False):
+            return vectors, vectors
+        register_method('test_dot', _dot, pool='mean', prepare=_prepare)
+        expected = self.rdms1.get_vectors() @ self.rdms2.get_vectors().T
+        assert_array_almost_equal(
+            compare(self.rdms1, self.rdms2, method='test_dot'), expected)
+        assert_array_almost_equal(
+            ComparisonPlan(self.rdms1, method='test_dot').compare(
+                self.rdms2), expected)
+        assert_array_almost_equal(
+            pool_rdm(self.rdms2, method='test_dot').get_vectors(),
+            self.rdms2.get_vectors().mean(axis=0, keepdims=True))
+        with self.assertRaises(ValueError):
+            compare(self.rdms1, self.rdms2, method='test_dot',
+                    nan_mode='pairwise')
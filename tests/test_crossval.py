@@ -277,3 +277,86 @@ class TestCrossval(unittest.TestCase):
         assert test_set[1][0].n_cond == 3
         for train, test in zip(train_set, test_set):
             assert train[0].n_cond + test[0].n_cond == 5
+
+    def test_crossval_fold_plan(self):
+        from rsatoolbox.inference import crossval
+        from rsatoolbox.inference import sets_k_fold
+        from rsatoolbox.inference import sets_k_fold_pattern
+        from rsatoolbox.inference import FoldPlan
+        rdms = self.rdms
+        for sets_function, kwargs in [
+                (sets_k_fold, {'k_rdm': 2, 'k_pattern': 3,
+                               'rdm_descriptor': 'session'}),
+                (sets_k_fold_pattern, {'k': 3, 'random': True})]:
+            np.random.seed(0)
+            plan = sets_function(rdms, pattern_descriptor='type',
+                                 as_plan=True, **kwargs)
+            np.random.seed(0)
+            sets = sets_function(rdms, pattern_descriptor='type', **kwargs)
+            self.assertIsInstance(plan, FoldPlan)
+            for fold_sets, plan_sets in zip(sets, (plan.train, plan.test,
+                                                   plan.ceil)):
+                if fold_sets is None:
+                    self.assertIsNone(plan_sets)
+                    continue
+                for fold_set, plan_set in zip(fold_sets, plan_sets):
+                    np.testing.assert_array_equal(
+                        fold_set[0].get_vectors(),
+                        plan.get_vectors(rdms, plan_set))
+                    np.testing.assert_array_equal(fold_set[1], plan_set[2])
+            result = crossval(self.m, rdms, *sets,
+                              pattern_descriptor='type')
+            result_plan = crossval(self.m, rdms, plan,
+                                   pattern_descriptor='type')
+            np.testing.assert_allclose(result_plan.evaluations,
+                                       result.evaluations)
+            np.testing.assert_allclose(result_plan.noise_ceiling,
+                                       result.noise_ceiling)
+
+    def test_fold_plan_pattern_sample(self):
+        from rsatoolbox.inference import sets_k_fold
+        rdms = self.rdms
+        pattern_sample = np.array([0, 0, 2, 4, 4, 4, 7, 11, 15])
+        np.random.seed(0)
+        plan = sets_k_fold(rdms, k_rdm=2, k_pattern=3,
+                           pattern_descriptor='type', as_plan=True,
+                           pattern_sample=pattern_sample)
+        np.random.seed(0)
+        plan_rdms = sets_k_fold(rdms, k_rdm=2, k_pattern=3,
+                                pattern_descriptor='type', as_plan=True)
+        for fold_sets, fold_sets_rdms in [(plan.train, plan_rdms.train),
+                                          (plan.test, plan_rdms.test)]:
+            for fold_set, fold_set_rdms in zip(fold_sets, fold_sets_rdms):
+                expected = [i_samp for i in fold_set_rdms[2]
+                            for i_samp in pattern_sample if i_samp == i]
+                np.testing.assert_array_equal(fold_set[2], expected)
+                np.testing.assert_array_equal(fold_set[1], fold_set_rdms[1])
+
+    def test_dual_bootstrap_shared(self):
+        from rsatoolbox.inference import bootstrap_sample
+        from rsatoolbox.inference.evaluate import _dual_bootstrap_sample
+        from rsatoolbox.inference.evaluate import _internal_cv
+        from rsatoolbox.model import ModelWeighted
+        rdms = self.rdms
+        models = [self.m,
+                  ModelWeighted('weighted', rdms.get_vectors()[:3])]
+        np.random.seed(0)
+        evaluations, noise_ceil = _dual_bootstrap_sample(
+            models, rdms, 'corr', None, 2, 2, 2, 'index', 'session')
+        np.random.seed(0)
+        sample, rdm_idx, pattern_idx = bootstrap_sample(
+            rdms, rdm_descriptor='session', pattern_descriptor='index')
+        views = [
+            (sample, pattern_idx),
+            (rdms.subsample('session', rdm_idx),
+             np.unique(rdms.pattern_descriptors['index'])),
+            (rdms.subsample_pattern('index', pattern_idx), pattern_idx)]
+        for i_rep in range(2):
+            for i_view, (view, view_idx) in enumerate(views):
+                evals, cv_nc = _internal_cv(
+                    models, view, 'index', 'session', view_idx, 2, 2,
+                    'corr', None)
+                np.testing.assert_allclose(
+                    evaluations[:, :, i_rep, i_view], evals[0])
+                np.testing.assert_allclose(
+                    noise_ceil[:, i_rep, i_view], cv_nc)
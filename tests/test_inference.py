@@ -87,6 +87,32 @@ class TestBootstrap(unittest.TestCase):
         rdm_sample = bootstrap_sample_pattern(rdms)
         assert rdm_sample[0].n_cond == 5
 
+    def test_bootstrap_sample_idx(self):
+        from numpy.testing import assert_array_equal
+        from rsatoolbox.inference import bootstrap_sample
+        from rsatoolbox.inference import bootstrap_sample_idx
+        from rsatoolbox.rdm import RDMs
+        from rsatoolbox.util.rdm_utils import _selection
+        from rsatoolbox.util.rdm_utils import _subsample_vectors
+        rdm_des = {'session': np.array([0, 1, 2, 2, 4, 5, 6, 7, 7, 7, 7])}
+        pattern_des = {'type': np.array([0, 1, 2, 2, 4])}
+        rdms = RDMs(np.random.rand(11, 10), rdm_descriptors=rdm_des,
+                    pattern_descriptors=pattern_des)
+        for _ in range(10):
+            state = np.random.get_state()
+            sample, rdm_idx, pattern_idx = bootstrap_sample(
+                rdms, 'session', 'type')
+            np.random.set_state(state)
+            rdm_idx_2, pattern_idx_2 = bootstrap_sample_idx(
+                rdms, 'session', 'type')
+            assert_array_equal(rdm_idx, rdm_idx_2)
+            assert_array_equal(pattern_idx, pattern_idx_2)
+            vectors = _subsample_vectors(
+                rdms.get_vectors(), rdms.n_cond,
+                _selection(rdm_des['session'], rdm_idx),
+                np.sort(_selection(pattern_des['type'], pattern_idx)))
+            assert_array_equal(vectors, sample.get_vectors())
+
 
 class TestEvaluation(unittest.TestCase):
     """ evaluation tests
@@ -125,6 +151,178 @@ class TestEvaluation(unittest.TestCase):
         eval_bootstrap_rdm(m, rdms, N=10)
         eval_bootstrap_rdm(m, rdms, N=10, boot_noise_ceil=True)
 
+    def test_eval_bootstrap_vectorized(self):
+        from numpy.testing import assert_array_almost_equal
+        from rsatoolbox.inference import eval_bootstrap
+        from rsatoolbox.inference import eval_bootstrap_pattern
+        from rsatoolbox.inference import eval_bootstrap_rdm
+        from rsatoolbox.rdm import RDMs
+        from rsatoolbox.model import ModelFixed
+        pattern_des = {'type': np.array([0, 0, 1, 2, 3, 3, 4])}
+        rdms = RDMs(np.random.rand(8, 21),
+                    rdm_descriptors={'subj': [0, 0, 1, 1, 2, 3, 3, 4]},
+                    pattern_descriptors=pattern_des)
+        models = [ModelFixed('test%d' % i,
+                             RDMs(np.random.rand(21),
+                                  pattern_descriptors=pattern_des))
+                  for i in range(2)]
+        for method in ['cosine', 'corr']:
+            for eval_function, kwargs in [
+                    (eval_bootstrap, {'rdm_descriptor': 'subj',
+                                      'pattern_descriptor': 'type'}),
+                    (eval_bootstrap_pattern, {'rdm_descriptor': 'subj'}),
+                    (eval_bootstrap_rdm, {'rdm_descriptor': 'subj'})]:
+                results = []
+                for vectorized in [False, True]:
+                    np.random.seed(0)
+                    results.append(eval_function(
+                        models, rdms, method=method, N=20,
+                        vectorized=vectorized, **kwargs))
+                assert_array_almost_equal(results[0].evaluations,
+                                          results[1].evaluations)
+                assert_array_almost_equal(results[0].noise_ceiling,
+                                          results[1].noise_ceiling)
+        with self.assertRaises(ValueError):
+            eval_bootstrap_rdm(models, rdms, method='spearman', N=10,
+                               vectorized=True)
+
+    def test_eval_bootstrap_n_jobs(self):
+        from numpy.testing import assert_array_equal
+        from numpy.testing import assert_array_almost_equal
+        from rsatoolbox.inference import eval_bootstrap
+        from rsatoolbox.inference import bootstrap_crossval
+        from rsatoolbox.rdm import RDMs
+        from rsatoolbox.model import ModelFixed
+        rdms = RDMs(np.random.rand(11, 21))  # 11 7x7 rdms
+        m = ModelFixed('test', rdms.get_vectors()[0])
+        results = [eval_bootstrap(m, rdms, method='corr', N=20, n_jobs=n_jobs,
+                                  seed=3) for n_jobs in [1, 2]]
+        assert_array_equal(results[0].evaluations, results[1].evaluations)
+        assert_array_equal(results[0].noise_ceiling,
+                           results[1].noise_ceiling)
+        vectorized = eval_bootstrap(m, rdms, method='corr', N=20, n_jobs=2,
+                                    seed=3, vectorized=True)
+        assert_array_almost_equal(results[0].evaluations,
+                                  vectorized.evaluations)
+        results = [bootstrap_crossval(m, rdms, N=4, k_pattern=1, k_rdm=2,
+                                      n_jobs=n_jobs, seed=3)
+                   for n_jobs in [1, 2]]
+        assert_array_equal(results[0].evaluations, results[1].evaluations)
+
+    def test_eval_bootstrap_checkpoint(self):
+        import os
+        import tempfile
+        from numpy.testing import assert_array_equal
+        from rsatoolbox.inference import eval_bootstrap
+        from rsatoolbox.inference import merge_checkpoints
+        from rsatoolbox.inference.executor import read_checkpoint
+        from rsatoolbox.inference.executor import write_checkpoint
+        from rsatoolbox.rdm import RDMs
+        from rsatoolbox.model import ModelFixed
+        rdms = RDMs(np.random.rand(11, 21))  # 11 7x7 rdms
+        m = ModelFixed('test', rdms.get_vectors()[0])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, 'checkpoint_seeded.pkl')
+            full = eval_bootstrap(m, rdms, N=12, n_jobs=1, seed=3,
+                                  checkpoint=checkpoint)
+            # an interrupted run, the seeded samples do not depend on
+            # the random state
+            saved = read_checkpoint(checkpoint)
+            saved['results'] = saved['results'][:6]
+            write_checkpoint(checkpoint, saved)
+            resumed = eval_bootstrap(m, rdms, N=12, n_jobs=2,
+                                     checkpoint=checkpoint)
+            assert_array_equal(full.evaluations, resumed.evaluations)
+            with self.assertRaises(ValueError):
+                eval_bootstrap(m, rdms, N=12, n_jobs=1, seed=4,
+                               checkpoint=checkpoint)
+            with self.assertRaises(ValueError):
+                eval_bootstrap(m, rdms, N=13, n_jobs=1, seed=3,
+                               checkpoint=checkpoint)
+            with self.assertRaises(ValueError):
+                eval_bootstrap(m, rdms, method='corr', N=12, n_jobs=1,
+                               seed=3, checkpoint=checkpoint)
+            with self.assertRaises(ValueError):
+                eval_bootstrap(ModelFixed('other', rdms.get_vectors()[0]),
+                               rdms, N=12, n_jobs=1, seed=3,
+                               checkpoint=checkpoint)
+            with self.assertRaises(ValueError):
+                eval_bootstrap(m, RDMs(np.random.rand(11, 21)), N=12,
+                               n_jobs=1, seed=3, checkpoint=checkpoint)
+            parts = [os.path.join(tmp_dir, 'part%d.pkl' % i)
+                     for i in range(2)]
+            results = [eval_bootstrap(m, rdms, N=5, n_jobs=1, seed=i,
+                                      checkpoint=part)
+                       for i, part in enumerate(parts)]
+            merged = os.path.join(tmp_dir, 'merged.pkl')
+            self.assertEqual(merge_checkpoints(parts, merged), 10)
+            result = eval_bootstrap(m, rdms, N=10, checkpoint=merged)
+            assert_array_equal(
+                result.evaluations,
+                np.concatenate([res.evaluations for res in results]))
+            with self.assertRaises(ValueError):
+                eval_bootstrap(m, rdms, N=11, checkpoint=merged)
+            with self.assertRaises(ValueError):
+                eval_bootstrap(m, rdms, method='corr', N=10,
+                               checkpoint=merged)
+            self.assertEqual(len(read_checkpoint(merged)['results']), 10)
+
+    def test_run_samples_interrupted(self):
+        import os
+        import tempfile
+        from rsatoolbox.inference.executor import run_samples
+        interrupt_at = [6]
+        finished = []
+
+        def draw():
+            if len(finished) == interrupt_at[0]:
+                raise KeyboardInterrupt
+            finished.append(None)
+            return np.random.rand()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, 'checkpoint.pkl')
+            np.random.seed(2)
+            with self.assertRaises(KeyboardInterrupt):
+                run_samples(draw, 10, progress=False, checkpoint=checkpoint,
+                            checkpoint_interval=0)
+            interrupt_at[0] = None
+            resumed = run_samples(draw, 10, progress=False,
+                                  checkpoint=checkpoint)
+            with self.assertRaises(ValueError):
+                run_samples(draw, 10, progress=False, checkpoint=checkpoint,
+                            fingerprint='other')
+        np.random.seed(2)
+        self.assertEqual(resumed, list(np.random.rand(10)))
+
+    def test_eval_bootstrap_sequential(self):
+        from numpy.testing import assert_array_equal
+        from rsatoolbox.inference import eval_bootstrap_rdm
+        from rsatoolbox.rdm import RDMs
+        from rsatoolbox.model import ModelFixed
+        rdms = RDMs(np.random.rand(11, 21))  # 11 7x7 rdms
+        m = ModelFixed('test', rdms.get_vectors()[0])
+        np.random.seed(2)
+        result = eval_bootstrap_rdm(m, rdms, method='corr', N=1000,
+                                    tol=0.1, batch_size=20)
+        self.assertLess(result.n_bootstraps, 1000)
+        self.assertEqual(result.n_bootstraps % 20, 0)
+        self.assertLessEqual(result.mc_error, 0.1)
+        np.random.seed(2)
+        fixed = eval_bootstrap_rdm(m, rdms, method='corr',
+                                   N=result.n_bootstraps)
+        assert_array_equal(result.evaluations, fixed.evaluations)
+        self.assertGreater(fixed.mc_error, 0)
+        np.random.seed(2)
+        vectorized = eval_bootstrap_rdm(m, rdms, method='corr', N=1000,
+                                        tol=0.1, batch_size=20,
+                                        vectorized=True)
+        self.assertEqual(vectorized.n_bootstraps, result.n_bootstraps)
+        seeded = [eval_bootstrap_rdm(m, rdms, method='corr', N=1000,
+                                     tol=0.1, batch_size=20, n_jobs=n_jobs,
+                                     seed=3)
+                  for n_jobs in (1, 2)]
+        assert_array_equal(seeded[0].evaluations, seeded[1].evaluations)
+
     def test_bootstrap_testset(self):
         from rsatoolbox.inference import bootstrap_testset
         from rsatoolbox.rdm import RDMs
@@ -483,3 +681,34 @@ class TestsExtractVar(unittest.TestCase):
         self.assertEqual(diff_variances.shape[0], 45)
         self.assertEqual(nc_variances.shape[0], 10)
         self.assertEqual(nc_variances.shape[1], 2)
+
+    def test_bootstrap_mc_error(self):
+        from rsatoolbox.util.inference_util import bootstrap_mc_error
+        evaluations = np.random.randn(400, 3)
+        error = bootstrap_mc_error(evaluations)
+        self.assertGreater(error, 0)
+        self.assertLess(bootstrap_mc_error(np.tile(evaluations, (4, 1))),
+                        error)
+        noise_ceil = np.random.randn(2, 400)
+        self.assertGreaterEqual(bootstrap_mc_error(evaluations, noise_ceil),
+                                error)
+        self.assertEqual(bootstrap_mc_error(evaluations[:1]), np.inf)
+        evaluations[1:] = np.nan
+        self.assertEqual(bootstrap_mc_error(evaluations), np.inf)
+
+    def test_bootstrap_mc_error_alpha(self):
+        from rsatoolbox.util.inference_util import bootstrap_mc_error
+        rng = np.random.default_rng(0)
+        # two equally good models, clearly above 0
+        evaluations = 1 + rng.standard_normal((400, 2))
+        p_pair = np.mean(evaluations[:, 1] > evaluations[:, 0])
+        p_error = 2 * np.sqrt(p_pair * (1 - p_pair) / 400)
+        self.assertAlmostEqual(bootstrap_mc_error(evaluations, alpha=None),
+                               p_error)
+        # the two sided pairwise p-value is far above alpha
+        self.assertLess(bootstrap_mc_error(evaluations), p_error)
+        # a model close to the significance level
+        evaluations[:, 0] = 1.645 + rng.standard_normal(400)
+        p_model = np.mean(evaluations[:, 0] <= 0)
+        self.assertGreaterEqual(bootstrap_mc_error(evaluations),
+                                np.sqrt(p_model * (1 - p_model) / 400))
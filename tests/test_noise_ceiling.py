@@ -32,6 +32,31 @@ class TestNoiseCeiling(unittest.TestCase):
         _, test_set, ceil_set = sets_k_fold_rdm(rdms, k_rdm=3, random=False)
         _, _ = cv_noise_ceiling(rdms, ceil_set, test_set, method='cosine')
 
+    def test_cv_noise_ceiling_folds(self):
+        from numpy.testing import assert_allclose
+        from rsatoolbox.inference import cv_noise_ceiling
+        from rsatoolbox.inference import sets_k_fold
+        from rsatoolbox.rdm import RDMs, compare
+        from rsatoolbox.util.inference_util import pool_rdm
+        rdms = RDMs(np.random.rand(11, 36))  # 11 9x9 rdms
+        for k_pattern in [1, 2]:
+            _, test_set, ceil_set = sets_k_fold(rdms, k_rdm=3,
+                                                k_pattern=k_pattern)
+            for method in ['cosine', 'corr', 'spearman']:
+                noise_min = np.mean([
+                    np.mean(compare(
+                        pool_rdm(train[0], method).subsample_pattern(
+                            'index', test[1]), test[0], method))
+                    for train, test in zip(ceil_set, test_set)])
+                noise_max = np.mean([
+                    np.mean(compare(
+                        pool_rdm(rdms, method).subsample_pattern(
+                            'index', test[1]), test[0], method))
+                    for test in test_set])
+                assert_allclose(
+                    cv_noise_ceiling(rdms, ceil_set, test_set, method),
+                    [noise_min, noise_max])
+
     @parameterized.expand([
         ['cosine'],
         ['rho-a'],
@@ -55,3 +80,32 @@ class TestNoiseCeiling(unittest.TestCase):
             descriptors=des
         )
         _, _ = boot_noise_ceiling(rdms, method=method)
+
+    @parameterized.expand([
+        ['cosine'],
+        ['rho-a'],
+        ['tau-a'],
+        ['spearman'],
+        ['corr'],
+        ['corr_cov'],
+    ])
+    def test_boot_noise_ceiling_leave_one_out(self, method):
+        from numpy.testing import assert_allclose
+        from rsatoolbox.inference import boot_noise_ceiling
+        from rsatoolbox.inference import sets_leave_one_out_rdm
+        from rsatoolbox.rdm import RDMs, compare
+        from rsatoolbox.util.inference_util import pool_rdm
+        dis = np.random.rand(11, 10)  # 11 5x5 rdms
+        dis[:, 3] = np.nan
+        rdm_des = {'session': np.array([1, 1, 2, 2, 4, 5, 6, 7, 7, 7, 7])}
+        rdms = RDMs(dissimilarities=dis, rdm_descriptors=rdm_des)
+        _, test_set, ceil_set = sets_leave_one_out_rdm(rdms, 'session')
+        noise_min = np.mean([
+            np.mean(compare(pool_rdm(train[0], method), test[0], method))
+            for train, test in zip(ceil_set, test_set)])
+        noise_max = np.mean([
+            np.mean(compare(pool_rdm(rdms, method), test[0], method))
+            for test in test_set])
+        assert_allclose(
+            boot_noise_ceiling(rdms, method=method, rdm_descriptor='session'),
+            [noise_min, noise_max])
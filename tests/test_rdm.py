@@ -9,6 +9,7 @@ Test for RDM class
 import unittest
 import numpy as np
 from numpy.testing import assert_array_equal
+from numpy.testing import assert_array_almost_equal
 from scipy.spatial.distance import squareform
 import rsatoolbox.rdm as rsr
 import rsatoolbox as rsa
@@ -82,6 +83,18 @@ class TestRDM(unittest.TestCase):
         self.assertEqual(m_rdms.shape[1], 5)
         self.assertEqual(m_rdms.shape[2], 5)
 
+    def test_rdm_dtype(self):
+        dis = np.random.rand(8, 10)
+        rdms = rsr.RDMs(dissimilarities=dis, dtype=np.float32)
+        assert rdms.dissimilarities.dtype == np.float32
+        assert rdms.get_matrices().dtype == np.float32
+        assert rdms.subsample_pattern('index', [0, 1, 1, 3]
+                                      ).dissimilarities.dtype == np.float32
+        rdms_16 = rsr.RDMs(dissimilarities=dis, dtype=np.float16)
+        sim = rsr.compare(rdms_16, rdms, method='corr')
+        assert sim.dtype == np.float32
+        assert_array_almost_equal(np.diag(sim), 1, decimal=3)
+
     def test_rdm_subset(self):
         dis = np.zeros((8, 10))
         mes = "Euclidean"
@@ -246,6 +259,20 @@ class TestRDM(unittest.TestCase):
         self.assertEqual(rank_rdm.n_cond, rdms.n_cond)
         self.assertEqual(rank_rdm.dissimilarity_measure, 'Euclidean (ranks)')
 
+    def test_rank_transform_nan(self):
+        from rsatoolbox.rdm import rank_transform
+        from scipy.stats import rankdata
+        dis = np.random.randint(0, 4, (4, 10)).astype(float)
+        dis[:, 3] = np.nan
+        rdms = rsr.RDMs(dissimilarities=dis, dissimilarity_measure='Euclidean')
+        for method in ['average', 'min', 'max', 'dense', 'ordinal']:
+            rank_rdm = rank_transform(rdms, method=method)
+            self.assertTrue(np.all(np.isnan(rank_rdm.dissimilarities[:, 3])))
+            for i in range(4):
+                assert_array_almost_equal(
+                    np.delete(rank_rdm.dissimilarities[i], 3),
+                    rankdata(np.delete(dis[i], 3), method=method))
+
     def test_sqrt_transform(self):
         from rsatoolbox.rdm import sqrt_transform
         dis = np.zeros((8, 10))
@@ -278,6 +305,20 @@ class TestRDM(unittest.TestCase):
         self.assertEqual(pos_rdm.n_rdm, rdms.n_rdm)
         self.assertEqual(pos_rdm.n_cond, rdms.n_cond)
         assert np.all(pos_rdm.dissimilarities >= 0)
+        assert np.any(rdms.dissimilarities < 0)
+
+    def test_transform_inplace(self):
+        from rsatoolbox.rdm import sqrt_transform
+        dis = np.random.rand(8, 10) - 0.5
+        rdms = rsr.RDMs(dissimilarities=dis.copy(),
+                        dissimilarity_measure='squared euclidean')
+        data = rdms.dissimilarities
+        sqrt_rdm = sqrt_transform(rdms, inplace=True)
+        self.assertIs(sqrt_rdm, rdms)
+        self.assertIs(sqrt_rdm.dissimilarities, data)
+        self.assertEqual(sqrt_rdm.dissimilarity_measure, 'euclidean')
+        assert_array_almost_equal(sqrt_rdm.dissimilarities,
+                                  np.sqrt(np.maximum(dis, 0)))
 
     def test_rdm_append(self):
         dis = np.zeros((8, 10))
@@ -496,6 +537,32 @@ class TestSave(unittest.TestCase):
                       == rdm_des['session'])
         assert rdms_loaded.descriptors['subj'] == 0
 
+    def test_load_mmap(self):
+        import os
+        import tempfile
+        dis = np.random.rand(8, 10)
+        rdm_des = {'session': np.array([0, 1, 2, 2, 4, 5, 6, 7])}
+        rdms = rsa.rdm.RDMs(
+            dissimilarities=dis,
+            dissimilarity_measure='Euclidean',
+            rdm_descriptors=rdm_des)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'rdms.hdf5')
+            rdms.save(filename)
+            rdms_loaded = rsa.rdm.load_rdm(filename, mmap_mode='r')
+            assert isinstance(rdms_loaded.dissimilarities, np.memmap)
+            assert_array_equal(rdms_loaded.dissimilarities, dis)
+            rdms_sub = rsa.rdm.load_rdm(
+                filename, mmap_mode='r', by='session', value=2)
+            assert rdms_sub.n_rdm == 2
+            assert_array_equal(rdms_sub.dissimilarities, dis[2:4])
+            assert_array_equal(rdms_sub.rdm_descriptors['index'], [2, 3])
+            rdms_sub = rsa.rdm.load_rdm(
+                filename, by='session', value=[7, 0])
+            assert_array_equal(rdms_sub.dissimilarities, dis[[0, 7]])
+            assert_array_equal(rdms_sub.rdm_descriptors['session'], [0, 7])
+            del rdms_loaded, rdms_sub
+
 
 class TestRDMLists(unittest.TestCase):
     """ checking that descriptors stay lists if they are specified as such"""
@@ -0,0 +1,58 @@
+"""Unit tests for the nearest neighbour index over RDM libraries
+"""
+# pylint: disable=import-outside-toplevel, no-self-use
+import os
+import tempfile
+from unittest import TestCase
+import numpy as np
+from numpy.testing import assert_array_equal, assert_array_almost_equal
+
+
+class TestRDMIndex(TestCase):
+    """exact and approximate queries and storage of RDMIndex"""
+
+    def setUp(self):
+        from rsatoolbox.rdm import RDMs
+        rng = np.random.default_rng(0)
+        self.library = RDMs(
+            rng.random((200, 45)),
+            rdm_descriptors=dict(name=[f'model{i}' for i in range(200)]))
+        self.query = self.library.get_vectors()[:4] \
+            + 0.1 * rng.random((4, 45))
+
+    def test_exact_equals_compare(self):
+        from rsatoolbox.rdm import RDMIndex, compare
+        for method in ['cosine', 'corr', 'spearman', 'cosine_cov']:
+            index = RDMIndex(self.library, method=method)
+            idx, sim = index.query(self.query, top_k=5, block_size=64)
+            full = compare(self.query, self.library, method=method)
+            order = np.argsort(-full, axis=1)[:, :5]
+            assert_array_equal(idx, order)
+            assert_array_almost_equal(sim, np.take_along_axis(full, order, 1))
+
+    def test_approximate(self):
+        from rsatoolbox.rdm import RDMIndex
+        index = RDMIndex(self.library, method='corr', n_projections=32)
+        idx, sim = index.query(self.query, top_k=3, exact=False,
+                               n_candidates=20)
+        _, exact_sim = index.query(self.query, top_k=3)
+        assert_array_equal(idx[:, 0], np.arange(4))
+        assert_array_almost_equal(sim[:, 0], exact_sim[:, 0])
+        with self.assertRaises(ValueError):
+            RDMIndex(self.library).query(self.query, exact=False)
+
+    def test_save_load(self):
+        from rsatoolbox.rdm import RDMIndex, load_rdm_index
+        index = RDMIndex(self.library, method='cosine', n_projections=16)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_name, file_type, mmap_mode in [
+                    ('index.h5', 'hdf5', 'r'), ('index.pkl', 'pkl', None)]:
+                file_name = os.path.join(tmp_dir, file_name)
+                index.save(file_name, file_type=file_type)
+                loaded = load_rdm_index(file_name, mmap_mode=mmap_mode)
+                assert_array_equal(
+                    loaded.query(self.query, exact=False)[0],
+                    index.query(self.query, exact=False)[0])
+                self.assertEqual(loaded.rdm_descriptors['name'][3],
+                                 'model3')
+                del loaded
@@ -0,0 +1,161 @@
+"""Unit tests for sparse storage of partially observed RDMs
+"""
+# pylint: disable=import-outside-toplevel, no-self-use
+from unittest import TestCase
+import numpy as np
+from numpy import array, nan
+from numpy.testing import assert_array_equal, assert_array_almost_equal
+
+
+def _partial_rdms():
+    from rsatoolbox.rdm.rdms import RDMs
+    return RDMs(
+        dissimilarities=array([
+            [  1,   2, nan,   3, nan, nan],
+            [nan, nan, nan,   4,   5,   6],
+            [  2,   1, nan,   4,   5, nan],
+        ]),
+        rdm_descriptors=dict(subj=['a', 'b', 'c']),
+    )
+
+
+class TestSparseRDMs(TestCase):
+    """Conversion and indexing of SparseRDMs"""
+
+    def test_roundtrip(self):
+        from rsatoolbox.rdm import sparse_from_rdms
+        rdms = _partial_rdms()
+        sparse = sparse_from_rdms(rdms)
+        self.assertEqual(sparse.n_rdm, 3)
+        self.assertEqual(sparse.n_cond, 4)
+        assert_array_equal(sparse.get_counts(), [3, 3, 4])
+        assert_array_equal(sparse.get_vectors(), rdms.get_vectors())
+        assert_array_equal(sparse.get_mask(), ~np.isnan(rdms.get_vectors()))
+        assert_array_equal(sparse.to_rdms().dissimilarities,
+                           rdms.dissimilarities)
+
+    def test_subset_and_index(self):
+        from rsatoolbox.rdm import sparse_from_rdms
+        sparse = sparse_from_rdms(_partial_rdms())
+        sub = sparse.subset('subj', ['a', 'c'])
+        self.assertEqual(sub.n_rdm, 2)
+        assert_array_equal(sub.get_vectors(),
+                           _partial_rdms().get_vectors()[[0, 2]])
+        assert_array_equal(sparse[1].get_vectors(),
+                           _partial_rdms().get_vectors()[[1]])
+
+    def test_mean(self):
+        from rsatoolbox.rdm import sparse_from_rdms
+        rdms = _partial_rdms()
+        assert_array_almost_equal(
+            sparse_from_rdms(rdms).mean().dissimilarities,
+            rdms.mean().dissimilarities)
+
+    def test_from_partials_sparse(self):
+        from rsatoolbox.rdm.rdms import RDMs
+        from rsatoolbox.rdm.combine import from_partials
+        rdms1 = RDMs(
+            dissimilarities=array([[1, 2, 3], [4, 5, 6]]),
+            pattern_descriptors=dict(conds=['d', 'a', 'c']),
+        )
+        rdms2 = RDMs(
+            dissimilarities=array([[7, 8, 9]]),
+            pattern_descriptors=dict(conds=['a', 'b', 'c']),
+        )
+        dense = from_partials([rdms1, rdms2])
+        sparse = from_partials([rdms1, rdms2], sparse=True)
+        assert_array_equal(sparse.get_vectors(), dense.get_vectors())
+        assert_array_equal(sparse.pattern_descriptors['conds'],
+                           dense.pattern_descriptors['conds'])
+
+    def test_rescale(self):
+        from rsatoolbox.rdm import sparse_from_rdms
+        from rsatoolbox.rdm.combine import rescale
+        rdms = _partial_rdms()
+        dense = rescale(rdms)
+        sparse = rescale(sparse_from_rdms(rdms))
+        assert_array_almost_equal(sparse.get_vectors(), dense.get_vectors())
+        assert_array_almost_equal(
+            np.concatenate(sparse.rdm_descriptors['rescalingWeights']),
+            dense.rdm_descriptors['rescalingWeights'][
+                ~np.isnan(dense.rdm_descriptors['rescalingWeights'])])
+
+
+class TestSparseCompare(TestCase):
+    """compare and pooling use the stored pair index directly"""
+
+    def setUp(self):
+        from rsatoolbox.rdm import RDMs
+        rng = np.random.default_rng(0)
+        vectors = rng.random((5, 15))
+        vectors[:, [2, 7, 11]] = nan
+        models = rng.random((3, 15))
+        models[:, [2, 7, 11]] = nan
+        self.rdms = RDMs(vectors)
+        self.models = RDMs(models)
+
+    def test_compare(self):
+        from rsatoolbox.rdm import compare, sparse_from_rdms
+        sparse = sparse_from_rdms(self.rdms)
+        for method in ['cosine', 'corr', 'spearman', 'tau-a', 'rho-a',
+                       'cosine_cov', 'corr_cov']:
+            assert_array_almost_equal(
+                compare(self.models, sparse, method=method),
+                compare(self.models, self.rdms, method=method))
+            assert_array_almost_equal(
+                compare(sparse, sparse, method=method),
+                compare(self.rdms, self.rdms, method=method))
+
+    def test_compare_different_pairs(self):
+        from rsatoolbox.rdm import compare, sparse_from_rdms
+        with self.assertRaises(ValueError):
+            compare(sparse_from_rdms(_partial_rdms()), self.models)
+
+    def test_compare_differing_masks(self):
+        from rsatoolbox.rdm import RDMs, compare, sparse_from_rdms
+        rng = np.random.default_rng(1)
+        vectors = rng.random((6, 15))
+        vectors[rng.random((6, 15)) < 0.4] = nan
+        vectors[:, 4] = nan
+        rdms = RDMs(vectors)
+        sparse = sparse_from_rdms(rdms)
+        for method in ['cosine', 'corr', 'spearman']:
+            expected = compare(self.models, rdms, method=method,
+                               nan_mode='pairwise')
+            assert_array_almost_equal(
+                compare(self.models, sparse, method=method), expected)
+            assert_array_almost_equal(
+                compare(self.models, sparse, method=method,
+                        nan_mode='pairwise'), expected)
+            assert_array_almost_equal(
+                compare(sparse, sparse_from_rdms(self.models),
+                        method=method),
+                compare(rdms, self.models, method=method,
+                        nan_mode='pairwise'))
+        with self.assertRaises(ValueError):
+            compare(self.models, sparse, method='tau-a')
+
+    def test_get_vectors_pairs(self):
+        from rsatoolbox.rdm import sparse_from_rdms
+        rdms = _partial_rdms()
+        sparse = sparse_from_rdms(rdms)
+        assert_array_equal(sparse.get_pairs(), [0, 1, 3, 4, 5])
+        assert_array_equal(sparse.get_vectors(np.array([1, 2, 5])),
+                           rdms.get_vectors()[:, [1, 2, 5]])
+        self.assertFalse(sparse.has_equal_pairs())
+        self.assertTrue(sparse_from_rdms(self.rdms).has_equal_pairs())
+
+    def test_pool(self):
+        from rsatoolbox.rdm import sparse_from_rdms
+        from rsatoolbox.util.pooling import pool_rdm
+        from rsatoolbox.util.inference_util import pool_rdm as pool_rdm_nc
+        sparse = sparse_from_rdms(self.rdms)
+        for method in ['euclid', 'cosine', 'corr', 'spearman',
+                       'cosine_cov']:
+            assert_array_almost_equal(
+                pool_rdm(sparse, method).dissimilarities,
+                pool_rdm(self.rdms, method).dissimilarities)
+        for method in ['cosine', 'corr', 'corr_cov', 'tau-a']:
+            assert_array_almost_equal(
+                pool_rdm_nc(sparse, method).dissimilarities,
+                pool_rdm_nc(self.rdms, method).dissimilarities)
@@ -183,3 +183,22 @@ class RdmsCombineTests(TestCase):
                 [nan, nan, nan,   1,   2,   3],
             ])
         )
+
+    def test_from_partials_unordered_patterns(self):
+        """Patterns of the partial RDMs may come in any order
+        """
+        from rsatoolbox.rdm.rdms import RDMs
+        from rsatoolbox.rdm.combine import from_partials
+        rdms1 = RDMs(
+            dissimilarities=array([[1, 2, 3], [4, 5, 6]]),
+            pattern_descriptors=dict(conds=['d', 'a', 'c']),
+        )
+        rdms = from_partials([rdms1], all_patterns=['a', 'b', 'c', 'd'])
+        self.assertEqual(rdms.n_rdm, 2)
+        assert_array_equal(
+            rdms.dissimilarities,
+            array([
+                [nan, 3, 1, nan, nan, 2],
+                [nan, 6, 4, nan, nan, 5],
+            ])
+        )
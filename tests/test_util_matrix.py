@@ -46,5 +46,21 @@ class TestIndicator(unittest.TestCase):
         self.assertEqual(n_col, 10)
 
 
+class TestSolveV(unittest.TestCase):
+
+    def test_solve_v(self):
+        from rsatoolbox.util.matrix import get_v, solve_v
+        n_cond = 6
+        sigma_k = np.eye(n_cond) + 0.3
+        nan_idx = np.ones(15, bool)
+        nan_idx[[2, 9]] = False
+        vectors = np.random.rand(4, 13)
+        for sig in [None, np.diag(sigma_k), sigma_k]:
+            v = get_v(n_cond, sig)[nan_idx][:, nan_idx].toarray()
+            for _ in range(2):
+                v_inv_x = solve_v(vectors, n_cond, sig, nan_idx)
+                np.testing.assert_allclose(v_inv_x @ v, vectors, atol=1e-10)
+
+
 if __name__ == '__main__':
     unittest.main()